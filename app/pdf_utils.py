@@ -1,264 +1,3452 @@
-import shutil
 import os
-import glob
+import hashlib
+import json
+import math
+import mmap
+import re
+from contextlib import contextmanager, nullcontext
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from io import BytesIO
 from pypdf import PdfReader, PdfWriter
 from pypdf.errors import PdfStreamError
+from pypdf.filters import ASCII85Decode, ASCIIHexDecode, FlateDecode
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, StreamObject, is_null_or_none
 from tkinter import filedialog, messagebox
-from PIL import Image
+from PIL import Image, ImageOps
+from reportlab import rl_config
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
 
 try:
-    from .utils import handle_error, exportar_log_tempo
+    from .utils import handle_error, exportar_log_tempo, EspacoTrabalho, listar_imagens, PASTA_CACHE_INDICES
 except ImportError:
-    from utils import handle_error, exportar_log_tempo
+    from utils import handle_error, exportar_log_tempo, EspacoTrabalho, listar_imagens, PASTA_CACHE_INDICES
 
-def convert_to_pdf(pasta_imagens, output_pdf):
+# Margem, em pontos, entre a imagem e a borda da página
+MARGEM_PAGINA_IMAGEM = 20
+# Imagens decodificadas à frente da que está sendo desenhada, por thread
+IMAGENS_EM_PREPARO_POR_THREAD = 2
+# Qualidade dos JPEGs reduzidos para o DPI alvo na conversão de imagens
+QUALIDADE_JPEG_CONVERSAO = 80
+
+# Sem isso o reportlab grava as imagens em ASCII85, que aumenta 25% o tamanho delas
+# (inclusive dos JPEGs incorporados como estão) e custa uma passada de codificação
+rl_config.useA85 = 0
+
+# Orientação EXIF -> posição, na página, do ponto (s, t) da imagem gravada no arquivo.
+# Coordenadas normalizadas, com a origem no canto superior esquerdo
+ORIENTACOES_EXIF = {
+    1: lambda s, t: (s, t),
+    2: lambda s, t: (1 - s, t),          # espelhada na horizontal
+    3: lambda s, t: (1 - s, 1 - t),      # girada 180°
+    4: lambda s, t: (s, 1 - t),          # espelhada na vertical
+    5: lambda s, t: (t, s),              # transposta
+    6: lambda s, t: (1 - t, s),          # girada 90° no sentido horário
+    7: lambda s, t: (1 - t, 1 - s),      # transversa
+    8: lambda s, t: (t, 1 - s),          # girada 90° no sentido anti-horário
+}
+
+
+def _matriz_orientacao_exif(orientacao, x_pos, y_pos, largura, altura):
+    """
+    Monta a matriz que desenha a imagem gravada no arquivo, já na orientação do EXIF,
+    no retângulo (x_pos, y_pos, largura, altura) da página.
+
+    Permite incorporar um JPEG girado sem decodificá-lo: a rotação fica por conta
+    do visualizador do PDF.
+    
+    Returns:
+        tuple: Matriz [a b c d e f] aplicada ao quadrado unitário da imagem
+    """
+    posicao = ORIENTACOES_EXIF[orientacao]
+
+    def ponto(u, v):
+        # No PDF a imagem ocupa o quadrado unitário com a primeira linha em cima (v = 1)
+        x_norm, y_norm = posicao(u, 1 - v)
+        return x_pos + largura * x_norm, y_pos + altura * (1 - y_norm)
+
+    e, f = ponto(0, 0)
+    x_u, y_u = ponto(1, 0)
+    x_v, y_v = ponto(0, 1)
+    return x_u - e, y_u - f, x_v - e, y_v - f, e, f
+
+
+def _posicionar_imagem_pagina(img_width, img_height, page_width, page_height, margem=MARGEM_PAGINA_IMAGEM):
+    """
+    Calcula onde desenhar uma imagem para que caiba na página, centralizada e com a proporção correta
+    
+    Returns:
+        tuple: (x, y, largura, altura) em pontos
+    """
+    # Calcula o redimensionamento mantendo a proporção
+    if img_width > img_height:
+        # Imagem em formato paisagem
+        scaled_width = page_width - 2 * margem  # Margem de cada lado
+        scaled_height = (scaled_width / img_width) * img_height
+        
+        # Se a altura ainda for maior que a página, redimensiona pela altura
+        if scaled_height > page_height - 2 * margem:
+            scaled_height = page_height - 2 * margem
+            scaled_width = (scaled_height / img_height) * img_width
+    else:
+        # Imagem em formato retrato
+        scaled_height = page_height - 2 * margem  # Margem de cada lado
+        scaled_width = (scaled_height / img_height) * img_width
+        
+        # Se a largura ainda for maior que a página, redimensiona pela largura
+        if scaled_width > page_width - 2 * margem:
+            scaled_width = page_width - 2 * margem
+            scaled_height = (scaled_width / img_width) * img_height
+    
+    # Centraliza a imagem na página
+    x_pos = (page_width - scaled_width) / 2
+    y_pos = (page_height - scaled_height) / 2
+    return x_pos, y_pos, scaled_width, scaled_height
+
+
+class _LeitorJpegCodificado(ImageReader):
+    """
+    ImageReader de um JPEG já codificado em memória.
+
+    O drawImage do reportlab identifica cada imagem pelo hash dos seus pixels, o que
+    obrigaria a decodificar o JPEG de novo. Aqui o hash é feito sobre os próprios bytes
+    do JPEG, que são incorporados como estão.
+    """
+
+    def __init__(self, dados):
+        super().__init__(BytesIO(dados))
+        self._dados_jpeg = dados
+
+    def getRGBData(self):
+        self._dataA = None
+        return self._dados_jpeg
+
+
+def _preparar_imagem_pdf(img_path, page_width, page_height, dpi_alvo=None, qualidade_jpeg=QUALIDADE_JPEG_CONVERSAO):
+    """
+    Decodifica uma imagem e a deixa pronta para ser desenhada na página.
+
+    Executada em uma thread do pool de convert_to_pdf: a decodificação e as conversões
+    do Pillow liberam o GIL, então várias imagens são preparadas ao mesmo tempo.
+    
+    JPEGs em RGB ou tons de cinza não são decodificados: só o cabeçalho é lido, para as
+    dimensões e a orientação, e os bytes DCT originais são incorporados como estão, sem
+    perda. Com dpi_alvo, JPEGs com resolução acima do necessário para a página são
+    decodificados direto em escala reduzida (modo draft), ajustados ao tamanho exato
+    e codificados uma única vez. Os demais arquivos são decodificados uma única vez.
+    O arquivo é fechado ao final e a imagem devolvida é uma cópia independente dele,
+    que o canvas libera após desenhá-la.
+    
+    Args:
+        dpi_alvo (int): Resolução máxima das imagens na página. Se None, mantém a original
+        qualidade_jpeg (int): Qualidade dos JPEGs reduzidos para dpi_alvo
+    
+    Returns:
+        tuple: (imagem RGB já na orientação correta, o próprio caminho quando o arquivo
+        pode ser incorporado como está, ou os bytes do JPEG reduzido; orientação EXIF a
+        aplicar ao desenhar o caminho ou os bytes; (x, y, largura, altura) na página)
+    """
+    with Image.open(img_path) as origem:
+        orientacao = origem.getexif().get(0x0112, 1)
+        if orientacao not in ORIENTACOES_EXIF:
+            orientacao = 1
+
+        # Dimensões com que a imagem aparece na página: orientações 5 a 8 trocam largura e altura
+        img_width, img_height = origem.size
+        if orientacao >= 5:
+            img_width, img_height = img_height, img_width
+        posicao = _posicionar_imagem_pagina(img_width, img_height, page_width, page_height)
+
+        # Tamanho, em pixels da imagem gravada, com que ela atinge o DPI alvo na página
+        tamanho_alvo = None
+        if dpi_alvo:
+            largura_alvo = max(1, math.ceil(posicao[2] / 72 * dpi_alvo))
+            altura_alvo = max(1, math.ceil(posicao[3] / 72 * dpi_alvo))
+            if orientacao >= 5:
+                largura_alvo, altura_alvo = altura_alvo, largura_alvo
+            if origem.width > largura_alvo * FATOR_LIMIAR_DPI:
+                tamanho_alvo = (largura_alvo, altura_alvo)
+
+        jpeg = origem.format == 'JPEG' and origem.mode in ('RGB', 'L')
+        if jpeg and tamanho_alvo is None:
+            return img_path, orientacao, posicao
+
+        if jpeg:
+            # Deixa o decodificador JPEG reduzir a escala (1/2, 1/4, 1/8) sem passar do tamanho alvo
+            origem.draft(origem.mode, tamanho_alvo)
+            img = origem.convert(origem.mode)
+        else:
+            # Decodifica e converte para RGB (para garantir compatibilidade com PDF) em um só
+            # passo; o resultado já é uma cópia que não depende do arquivo aberto
+            img = origem.convert('RGB')
+
+    if tamanho_alvo is not None and img.size != tamanho_alvo:
+        img = img.resize(tamanho_alvo, Image.LANCZOS)
+
+    if jpeg:
+        # Codifica uma única vez; a orientação continua a cargo da matriz de desenho
+        buffer = BytesIO()
+        img.save(buffer, 'JPEG', quality=qualidade_jpeg)
+        img.close()
+        return buffer.getvalue(), orientacao, posicao
+
+    # Aplica a rotação indicada no EXIF (fotos de celular) sobre a própria cópia
+    if orientacao != 1:
+        ImageOps.exif_transpose(img, in_place=True)
+
+    return img, 1, posicao
+
+
+def convert_to_pdf(pasta_imagens, output_pdf, callback=None, num_threads=None, dpi_alvo=None,
+                   qualidade_jpeg=QUALIDADE_JPEG_CONVERSAO, recursivo=False):
+    """
+    Converte todas as imagens de uma pasta em um único arquivo PDF
+
+    As imagens são preparadas (lidas, rotacionadas e posicionadas) em um pool de
+    threads, algumas à frente da página atual, enquanto um único canvas desenha as
+    páginas na ordem natural dos nomes. JPEGs comuns entram no PDF sem serem decodificados.
+    
+    Args:
+        pasta_imagens (str): Caminho da pasta contendo as imagens
+        output_pdf (str): Caminho do arquivo PDF de saída
+        callback (callable): Função de log para acompanhar o progresso
+        num_threads (int): Quantidade de threads de decodificação. Se None, usa uma por núcleo
+        dpi_alvo (int): Resolução máxima das fotos na página. Fotos acima disso são
+            reduzidas já na leitura, para que o PDF nasça pequeno. Se None, mantém a original
+        qualidade_jpeg (int): Qualidade dos JPEGs reduzidos para dpi_alvo
+        recursivo (bool): Inclui as imagens das subpastas, depois das da própria pasta
+    """
+    import time
+
+    def log(msg):
+        if callback:
+            callback(msg)
+        else:
+            print(msg)
+
+    try:
+        tempo_inicio = time.time()
+
+        # Busca por imagens na pasta, em uma única leitura do diretório e em ordem natural
+        # (IMG_2 antes de IMG_10)
+        imagens = listar_imagens(pasta_imagens, recursivo=recursivo)
+        
+        if not imagens:
+            messagebox.showinfo("Aviso", "Não há arquivos válidos para inclusão no PDF.")
+            return
+        
+        # Verifica se o arquivo PDF já existe
+        if os.path.exists(output_pdf):
+            messagebox.showinfo("Aviso", "Arquivo já existente.")
+            return
+        
+        # Cria um novo documento PDF usando reportlab para melhor controle de layout
+        c = canvas.Canvas(output_pdf, pagesize=A4)
+        page_width, page_height = A4
+
+        if num_threads is None:
+            num_threads = os.cpu_count() or 1
+        num_threads = max(1, min(num_threads, len(imagens)))
+        log(f"- Convertendo {len(imagens)} imagens, usando {num_threads} thread(s)...")
+        if dpi_alvo:
+            log(f"    - Fotos acima de {dpi_alvo} DPI serão reduzidas (qualidade JPEG {qualidade_jpeg})")
+
+        # Mantém apenas algumas imagens decodificadas em memória por vez
+        janela = num_threads * IMAGENS_EM_PREPARO_POR_THREAD
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            pendentes = deque()
+            proxima = 0
+            for numero, img_path in enumerate(imagens, start=1):
+                while proxima < len(imagens) and len(pendentes) < janela:
+                    pendentes.append(executor.submit(_preparar_imagem_pdf, imagens[proxima], page_width, page_height,
+                                                     dpi_alvo, qualidade_jpeg))
+                    proxima += 1
+
+                img, orientacao, (x_pos, y_pos, scaled_width, scaled_height) = pendentes.popleft().result()
+                log(f"    - Convertendo imagem {numero}/{len(imagens)}: {os.path.basename(img_path)}")
+
+                # Adiciona a imagem ao PDF centralizada na página
+                if isinstance(img, (str, bytes)):
+                    # JPEG incorporado como está; a orientação do EXIF vira a matriz de desenho
+                    c.saveState()
+                    c.transform(*_matriz_orientacao_exif(orientacao, x_pos, y_pos, scaled_width, scaled_height))
+                    c.drawImage(img if isinstance(img, str) else _LeitorJpegCodificado(img), 0, 0, width=1, height=1)
+                    c.restoreState()
+                else:
+                    c.drawImage(ImageReader(img), x_pos, y_pos, width=scaled_width, height=scaled_height)
+                    # O canvas já guardou a imagem comprimida: os pixels podem ser liberados
+                    img.close()
+                del img
+                c.showPage()  # Adiciona uma nova página para a próxima imagem
+        
+        # Salva o documento PDF
+        c.save()
+        log(f"- Tempo total gasto para converter as imagens: {time.time() - tempo_inicio:.2f} segundos")
+        messagebox.showinfo("Sucesso", f"PDF criado com sucesso: {output_pdf}")
+        
+    except Exception as e:
+        handle_error("convert_to_pdf", f"Erro ao converter imagens para PDF: {str(e)}", None)
+
+
+# Páginas gravadas por tarefa na divisão em páginas individuais
+PAGINAS_POR_LOTE_DIVISAO = 25
+
+
+def _escrever_paginas_individuais(leitor, inicio, fim, pasta_saida, nome_arquivo, podar_recursos=True):
+    """
+    Grava cada página do intervalo [inicio, fim) do leitor como um PDF separado.
+
+    Os nomes dependem apenas do número da página ({nome}_{n}.pdf), não da ordem em que
+    os lotes terminam. Com a poda ligada, o tamanho "antes" é uma estimativa do
+    IndicePaginasPdf para a página com os recursos completos (gravar a página duas
+    vezes só para medir custaria o dobro); o "depois" é o tamanho do arquivo gravado.
+    
+    Returns:
+        list: (nome do arquivo, bytes estimados sem a poda ou None se a poda estiver
+        desligada, bytes gravados), na ordem das páginas
+    """
+    criados = []
+    tamanhos = {}
+    for pagina in range(inicio, fim):
+        tamanho_antes = None
+        if podar_recursos:
+            objetos = _objetos_pagina(leitor.pages[pagina], tamanhos, USAR_FLUXOS_OBJETOS)
+            tamanho_antes = IndicePaginasPdf.SOBRECARGA_BASE + IndicePaginasPdf.SOBRECARGA_PAGINA + sum(
+                fixo + comum * IndicePaginasPdf.FATOR_FLUXO_OBJETOS for fixo, comum in objetos.values())
+
+        escreve_pdf = EscritorPdf()
+        escreve_pdf.add_page(leitor.pages[pagina])
+        if podar_recursos and podar_recursos_pagina(escreve_pdf.pages[0]):
+            _remover_objetos_inalcancaveis(escreve_pdf)
+
+        nome_arquivo_saida = '{}_{}.pdf'.format(nome_arquivo, pagina)
+        caminho_saida = os.path.join(pasta_saida, nome_arquivo_saida)
+        with open(caminho_saida, 'wb') as saida:
+            escreve_pdf.write(saida)
+        criados.append((nome_arquivo_saida, tamanho_antes, os.path.getsize(caminho_saida)))
+    return criados
+
+
+def _gravar_paginas_individuais(caminho_origem, inicio, fim, pasta_saida, nome_arquivo, podar_recursos=True):
+    """
+    Executada em um processo separado: abre a origem com seu próprio PdfReader e grava
+    as páginas [inicio, fim) com _escrever_paginas_individuais.
+    """
+    with abrir_pdf_leitura(caminho_origem) as leitor:
+        return _escrever_paginas_individuais(leitor, inicio, fim, pasta_saida, nome_arquivo, podar_recursos)
+
+
+def dividir_pdf_1(diretorio, callback=None, num_processos=None, podar_recursos=True):
+    """
+    Divide um PDF em páginas individuais
+
+    As páginas são distribuídas em lotes entre vários processos, cada um com seu
+    próprio leitor do PDF.
+    
+    Args:
+        diretorio (str): Caminho do arquivo PDF a ser dividido
+        callback (callable): Função de log para acompanhar o progresso
+        num_processos (int): Quantidade de processos. Se None, usa um por núcleo
+        podar_recursos (bool): Mantém em cada arquivo apenas os recursos usados pela página
+    """
+    import time
+
+    def log(msg):
+        if callback:
+            callback(msg)
+        else:
+            print(msg)
+
+    try:
+        tempo_inicio = time.time()
+        nome_arquivo = os.path.splitext(os.path.basename(diretorio))[0]
+        pasta_saida = os.path.dirname(diretorio)  # Obtém o diretório do arquivo original
+        with abrir_pdf_leitura(diretorio) as pdf:
+            total_paginas = len(pdf.pages)
+        
+        if total_paginas == 0:
+            messagebox.showinfo("Aviso", "O PDF não contém páginas para dividir.")
+            return
+        elif total_paginas == 1:
+            messagebox.showinfo("Aviso", "O PDF contém apenas uma página. Nenhuma divisão necessária.")
+            return
+        else:
+            if num_processos is None:
+                num_processos = os.cpu_count() or 1
+            num_processos = max(1, min(num_processos, math.ceil(total_paginas / PAGINAS_POR_LOTE_DIVISAO)))
+
+            # Cada lote abre o PDF de novo, então em documentos grandes os lotes crescem
+            # para que cada processo receba poucos deles
+            paginas_lote = PAGINAS_POR_LOTE_DIVISAO
+            if num_processos > 1:
+                paginas_lote = max(paginas_lote, math.ceil(total_paginas / (num_processos * 4)))
+            lotes = [(inicio, min(inicio + paginas_lote, total_paginas)) for inicio in range(0, total_paginas, paginas_lote)]
+
+            log(f"- Dividindo {total_paginas} páginas em {len(lotes)} lote(s), usando {num_processos} processo(s)...")
+            paginas_gravadas = 0
+            bytes_antes = 0
+            bytes_depois = 0
+
+            def registrar(criados):
+                nonlocal paginas_gravadas, bytes_antes, bytes_depois
+                paginas_gravadas += len(criados)
+                bytes_antes += sum(antes or 0 for _, antes, _ in criados)
+                bytes_depois += sum(depois for _, _, depois in criados)
+                log(f"    - Dividindo página {paginas_gravadas}/{total_paginas} (último arquivo: {criados[-1][0]})")
+
+            # Com um único processo não compensa criar o pool: todos os lotes usam o mesmo leitor
+            if num_processos == 1:
+                with abrir_pdf_leitura(diretorio) as leitor:
+                    for inicio, fim in lotes:
+                        registrar(_escrever_paginas_individuais(leitor, inicio, fim, pasta_saida, nome_arquivo, podar_recursos))
+            else:
+                with ProcessPoolExecutor(max_workers=num_processos) as executor:
+                    futuros = [executor.submit(_gravar_paginas_individuais, diretorio, inicio, fim, pasta_saida, nome_arquivo,
+                                               podar_recursos)
+                               for inicio, fim in lotes]
+                    for futuro in as_completed(futuros):
+                        registrar(futuro.result())
+
+            if podar_recursos:
+                variacao = bytes_depois / bytes_antes - 1 if bytes_antes else 0
+                log(
+                    f"- Tamanho das páginas: {bytes_antes / 1048576:.2f} MB sem a poda de recursos (estimativa), "
+                    f"{bytes_depois / 1048576:.2f} MB gravados ({variacao * 100:+.0f}% estimado)"
+                )
+            else:
+                log(f"- Tamanho das páginas: {bytes_depois / 1048576:.2f} MB gravados")
+            log(f"- Tempo total gasto para dividir o PDF: {time.time() - tempo_inicio:.2f} segundos")
+            messagebox.showinfo("Sucesso", "Divisão de PDF concluída.")
+            
+    except PdfStreamError:
+        msg_erro = "O arquivo selecionado não é um PDF válido ou está corrompido.\nPor favor, verifique o arquivo e tente novamente."
+        handle_error("Dividir PDF", msg_erro, None)
+        return
+    except PermissionError:
+        msg_erro = "O arquivo PDF está sendo utilizado por outro programa.\nFeche o arquivo e tente novamente."
+        handle_error("Dividir PDF", msg_erro, None)
+        return
+    except FileNotFoundError:
+        msg_erro = "O arquivo selecionado não foi encontrado.\nVerifique se o arquivo ainda existe no local especificado."
+        handle_error("Dividir PDF", msg_erro, None)
+        return
+    except Exception as e:
+        handle_error("Dividir PDF", f": {str(e)}", None)
+        return
+
+
+@contextmanager
+def abrir_pdf_leitura(caminho, mapear=True):
+    """
+    Abre um PDF somente para leitura, sem copiá-lo
+
+    O arquivo é mapeado em memória quando possível, para que o sistema operacional
+    carregue apenas os trechos realmente lidos. Se o mapeamento não for possível
+    (arquivo vazio, sistema de arquivos sem suporte), o arquivo é lido normalmente.
+    
+    Args:
+        caminho (str): Caminho do arquivo PDF
+        mapear (bool): Se False, lê o arquivo normalmente. Ao abrir, o PdfReader percorre
+            o arquivo inteiro, e com o mapeamento todas essas páginas passam a contar na
+            memória do processo enquanto o leitor estiver aberto
+    
+    Yields:
+        PdfReader: Leitor do PDF, válido enquanto o bloco with estiver aberto
+    """
+    with open(caminho, "rb") as arquivo:
+        try:
+            mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) if mapear else None
+        except (ValueError, OSError):
+            mapa = None
+
+        if mapa is None:
+            yield PdfReader(arquivo)
+            return
+
+        try:
+            yield PdfReader(mapa)
+        finally:
+            mapa.close()
+
+
+# Grava as saídas com fluxos de objetos e tabela xref comprimida (PDF 1.5)
+USAR_FLUXOS_OBJETOS = True
+
+
+class EscritorPdf(PdfWriter):
+    """
+    PdfWriter que pode gravar os objetos comuns (dicionários, arrays, números...) comprimidos
+    em fluxos de objetos (/ObjStm) e a tabela de referências como fluxo (/XRef), recursos
+    do PDF 1.5.
+
+    Em documentos com milhares de objetos pequenos (páginas, fontes, anotações) isso
+    elimina boa parte dos bytes de estrutura. Fluxos (imagens, conteúdo) continuam
+    gravados individualmente. Com criptografia ou gravação incremental, usa a gravação
+    padrão do pypdf.
+    """
+    OBJETOS_POR_FLUXO = 100
+
+    def __init__(self, *args, fluxos_objetos=None, nivel_compressao=6, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fluxos_objetos = USAR_FLUXOS_OBJETOS if fluxos_objetos is None else fluxos_objetos
+        self.nivel_compressao = nivel_compressao
+
+    def write_stream(self, stream):
+        if not self.fluxos_objetos or self.incremental or self._encryption:
+            return super().write_stream(stream)
+        self._resolve_links()
+        self._gravar_com_fluxos_objetos(stream)
+
+    def _gravar_objeto(self, stream, idnum, objeto):
+        stream.write(f"{idnum} 0 obj\n".encode())
+        objeto.write_to_stream(stream)
+        stream.write(b"\nendobj\n")
+
+    def _gravar_com_fluxos_objetos(self, stream):
+        cabecalho = self.pdf_header if self.pdf_header >= "%PDF-1.5" else "%PDF-1.5"
+        stream.write(cabecalho.encode() + b"\n%\xe2\xe3\xcf\xd3\n")
+
+        entradas = {}  # idnum -> (tipo, deslocamento ou fluxo, geração ou índice no fluxo)
+        comuns = []
+        for idnum, objeto in enumerate(self._objects, start=1):
+            if objeto is None:
+                continue
+            if isinstance(objeto, StreamObject):
+                entradas[idnum] = (1, stream.tell(), 0)
+                self._gravar_objeto(stream, idnum, objeto)
+            else:
+                corpo = BytesIO()
+                objeto.write_to_stream(corpo)
+                comuns.append((idnum, corpo.getvalue()))
+
+        proximo_idnum = len(self._objects) + 1
+        for inicio in range(0, len(comuns), self.OBJETOS_POR_FLUXO):
+            id_fluxo = proximo_idnum
+            proximo_idnum += 1
+            grupo = comuns[inicio:inicio + self.OBJETOS_POR_FLUXO]
+            for indice, (idnum, _) in enumerate(grupo):
+                entradas[idnum] = (2, id_fluxo, indice)
+            entradas[id_fluxo] = (1, stream.tell(), 0)
+            self._gravar_objeto(stream, id_fluxo, _montar_fluxo_objetos(grupo, self.nivel_compressao))
+
+        extras = {NameObject("/Root"): self.root_object.indirect_reference}
+        if self._info is not None:
+            extras[NameObject("/Info")] = self._info.indirect_reference
+        if self._ID is not None:
+            extras[NameObject("/ID")] = self._ID
+        _gravar_tabela_xref(stream, entradas, proximo_idnum, extras, self.nivel_compressao)
+
+
+def _montar_fluxo_objetos(objetos, nivel_compressao):
+    """
+    Monta um fluxo de objetos (/ObjStm) com objetos já serializados.
+    
+    Args:
+        objetos (list): Lista de (idnum, bytes do objeto), que não podem ser fluxos
+        nivel_compressao (int): Nível do zlib (1-9)
+    
+    Returns:
+        StreamObject: O fluxo /ObjStm, com os objetos na ordem recebida
+    """
+    import zlib
+
+    corpo = BytesIO()
+    posicoes = []
+    for idnum, dados in objetos:
+        posicoes.append(f"{idnum} {corpo.tell()}")
+        corpo.write(dados)
+        corpo.write(b"\n")
+    cabecalho_fluxo = " ".join(posicoes).encode() + b"\n"
+    return StreamObject.initialize_from_dictionary({
+        NameObject("/Type"): NameObject("/ObjStm"),
+        NameObject("/N"): NumberObject(len(posicoes)),
+        NameObject("/First"): NumberObject(len(cabecalho_fluxo)),
+        NameObject("/Filter"): NameObject("/FlateDecode"),
+        "__streamdata__": zlib.compress(cabecalho_fluxo + corpo.getvalue(), nivel_compressao),
+    })
+
+
+def _gravar_tabela_xref(stream, entradas, id_xref, extras, nivel_compressao):
+    """
+    Grava a tabela de referências como fluxo (/XRef), seguida de startxref e %%EOF.
+    
+    Args:
+        stream: Fluxo binário de saída, posicionado no fim do último objeto
+        entradas (dict): idnum -> (tipo, deslocamento ou fluxo, geração ou índice no fluxo)
+        id_xref (int): Número do objeto da própria tabela, maior que todos os de entradas
+        extras (dict): Entradas do trailer (/Root, /Info, /ID)
+        nivel_compressao (int): Nível do zlib (1-9)
+    """
+    import zlib
+
+    # Uma linha binária por objeto, com a largura mínima de deslocamento
+    posicao_xref = stream.tell()
+    entradas = dict(entradas)
+    entradas[id_xref] = (1, posicao_xref, 0)
+    largura = max(1, (max(campo for _, campo, _ in entradas.values()).bit_length() + 7) // 8)
+    linhas = [b"\x00" + bytes(largura) + b"\xff\xff"]
+    for idnum in range(1, id_xref + 1):
+        tipo, campo, indice = entradas.get(idnum, (0, 0, 0))
+        linhas.append(bytes([tipo]) + campo.to_bytes(largura, "big") + indice.to_bytes(2, "big"))
+
+    dados_xref = {
+        NameObject("/Type"): NameObject("/XRef"),
+        NameObject("/Size"): NumberObject(id_xref + 1),
+        NameObject("/W"): ArrayObject([NumberObject(1), NumberObject(largura), NumberObject(2)]),
+        NameObject("/Filter"): NameObject("/FlateDecode"),
+        "__streamdata__": zlib.compress(b"".join(linhas), nivel_compressao),
+    }
+    dados_xref.update(extras)
+    stream.write(f"{id_xref} 0 obj\n".encode())
+    StreamObject.initialize_from_dictionary(dados_xref).write_to_stream(stream)
+    stream.write(b"\nendobj\n")
+    stream.write(f"startxref\n{posicao_xref}\n%%EOF\n".encode())
+
+
+class GravadorPdfIncremental:
+    """
+    Grava um PDF aos poucos, um bloco de páginas por vez, sem manter o documento inteiro em memória.
+
+    Cada bloco chega como um PdfWriter com as páginas já processadas. Os objetos alcançáveis
+    a partir das páginas são renumerados e gravados imediatamente no destino; da saída
+    ficam na memória apenas a posição de cada objeto (para a tabela de referências) e o
+    hash dos objetos já gravados. Um objeto idêntico a outro já gravado, em qualquer
+    bloco (fontes e imagens repetidas), vira uma referência ao existente. Os objetos
+    comuns de cada bloco são agrupados em fluxos de objetos, como no EscritorPdf.
+
+    Uso:
+        with GravadorPdfIncremental("saida.pdf") as gravador:
+            for writer in blocos:
+                gravador.adicionar_paginas(writer)
+    
+    Args:
+        destino (str | BytesIO): Caminho do arquivo de saída ou fluxo binário
+        nivel_compressao (int): Nível do zlib dos fluxos de objetos e da tabela (1-9)
+        fluxos_objetos (bool): Se False, grava os objetos soltos e a tabela xref clássica.
+            Se None, segue USAR_FLUXOS_OBJETOS
+    """
+    ID_PAGINAS = 1
+    ID_CATALOGO = 2
+
+    def __init__(self, destino, nivel_compressao=6, fluxos_objetos=None):
+        self.destino = destino
+        self.nivel_compressao = nivel_compressao
+        self.fluxos_objetos = USAR_FLUXOS_OBJETOS if fluxos_objetos is None else fluxos_objetos
+        self.objetos_reaproveitados = 0
+        self._stream = None
+        self._arquivo_proprio = False
+        self._entradas = {}  # número na saída -> (tipo, deslocamento ou fluxo, índice no fluxo)
+        self._hashes = {}  # hash do objeto serializado -> número na saída
+        self._paginas = []  # números das páginas na saída, na ordem
+        self._proximo_id = self.ID_CATALOGO + 1
+
+    def __enter__(self):
+        if hasattr(self.destino, "write"):
+            self._stream = self.destino
+        else:
+            self._stream = open(self.destino, "wb")
+            self._arquivo_proprio = True
+        cabecalho = b"%PDF-1.5" if self.fluxos_objetos else b"%PDF-1.4"
+        self._stream.write(cabecalho + b"\n%\xe2\xe3\xcf\xd3\n")
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        try:
+            if exc_type is None:
+                self._finalizar()
+        finally:
+            if self._arquivo_proprio:
+                self._stream.close()
+                # Um arquivo pela metade não deve ficar parecendo um PDF válido
+                if exc_type is not None:
+                    try:
+                        os.remove(self.destino)
+                    except OSError:
+                        pass
+        return False
+
+    def _reservar(self):
+        numero = self._proximo_id
+        self._proximo_id += 1
+        return numero
+
+    @staticmethod
+    def _eh_pagina(objeto):
+        return isinstance(objeto, DictionaryObject) and objeto.get("/Type") == "/Page"
+
+    @classmethod
+    def _referencias(cls, objeto):
+        """Lista as referências indiretas contidas diretamente no objeto (sem segui-las)."""
+        referencias = []
+        pagina = cls._eh_pagina(objeto)
+        pilha = [valor for chave, valor in objeto.items() if not (pagina and chave == "/Parent")] \
+            if isinstance(objeto, DictionaryObject) else [objeto]
+        while pilha:
+            item = pilha.pop()
+            if isinstance(item, IndirectObject):
+                referencias.append(item)
+            elif isinstance(item, DictionaryObject):
+                pilha.extend(item.values())
+            elif isinstance(item, ArrayObject):
+                pilha.extend(item)
+        return referencias
+
+    def _serializar(self, objeto, writer, numeros, saida, pagina=False):
+        """Grava o objeto em saida, trocando as referências do writer pelos números da saída."""
+        if isinstance(objeto, IndirectObject):
+            numero = numeros.get(objeto.idnum) if objeto.pdf is writer else None
+            saida.write(b"%d 0 R" % numero if numero else b"null")
+        elif isinstance(objeto, DictionaryObject):
+            fluxo = isinstance(objeto, StreamObject)
+            if fluxo and not objeto._data and getattr(objeto, "_operations", None):
+                objeto.get_data()  # ContentStream editado: remonta os bytes
+            saida.write(b"<<\n")
+            for chave, valor in objeto.items():
+                if (len(chave) > 2 and chave[1] == "%" and chave[-1] == "%") or (fluxo and chave == "/Length"):
+                    continue
+                chave.write_to_stream(saida)
+                saida.write(b" ")
+                if pagina and chave == "/Parent":
+                    saida.write(b"%d 0 R" % self.ID_PAGINAS)
+                else:
+                    self._serializar(valor, writer, numeros, saida)
+                saida.write(b"\n")
+            if fluxo:
+                saida.write(b"/Length %d\n>>\nstream\n" % len(objeto._data))
+                saida.write(objeto._data)
+                saida.write(b"\nendstream")
+            else:
+                saida.write(b">>")
+        elif isinstance(objeto, ArrayObject):
+            saida.write(b"[")
+            for item in objeto:
+                saida.write(b" ")
+                self._serializar(item, writer, numeros, saida)
+            saida.write(b" ]")
+        else:
+            objeto.write_to_stream(saida)
+
+    def _gravar_direto(self, numero, dados):
+        self._entradas[numero] = (1, self._stream.tell(), 0)
+        self._stream.write(b"%d 0 obj\n" % numero)
+        self._stream.write(dados)
+        self._stream.write(b"\nendobj\n")
+
+    def adicionar_paginas(self, writer, fixos=None):
+        """
+        Grava as páginas de um writer no fim do documento.
+
+        Depois da chamada o writer pode ser descartado: nada dele é mantido.
+        
+        Args:
+            writer (PdfWriter): Writer com as páginas do bloco
+            fixos (dict): idnum no writer -> número na saída de objetos que já foram gravados
+                em um bloco anterior e não devem ser gravados de novo
+        
+        Returns:
+            dict: idnum no writer -> número na saída de cada objeto gravado ou reaproveitado
+        """
+        writer._resolve_links()
+        numeros = dict(fixos or {})
+        em_andamento = set()
+        comuns = []  # (número, bytes) dos objetos que vão para os fluxos de objetos
+
+        def gravar(idnum, objeto):
+            saida = BytesIO()
+            pagina = self._eh_pagina(objeto)
+            self._serializar(objeto, writer, numeros, saida, pagina=pagina)
+            dados = saida.getvalue()
+            numero = numeros.get(idnum)
+            if numero is None:
+                # Páginas nunca são unidas: cada uma precisa do próprio objeto na árvore
+                chave = None if pagina else hashlib.sha256(dados).digest()
+                existente = self._hashes.get(chave)
+                if existente is not None:
+                    numeros[idnum] = existente
+                    self.objetos_reaproveitados += 1
+                    return
+                numero = numeros[idnum] = self._reservar()
+                if chave is not None:
+                    self._hashes[chave] = numero
+            if self.fluxos_objetos and not isinstance(objeto, StreamObject):
+                comuns.append((numero, dados))
+            else:
+                self._gravar_direto(numero, dados)
+
+        # Busca em profundidade: os filhos são gravados antes, para que o objeto seja
+        # serializado já com os números definitivos. Em ciclos (anotação -> página), o
+        # número do objeto em andamento é reservado antes do conteúdo
+        for pagina in writer.pages:
+            id_pagina = pagina.indirect_reference.idnum
+            pilha = [[id_pagina, None, None]]
+            while pilha:
+                item = pilha[-1]
+                idnum, objeto, filhos = item
+                if filhos is None:
+                    objeto = writer._objects[idnum - 1] if 0 < idnum <= len(writer._objects) else None
+                    if idnum in numeros or objeto is None:
+                        pilha.pop()
+                        continue
+                    em_andamento.add(idnum)
+                    item[1] = objeto
+                    item[2] = filhos = [r.idnum for r in self._referencias(objeto) if r.pdf is writer]
+                while filhos:
+                    filho = filhos.pop()
+                    if filho in numeros:
+                        continue
+                    if filho in em_andamento:
+                        numeros[filho] = self._reservar()
+                        continue
+                    pilha.append([filho, None, None])
+                    break
+                else:
+                    pilha.pop()
+                    em_andamento.discard(idnum)
+                    gravar(idnum, objeto)
+            # A página pode ter sido gravada antes, como destino de um link de outra página
+            self._paginas.append(numeros[id_pagina])
+
+        for inicio in range(0, len(comuns), EscritorPdf.OBJETOS_POR_FLUXO):
+            grupo = comuns[inicio:inicio + EscritorPdf.OBJETOS_POR_FLUXO]
+            id_fluxo = self._reservar()
+            for indice, (numero, _) in enumerate(grupo):
+                self._entradas[numero] = (2, id_fluxo, indice)
+            fluxo = BytesIO()
+            _montar_fluxo_objetos(grupo, self.nivel_compressao).write_to_stream(fluxo)
+            self._gravar_direto(id_fluxo, fluxo.getvalue())
+        return numeros
+
+    def _finalizar(self):
+        """Grava a árvore de páginas, o catálogo e a tabela de referências."""
+        kids = b" ".join(b"%d 0 R" % numero for numero in self._paginas)
+        self._gravar_direto(self.ID_PAGINAS, b"<<\n/Type /Pages\n/Kids [ " + kids + b" ]\n/Count %d\n>>" % len(self._paginas))
+        self._gravar_direto(self.ID_CATALOGO, b"<<\n/Type /Catalog\n/Pages %d 0 R\n>>" % self.ID_PAGINAS)
+
+        if self.fluxos_objetos:
+            raiz = IndirectObject(self.ID_CATALOGO, 0, None)
+            _gravar_tabela_xref(self._stream, self._entradas, self._proximo_id, {NameObject("/Root"): raiz},
+                                self.nivel_compressao)
+            return
+
+        posicao_xref = self._stream.tell()
+        linhas = [b"xref\n0 %d\n0000000000 65535 f \n" % self._proximo_id]
+        for numero in range(1, self._proximo_id):
+            _, deslocamento, _ = self._entradas.get(numero, (0, 0, 0))
+            linhas.append(b"%010d 00000 n \n" % deslocamento if numero in self._entradas else b"0000000000 00000 f \n")
+        self._stream.write(b"".join(linhas))
+        self._stream.write(b"trailer\n<<\n/Size %d\n/Root %d 0 R\n>>\nstartxref\n%d\n%%%%EOF\n"
+                           % (self._proximo_id, self.ID_CATALOGO, posicao_xref))
+
+
+def comparar_fluxos_objetos(caminhos_pdf, repeticoes=3, callback=None):
+    """
+    Mede o efeito dos fluxos de objetos no tamanho e no tempo de gravação de cada PDF.
+
+    Cada arquivo é regravado em memória com e sem fluxos de objetos; o tempo considerado
+    é o menor entre as repetições.
+    
+    Args:
+        caminhos_pdf (list): PDFs usados na comparação
+        repeticoes (int): Quantidade de gravações por modo
+        callback (callable): Função de log
+    
+    Returns:
+        list: Um dict por arquivo com "arquivo", "objetos", "tamanho_classico", "tamanho_fluxos",
+        "tempo_classico" e "tempo_fluxos"
+    """
+    import time
+
+    def log(msg):
+        if callback:
+            callback(msg)
+        else:
+            print(msg)
+
+    resultados = []
+    for caminho in caminhos_pdf:
+        resultado = {"arquivo": os.path.basename(caminho)}
+        with abrir_pdf_leitura(caminho) as leitor:
+            for modo, fluxos_objetos in (("classico", False), ("fluxos", True)):
+                melhor_tempo = None
+                for _ in range(repeticoes):
+                    inicio = time.perf_counter()
+                    escritor = EscritorPdf(fluxos_objetos=fluxos_objetos)
+                    for pagina in leitor.pages:
+                        escritor.add_page(pagina)
+                    saida = BytesIO()
+                    escritor.write(saida)
+                    tempo = time.perf_counter() - inicio
+                    melhor_tempo = tempo if melhor_tempo is None else min(melhor_tempo, tempo)
+                resultado[f"tamanho_{modo}"] = saida.tell()
+                resultado[f"tempo_{modo}"] = melhor_tempo
+                resultado["objetos"] = sum(objeto is not None for objeto in escritor._objects)
+        resultados.append(resultado)
+
+    log(f"{'Arquivo':<24}{'Objetos':>9}{'Clássico (KB)':>15}{'Fluxos (KB)':>13}{'Redução':>9}{'Tempo (s)':>17}")
+    for r in resultados:
+        reducao = 1 - r["tamanho_fluxos"] / r["tamanho_classico"] if r["tamanho_classico"] else 0
+        log(f"{r['arquivo'][:23]:<24}{r['objetos']:>9}{r['tamanho_classico'] / 1024:>15.1f}{r['tamanho_fluxos'] / 1024:>13.1f}"
+            f"{reducao * 100:>8.1f}%{r['tempo_classico']:>8.2f} -> {r['tempo_fluxos']:.2f}")
+    return resultados
+
+
+# Imagens menores que isso não compensam a recompressão (ícones, marcadores...)
+PIXELS_MINIMOS_IMAGEM = 128 * 128
+BYTES_MINIMOS_IMAGEM = 10 * 1024
+# Redução mínima para que a imagem recomprimida substitua a original
+REDUCAO_MINIMA_IMAGEM = 0.10
+# Resolução alvo das imagens e fator acima do qual elas são reamostradas (150 DPI -> acima de 225 DPI)
+DPI_ALVO_IMAGEM = 150
+FATOR_LIMIAR_DPI = 1.5
+
+# Tabela de quantização de luminância padrão do JPEG (qualidade 50 na escala IJG)
+TABELA_LUMINANCIA_JPEG = [
+    16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99,
+]
+
+# Filtros que apenas empacotam os dados e podem ser desfeitos sem o contexto do PDF
+FILTROS_TRANSPORTE = {
+    "/ASCII85Decode": ASCII85Decode,
+    "/ASCIIHexDecode": ASCIIHexDecode,
+    "/FlateDecode": FlateDecode,
+}
+
+
+def _coletar_imagens(writer, paginas=None):
+    """
+    Lista as imagens (XObjects /Image) usadas pelas páginas de um PdfWriter.
+
+    Percorre os recursos de cada página (ou só das páginas informadas) e dos formulários
+    (XObjects /Form) aninhados. Cada objeto de imagem aparece uma única vez, mesmo que
+    seja usado em várias páginas. Imagens embutidas no conteúdo (inline) não são incluídas.
+    
+    Returns:
+        list: Lista de dicts {"referencia": IndirectObject, "paginas": [números das páginas],
+        "usos": [(dicionário /XObject, nome do recurso)]}
+    """
+    imagens = {}  # idnum -> dict da imagem, mantendo a ordem de aparecimento
+
+    def percorrer(recursos, numero_pagina, visitados):
+        recursos = recursos.get_object() if recursos is not None else None
+        if not isinstance(recursos, DictionaryObject):
+            return
+        xobjects = recursos.get("/XObject")
+        xobjects = xobjects.get_object() if xobjects is not None else None
+        if not isinstance(xobjects, DictionaryObject):
+            return
+
+        for nome, referencia in xobjects.items():
+            if not isinstance(referencia, IndirectObject) or referencia.idnum in visitados:
+                continue
+            objeto = referencia.get_object()
+            if not isinstance(objeto, StreamObject):
+                continue
+
+            if objeto.get("/Subtype") == "/Image":
+                imagem = imagens.setdefault(referencia.idnum, {"referencia": referencia, "paginas": [], "usos": []})
+                if numero_pagina not in imagem["paginas"]:
+                    imagem["paginas"].append(numero_pagina)
+                if not any(dicionario is xobjects and uso == nome for dicionario, uso in imagem["usos"]):
+                    imagem["usos"].append((xobjects, nome))
+            elif objeto.get("/Subtype") == "/Form":
+                percorrer(objeto.get("/Resources"), numero_pagina, visitados | {referencia.idnum})
+
+    for numero_pagina in range(len(writer.pages)) if paginas is None else paginas:
+        percorrer(writer.pages[numero_pagina].get("/Resources"), numero_pagina, set())
+
+    return list(imagens.values())
+
+
+# Tokens do conteúdo de uma página que interessam ao cálculo da matriz de transformação.
+# Strings, hexadecimais e comentários são reconhecidos apenas para serem descartados.
+# Strings literais podem ter parênteses balanceados aninhados, que uma expressão regular
+# não acompanha: aqui só o "(" inicial é reconhecido, e o fim é achado por _fim_string_literal
+_TOKEN_CONTEUDO = re.compile(
+    rb"\("                                # início de string literal
+    rb"|<<|>>|<[0-9A-Fa-f\s]*>"          # dicionário / string hexadecimal
+    rb"|/[^\s/\[\]()<>{}%]*"              # nome
+    rb"|[-+]?(?:\d+\.?\d*|\.\d+)"         # número
+    rb"|[A-Za-z'\"*]+"                   # operador
+    rb"|%[^\r\n]*"                        # comentário
+)
+_FIM_IMAGEM_EMBUTIDA = re.compile(rb"\sEI(?=[\s]|$)")
+_DELIMITADOR_STRING = re.compile(rb"[\\()]")
+
+
+def _fim_string_literal(dados, inicio):
+    """
+    Encontra o fim de uma string literal do conteúdo, como "(a(b)c)".
+
+    Conta a profundidade dos parênteses e ignora os escapados com barra invertida.
+    
+    Args:
+        dados (bytes): Conteúdo decodificado
+        inicio (int): Posição do "(" que abre a string
+    
+    Returns:
+        int: Posição logo após o ")" que fecha a string (ou o fim dos dados, se não fechar)
+    """
+    profundidade = 0
+    posicao = inicio
+    while True:
+        delimitador = _DELIMITADOR_STRING.search(dados, posicao)
+        if delimitador is None:
+            return len(dados)
+        caractere = delimitador.group()
+        posicao = delimitador.end()
+        if caractere == b"\\":
+            posicao += 1  # o caractere escapado não conta
+        elif caractere == b"(":
+            profundidade += 1
+        else:
+            profundidade -= 1
+            if profundidade == 0:
+                return posicao
+
+
+def _multiplicar_matrizes(m1, m2):
+    """Multiplica duas matrizes de transformação do PDF [a b c d e f] (m1 x m2)."""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (
+        a1 * a2 + b1 * c2, a1 * b2 + b1 * d2,
+        c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+        e1 * a2 + f1 * c2 + e2, e1 * b2 + f1 * d2 + f2,
+    )
+
+
+def _posicionamentos_conteudo(dados, recursos, formularios):
+    """
+    Percorre um fluxo de conteúdo e lista onde cada imagem é desenhada.
+
+    Acompanha apenas os operadores q, Q, cm e Do, em uma única passada sobre os bytes,
+    sem montar a lista completa de operações do pypdf. Formulários (XObjects /Form) são
+    resolvidos uma vez e reaproveitados em todas as chamadas, através de formularios.
+    
+    Args:
+        dados (bytes): Conteúdo decodificado
+        recursos: Dicionário /Resources do conteúdo
+        formularios (dict): Cache idnum do formulário -> posicionamentos no espaço do formulário
+    
+    Returns:
+        list: Lista de (idnum da imagem, matriz) com a matriz que leva o quadrado unitário
+        da imagem ao espaço do conteúdo
+    """
+    recursos = recursos.get_object() if recursos is not None else None
+    xobjects = recursos.get("/XObject") if isinstance(recursos, DictionaryObject) else None
+    xobjects = xobjects.get_object() if xobjects is not None else None
+    if not isinstance(xobjects, DictionaryObject):
+        return []
+
+    posicionamentos = []
+    identidade = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+    matriz = identidade
+    pilha = []
+    operandos = []
+    posicao = 0
+    while True:
+        token = _TOKEN_CONTEUDO.search(dados, posicao)
+        if token is None:
+            break
+        posicao = token.end()
+        valor = token.group()
+        primeiro = valor[:1]
+
+        if primeiro == b"(":
+            posicao = _fim_string_literal(dados, token.start())
+        elif primeiro == b"/":
+            operandos.append(valor)
+        elif primeiro in b"+-.0123456789":
+            operandos.append(float(valor))
+        elif primeiro.isalpha() or primeiro in b"'\"*":
+            if valor == b"q":
+                pilha.append(matriz)
+            elif valor == b"Q":
+                matriz = pilha.pop() if pilha else identidade
+            elif valor == b"cm" and len(operandos) >= 6 and all(isinstance(o, float) for o in operandos[-6:]):
+                matriz = _multiplicar_matrizes(tuple(operandos[-6:]), matriz)
+            elif valor == b"Do" and operandos and isinstance(operandos[-1], bytes):
+                referencia = xobjects.get(operandos[-1].decode("latin-1"))
+                if isinstance(referencia, IndirectObject):
+                    objeto = referencia.get_object()
+                    subtipo = objeto.get("/Subtype") if isinstance(objeto, StreamObject) else None
+                    if subtipo == "/Image":
+                        posicionamentos.append((referencia.idnum, matriz))
+                    elif subtipo == "/Form":
+                        if referencia.idnum not in formularios:
+                            formularios[referencia.idnum] = []  # evita recursão em formulários cíclicos
+                            matriz_formulario = tuple(float(v) for v in objeto.get("/Matrix", identidade))
+                            formularios[referencia.idnum] = [
+                                (idnum, _multiplicar_matrizes(m, matriz_formulario))
+                                for idnum, m in _posicionamentos_conteudo(objeto.get_data(), objeto.get("/Resources"), formularios)
+                            ]
+                        posicionamentos.extend(
+                            (idnum, _multiplicar_matrizes(m, matriz)) for idnum, m in formularios[referencia.idnum]
+                        )
+            elif valor == b"ID":
+                # Pula os dados binários da imagem embutida
+                fim = _FIM_IMAGEM_EMBUTIDA.search(dados, posicao)
+                posicao = fim.end() if fim else len(dados)
+            operandos = []
+    return posicionamentos
+
+
+def _medir_imagens_posicionadas(writer, paginas=None):
+    """
+    Calcula o maior tamanho, em polegadas, com que cada imagem aparece nas páginas
+    (todas, ou só os números informados em paginas).
+
+    O tamanho vem da matriz de transformação vigente em cada operador Do, inclusive
+    dentro de formulários. Uma imagem usada em vários lugares fica com o maior tamanho,
+    que é o que exige mais resolução.
+    
+    Returns:
+        dict: idnum da imagem -> [largura em polegadas, altura em polegadas]
+    """
+    tamanhos = {}
+    formularios = {}
+    for pagina in writer.pages if paginas is None else (writer.pages[numero] for numero in paginas):
+        conteudo = pagina.get_contents()
+        if conteudo is None:
+            continue
+        for idnum, (a, b, c, d, _, _) in _posicionamentos_conteudo(conteudo.get_data(), pagina.get("/Resources"), formularios):
+            largura, altura = math.hypot(a, b) / 72, math.hypot(c, d) / 72
+            atual = tamanhos.setdefault(idnum, [0.0, 0.0])
+            atual[0] = max(atual[0], largura)
+            atual[1] = max(atual[1], altura)
+    return tamanhos
+
+
+def _tamanho_alvo_imagem(xobj, tamanho_pol, dpi_alvo, fator_limiar=FATOR_LIMIAR_DPI):
+    """
+    Define as dimensões, em pixels, para as quais uma imagem deve ser reamostrada.
+    
+    Args:
+        xobj (StreamObject): XObject da imagem
+        tamanho_pol (list): [largura, altura] em polegadas com que a imagem é desenhada
+        dpi_alvo (int): Resolução desejada
+        fator_limiar (float): Só reamostra se a resolução passar de dpi_alvo * fator_limiar
+    
+    Returns:
+        tuple: (largura, altura, dpi efetivo), ou None se a imagem deve manter a resolução
+    """
+    if not dpi_alvo or not tamanho_pol or min(tamanho_pol) <= 0:
+        return None
+    largura, altura = xobj.get("/Width", 0), xobj.get("/Height", 0)
+    dpi = min(largura / tamanho_pol[0], altura / tamanho_pol[1])
+    if dpi <= dpi_alvo * fator_limiar:
+        return None
+    escala = dpi_alvo / dpi
+    return max(1, math.ceil(largura * escala)), max(1, math.ceil(altura * escala)), dpi
+
+
+def _chave_cache_imagem(xobj, parametros):
+    """
+    Calcula a chave do cache de recompressão de uma imagem.
+
+    A chave combina o hash do stream bruto da imagem, do seu dicionário (incluindo
+    máscaras e perfis de cor referenciados) e dos parâmetros de recompressão, de modo
+    que duas imagens com a mesma chave produzem exatamente o mesmo resultado.
+    """
+    sha256 = hashlib.sha256(repr(parametros).encode())
+
+    def adicionar(objeto, profundidade):
+        objeto = objeto.get_object() if isinstance(objeto, IndirectObject) else objeto
+        if profundidade > 4:
+            sha256.update(repr(objeto).encode())
+            return
+        if isinstance(objeto, StreamObject):
+            sha256.update(objeto._data)
+        if isinstance(objeto, DictionaryObject):
+            for chave in sorted(objeto):
+                if chave != "/Length":
+                    sha256.update(chave.encode())
+                    adicionar(objeto[chave], profundidade + 1)
+        elif isinstance(objeto, ArrayObject):
+            for item in objeto:
+                adicionar(item, profundidade + 1)
+        else:
+            sha256.update(repr(objeto).encode())
+
+    adicionar(xobj, 0)
+    return sha256.hexdigest()
+
+
+def _preparar_tarefa_imagem(xobj, pixels_minimos=PIXELS_MINIMOS_IMAGEM, bytes_minimos=BYTES_MINIMOS_IMAGEM):
+    """
+    Extrai de um XObject de imagem os dados necessários para recomprimi-lo em outro processo.
+
+    Imagens JPEG simples (/DCTDecode em RGB ou tons de cinza) são enviadas como estão,
+    para que a decodificação também aconteça no processo de trabalho. As demais são
+    decodificadas pelo pypdf e enviadas como pixels. Imagens que não compensam ser
+    recomprimidas são descartadas antes de qualquer decodificação.
+    
+    Returns:
+        tuple: (tarefa, motivo). A tarefa é um dict serializável para _recomprimir_imagem;
+        quando a imagem deve ser mantida, a tarefa é None e motivo explica o porquê
+    """
+    largura, altura = xobj.get("/Width", 0), xobj.get("/Height", 0)
+    if largura * altura < pixels_minimos:
+        return None, f"imagem pequena ({largura}x{altura} px)"
+    if len(xobj._data) < bytes_minimos:
+        return None, f"imagem com apenas {len(xobj._data) / 1024:.1f} KB"
+
+    if isinstance(xobj.get("/Mask"), ArrayObject) or xobj.get("/ImageMask"):
+        return None, "máscara de imagem"
+    if xobj.get("/BitsPerComponent", 8) == 1:
+        return None, "imagem bitonal"
+
+    filtros = xobj.get("/Filter")
+    filtros = [str(f) for f in filtros] if isinstance(filtros, ArrayObject) else ([str(filtros)] if filtros else [])
+    parametros = xobj.get("/DecodeParms")
+    if isinstance(parametros, ArrayObject):
+        parametros = [p for p in parametros if not is_null_or_none(p) and p.get_object()]
+    elif is_null_or_none(parametros):
+        parametros = None
+
+    espaco_cor = xobj.get("/ColorSpace")
+    espaco_cor = espaco_cor.get_object() if espaco_cor is not None else None
+    if isinstance(espaco_cor, ArrayObject) and len(espaco_cor) > 0 and espaco_cor[0] == "/Indexed":
+        # Imagens com paleta costumam ser desenhos e gráficos, que ficam maiores e piores em JPEG
+        return None, "imagem com paleta de cores (desenho)"
+    if isinstance(espaco_cor, ArrayObject) and len(espaco_cor) == 2 and espaco_cor[0] == "/ICCBased":
+        componentes = espaco_cor[1].get_object().get("/N")
+        espaco_cor = {1: "/DeviceGray", 3: "/DeviceRGB"}.get(componentes)
+
+    tamanho_original = len(xobj._data)
+
+    # JPEG, possivelmente envolto em filtros de transporte (ASCII85, Flate...), vai direto ao processo
+    if (
+        filtros
+        and filtros[-1] == "/DCTDecode"
+        and all(f in FILTROS_TRANSPORTE for f in filtros[:-1])
+        and not parametros
+        and espaco_cor in ("/DeviceRGB", "/DeviceGray")
+        and xobj.get("/BitsPerComponent", 8) == 8
+        and "/Decode" not in xobj
+    ):
+        return {"formato": "jpeg", "dados": xobj._data, "filtros": filtros[:-1], "tamanho_original": tamanho_original}, None
+
+    imagem = xobj.decode_as_image()
+    if imagem is None or imagem.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+        return None, f"modo de cor não suportado ({getattr(imagem, 'mode', 'desconhecido')})"
+    tarefa = {"formato": "pixels", "modo": imagem.mode, "tamanho": imagem.size, "dados": imagem.tobytes(),
+              "tamanho_original": tamanho_original}
+    return tarefa, None
+
+
+def _estimar_qualidade_jpeg(imagem):
+    """
+    Estima a qualidade (1-100, escala IJG) de um JPEG pela sua tabela de quantização de luminância.
+    
+    Returns:
+        int: Qualidade estimada, ou None se a tabela não estiver disponível
+    """
+    tabelas = getattr(imagem, "quantization", None)
+    if not tabelas or 0 not in tabelas:
+        return None
+
+    escala = sum(tabelas[0]) * 100 / sum(TABELA_LUMINANCIA_JPEG)
+    if escala <= 0:
+        return 100
+    qualidade = (200 - escala) / 2 if escala <= 100 else 5000 / escala
+    return max(1, min(100, round(qualidade)))
+
+
+def _recomprimir_imagem(tarefa, qualidade, reducao_minima=REDUCAO_MINIMA_IMAGEM):
+    """
+    Decodifica, reamostra (se a tarefa tiver "tamanho_alvo") e recodifica uma imagem em JPEG.
+
+    Executada em um processo separado, recebe e retorna apenas tipos simples. JPEGs que
+    já estão com qualidade igual ou menor que a desejada e não precisam ser reduzidos não
+    são recodificados, e o resultado é descartado se não for pelo menos reducao_minima
+    menor que o original.
+    
+    Returns:
+        dict: {"dados": bytes JPEG, "largura", "altura", "modo"}, ou {"ignorada": motivo}
+    """
+    tamanho_alvo = tarefa.get("tamanho_alvo")
+    if tarefa["formato"] == "jpeg":
+        dados = tarefa["dados"]
+        for filtro in tarefa["filtros"]:
+            dados = FILTROS_TRANSPORTE[filtro].decode(dados)
+        imagem = Image.open(BytesIO(dados))
+
+        # A tabela de quantização é lida do cabeçalho, sem decodificar os pixels
+        qualidade_atual = _estimar_qualidade_jpeg(imagem)
+        if tamanho_alvo is None and qualidade_atual is not None and qualidade_atual <= qualidade:
+            imagem.close()
+            return {"ignorada": f"JPEG com qualidade estimada {qualidade_atual}, já menor ou igual a {qualidade}"}
+        if tamanho_alvo is not None:
+            # Deixa o decodificador JPEG reduzir a escala (1/2, 1/4, 1/8) sem passar do tamanho alvo
+            imagem.draft(imagem.mode, tamanho_alvo)
+    else:
+        imagem = Image.frombytes(tarefa["modo"], tarefa["tamanho"], tarefa["dados"])
+
+    if tamanho_alvo is not None and imagem.size != tamanho_alvo:
+        imagem = imagem.resize(tamanho_alvo, Image.LANCZOS)
+
+    # A transparência fica na /SMask original; aqui só interessam as cores
+    if imagem.mode == "LA":
+        imagem = imagem.convert("L")
+    elif imagem.mode not in ("RGB", "L"):
+        imagem = imagem.convert("RGB")
+
+    saida = BytesIO()
+    imagem.save(saida, "JPEG", quality=qualidade)
+    largura, altura = imagem.size
+    modo = imagem.mode
+    imagem.close()
+
+    dados = saida.getvalue()
+    reducao = 1 - len(dados) / tarefa["tamanho_original"]
+    if reducao < reducao_minima:
+        return {"ignorada": f"recompressão reduziria apenas {reducao * 100:.0f}%"}
+    return {"dados": dados, "largura": largura, "altura": altura, "modo": modo}
+
+
+def _substituir_imagem(writer, referencia, resultado):
+    """Substitui no writer o XObject de imagem pelo JPEG recomprimido, mantendo máscaras e atributos de exibição."""
+    original = referencia.get_object()
+    dados = {
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(resultado["largura"]),
+        NameObject("/Height"): NumberObject(resultado["altura"]),
+        NameObject("/ColorSpace"): NameObject("/DeviceGray" if resultado["modo"] == "L" else "/DeviceRGB"),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+        NameObject("/Filter"): NameObject("/DCTDecode"),
+        "__streamdata__": resultado["dados"],
+    }
+    for chave in ("/SMask", "/Mask", "/Intent", "/Interpolate", "/OC", "/StructParent"):
+        if chave in original:
+            dados[NameObject(chave)] = original.raw_get(chave)
+
+    writer._replace_object(referencia, StreamObject.initialize_from_dictionary(dados))
+
+
+def recomprimir_imagens(writer, qualidade_imagem=30, num_processos=None, memoria_max_mb=512, callback=None,
+                        reducao_minima=REDUCAO_MINIMA_IMAGEM, dpi_alvo=DPI_ALVO_IMAGEM, executor=None,
+                        imagens_gravadas=None):
+    """
+    Recomprime em paralelo todas as imagens de um PdfWriter.
+
+    As imagens são extraídas antes, distribuídas entre processos para decodificação,
+    recodificação em JPEG e, por fim, gravadas de volta no writer. A quantidade de
+    dados enviada aos processos ao mesmo tempo é limitada por memoria_max_mb.
+
+    Imagens idênticas (mesmo conteúdo e mesmos parâmetros) são recomprimidas uma
+    única vez: todas as referências passam a apontar para o mesmo objeto de saída.
+
+    Imagens pequenas, desenhos com paleta, JPEGs que já estão com qualidade menor que
+    a desejada e imagens cuja recompressão não reduz pelo menos reducao_minima do
+    tamanho são mantidas como estão. Cada imagem mantida é listada no log com o motivo.
+
+    Imagens desenhadas com resolução muito acima de dpi_alvo (considerando o tamanho
+    com que aparecem na página) são reamostradas para dpi_alvo antes da recodificação.
+
+    Na compactação em blocos, imagens_gravadas guarda as imagens já gravadas por blocos
+    anteriores: uma imagem encontrada ali não é recomprimida de novo, e fica listada em
+    "reaproveitadas" para que a gravação aponte para o objeto existente.
+    
+    Args:
+        writer (PdfWriter): Writer com as páginas já adicionadas
+        qualidade_imagem (int): Qualidade JPEG (1-100)
+        num_processos (int): Quantidade de processos. Se None, usa um por núcleo
+        memoria_max_mb (int): Limite aproximado, em MB, de dados de imagem em processamento
+        callback (callable): Função de log
+        reducao_minima (float): Fração mínima de redução para substituir a imagem (0.10 = 10%)
+        dpi_alvo (int): Resolução para a qual as imagens são reduzidas. Se None, mantém a resolução
+        executor (ProcessPoolExecutor): Pool já criado, reaproveitado entre chamadas. Se None,
+            cria um pool próprio quando houver mais de um processo
+        imagens_gravadas (dict): Chave da imagem -> número do objeto já gravado na saída
+    
+    Returns:
+        dict: Contagem de imagens {"total", "recomprimidas", "reamostradas", "ignoradas", "erros",
+        "cache_acertos", "cache_falhas", "cache_blocos"}, a lista "motivos_ignoradas" com
+        (número da página, motivo) de cada imagem mantida, "reaproveitadas" (idnum -> número
+        em imagens_gravadas) e "chaves" (idnum -> chave de cada imagem ainda não gravada)
+    """
+    def log(msg):
+        if callback:
+            callback(msg)
+        else:
+            print(msg)
+
+    imagens = _coletar_imagens(writer)
+    estatisticas = {"total": len(imagens), "recomprimidas": 0, "reamostradas": 0, "ignoradas": 0, "erros": 0,
+                    "cache_acertos": 0, "cache_falhas": 0, "cache_blocos": 0, "motivos_ignoradas": [],
+                    "reaproveitadas": {}, "chaves": {}}
+    if not imagens:
+        return estatisticas
+
+    # Tamanho com que cada imagem é desenhada, para calcular a resolução efetiva
+    tamanhos_pol = {}
+    if dpi_alvo:
+        try:
+            tamanhos_pol = _medir_imagens_posicionadas(writer)
+        except Exception as e:
+            log(f"    - Não foi possível medir as imagens nas páginas, resolução mantida: {e}")
+
+    # Agrupa as imagens pelo conteúdo e aponta as cópias para um único objeto
+    parametros = (qualidade_imagem, reducao_minima, dpi_alvo)
+    cache = {}  # chave -> imagem que será recomprimida
+    for imagem in imagens:
+        chave = _chave_cache_imagem(imagem["referencia"].get_object(), parametros)
+        original = cache.get(chave)
+        if original is None:
+            imagem["chave"] = chave
+            cache[chave] = imagem
+            estatisticas["cache_falhas"] += 1
+            continue
+        for xobjects, nome in imagem["usos"]:
+            xobjects[NameObject(nome)] = original["referencia"]
+        original["paginas"].extend(p for p in imagem["paginas"] if p not in original["paginas"])
+        # A cópia pode aparecer maior na página do que a original
+        if imagem["referencia"].idnum in tamanhos_pol:
+            largura, altura = tamanhos_pol[imagem["referencia"].idnum]
+            atual = tamanhos_pol.setdefault(original["referencia"].idnum, [0.0, 0.0])
+            atual[0], atual[1] = max(atual[0], largura), max(atual[1], altura)
+        estatisticas["cache_acertos"] += 1
+
+    imagens = list(cache.values())
+
+    # Os motivos só são exibidos no resumo final: no console, as linhas de progresso
+    # sobrescrevem a linha anterior
+    def ignorar(imagem, motivo):
+        pagina = imagem["paginas"][0] + 1
+        estatisticas["ignoradas"] += 1
+        estatisticas["motivos_ignoradas"].append((pagina, motivo))
+
+    # Resolução efetiva de cada imagem que será reduzida, por idnum
+    dpi_imagens = {}
+    reducoes_dpi = []  # (página, (largura, altura, dpi original)) das imagens substituídas
+
+    def tarefas():
+        for imagem in imagens:
+            try:
+                xobj = imagem["referencia"].get_object()
+                alvo = _tamanho_alvo_imagem(xobj, tamanhos_pol.get(imagem["referencia"].idnum), dpi_alvo)
+                if imagens_gravadas is not None:
+                    # O tamanho final entra na chave: a mesma imagem pode aparecer maior em outro bloco
+                    chave = (imagem["chave"], alvo[:2] if alvo else None)
+                    if chave in imagens_gravadas:
+                        estatisticas["reaproveitadas"][imagem["referencia"].idnum] = imagens_gravadas[chave]
+                        estatisticas["cache_blocos"] += 1
+                        continue
+                    estatisticas["chaves"][imagem["referencia"].idnum] = chave
+                tarefa, motivo = _preparar_tarefa_imagem(xobj)
+                if tarefa is not None and alvo is not None:
+                    tarefa["tamanho_alvo"] = alvo[:2]
+                    dpi_imagens[imagem["referencia"].idnum] = alvo[2]
+            except Exception as e:
+                log(f"    - Erro ao extrair imagem da página {imagem['paginas'][0] + 1}: {e}")
+                estatisticas["erros"] += 1
+                continue
+            if tarefa is None:
+                ignorar(imagem, motivo)
+                continue
+            yield imagem, tarefa
+
+    def concluir(imagem, resultado=None, erro=None):
+        if erro is not None:
+            log(f"    - Erro ao processar imagem na página {imagem['paginas'][0] + 1}: {erro}")
+            estatisticas["erros"] += 1
+        elif "ignorada" in resultado:
+            ignorar(imagem, resultado["ignorada"])
+        else:
+            reamostrada = resultado["largura"] != imagem["referencia"].get_object().get("/Width")
+            _substituir_imagem(writer, imagem["referencia"], resultado)
+            estatisticas["recomprimidas"] += 1
+            # A redução de resolução só é informada depois que a imagem foi de fato substituída
+            if reamostrada:
+                estatisticas["reamostradas"] += 1
+                dpi = dpi_imagens.get(imagem["referencia"].idnum)
+                if dpi is not None:
+                    reducoes_dpi.append((imagem["paginas"][0] + 1, (resultado["largura"], resultado["altura"], dpi)))
+        processadas = (estatisticas["recomprimidas"] + estatisticas["ignoradas"] + estatisticas["erros"]
+                       + estatisticas["cache_blocos"])
+        log(f"    - Compactando imagem {processadas}/{len(imagens)}...")
+
+    if num_processos is None:
+        num_processos = os.cpu_count() or 1
+    num_processos = max(1, min(num_processos, len(imagens)))
+
+    # Com um único processo não compensa criar o pool
+    if executor is None and num_processos == 1:
+        for imagem, tarefa in tarefas():
+            try:
+                resultado = _recomprimir_imagem(tarefa, qualidade_imagem, reducao_minima)
+            except Exception as e:
+                concluir(imagem, erro=e)
+            else:
+                concluir(imagem, resultado)
+    else:
+        limite_bytes = memoria_max_mb * 1048576
+        with nullcontext(executor) if executor is not None else ProcessPoolExecutor(max_workers=num_processos) as executor:
+            pendentes = {}  # futuro -> (imagem, bytes em processamento)
+            em_processamento = 0
+
+            def aguardar(quantidade):
+                nonlocal em_processamento
+                for futuro in as_completed(list(pendentes)):
+                    imagem, tamanho = pendentes.pop(futuro)
+                    em_processamento -= tamanho
+                    try:
+                        concluir(imagem, futuro.result())
+                    except Exception as e:
+                        concluir(imagem, erro=e)
+                    quantidade -= 1
+                    if quantidade <= 0:
+                        break
+
+            for imagem, tarefa in tarefas():
+                tamanho = len(tarefa["dados"])
+                # Espera liberar memória antes de enviar mais imagens
+                while pendentes and em_processamento + tamanho > limite_bytes:
+                    aguardar(1)
+                pendentes[executor.submit(_recomprimir_imagem, tarefa, qualidade_imagem, reducao_minima)] = (imagem, tamanho)
+                em_processamento += tamanho
+
+            aguardar(len(pendentes))
+
+    # Resumo depois da última linha de progresso, para não ser sobrescrito no console
+    resumo_cache = f"{estatisticas['cache_falhas']} distintas, {estatisticas['cache_acertos']} repetidas reaproveitadas"
+    if estatisticas["cache_blocos"]:
+        resumo_cache += f", {estatisticas['cache_blocos']} já gravadas em blocos anteriores"
+    log(f"    - Cache de imagens: {resumo_cache}")
+    if reducoes_dpi:
+        log(f"    - Imagens reduzidas para {dpi_alvo} DPI: {len(reducoes_dpi)}")
+        for pagina, (largura, altura, dpi) in sorted(reducoes_dpi, key=lambda item: item[0]):
+            log(f"        - Página {pagina}: {dpi:.0f} DPI, reduzida para {largura}x{altura} px")
+    if estatisticas["motivos_ignoradas"]:
+        log(f"    - Imagens mantidas sem recompressão: {len(estatisticas['motivos_ignoradas'])}")
+        for pagina, motivo in sorted(estatisticas["motivos_ignoradas"], key=lambda item: item[0]):
+            log(f"        - Página {pagina}: {motivo}")
+
+    return estatisticas
+
+
+# Documentos com mais páginas que isso são compactados em blocos, para limitar a memória
+LIMITE_PAGINAS_JANELAS = 150
+PAGINAS_POR_JANELA = 50
+
+# O que cada perfil de limpeza remove das páginas, anotações e XObjects antes da gravação.
+# O catálogo do documento original (/OpenAction, /Names, /AcroForm, /Metadata) não é
+# copiado pelo add_page, então a saída já nasce sem ele
+PERFIS_LIMPEZA = {
+    "nenhum": frozenset(),
+    "padrao": frozenset({"miniaturas", "pieceinfo", "javascript"}),
+    "maximo": frozenset({"miniaturas", "pieceinfo", "javascript", "metadados_xmp"}),
+}
+
+
+def _remover_objetos_inalcancaveis(writer):
+    """
+    Descarta do writer os objetos que não podem ser alcançados a partir do catálogo,
+    do dicionário /Info ou da criptografia.
+
+    Diferente de compress_identical_objects, que só remove objetos que ninguém referencia,
+    aqui a busca segue as referências, então cadeias inteiras de objetos órfãos (uma
+    imagem removida e sua máscara, por exemplo) saem de uma só vez.
+    
+    Returns:
+        int: Quantidade de objetos removidos
+    """
+    raizes = [writer.root_object.indirect_reference]
+    for objeto in (getattr(writer, "_info_obj", None), getattr(writer, "_encrypt_entry", None)):
+        referencia = objeto if isinstance(objeto, IndirectObject) else getattr(objeto, "indirect_reference", None)
+        if referencia is not None:
+            raizes.append(referencia)
+
+    alcancados = set()
+    pilha = list(raizes)
+    while pilha:
+        objeto = pilha.pop()
+        if isinstance(objeto, IndirectObject):
+            if objeto.pdf is not writer or objeto.idnum in alcancados:
+                continue
+            alcancados.add(objeto.idnum)
+            objeto = writer._objects[objeto.idnum - 1] if objeto.idnum <= len(writer._objects) else None
+        if isinstance(objeto, DictionaryObject):
+            pilha.extend(objeto.values())
+        elif isinstance(objeto, ArrayObject):
+            pilha.extend(objeto)
+
+    removidos = 0
+    for indice, objeto in enumerate(writer._objects):
+        if objeto is not None and indice + 1 not in alcancados:
+            writer._objects[indice] = None
+            removidos += 1
+    return removidos
+
+
+def limpar_objetos_pdf(writer, perfil="padrao", callback=None):
+    """
+    Remove do writer dados que não aparecem na impressão nem na tela e descarta os objetos
+    que ficaram sem referência.
+
+    Conforme o perfil, remove das páginas e das imagens e formulários usados nelas as
+    miniaturas (/Thumb), os dados privados de aplicativos (/PieceInfo), as ações
+    automáticas e JavaScript de páginas e anotações (/AA, /A) e os metadados XMP (/Metadata).
+    Entradas do catálogo não são tratadas: o writer é montado só com as páginas, sem o
+    catálogo do original. O dicionário /Info é sempre mantido.
+    
+    Args:
+        writer (PdfWriter): Writer com as páginas já adicionadas
+        perfil (str): Chave de PERFIS_LIMPEZA ("nenhum", "padrao" ou "maximo")
+        callback (callable): Função de log
+    
+    Returns:
+        dict: Quantidade de itens removidos por tipo e "objetos_orfaos"
+    """
+    def log(msg):
+        if callback:
+            callback(msg)
+        else:
+            print(msg)
+
+    opcoes = PERFIS_LIMPEZA[perfil]
+    removidos = {"miniaturas": 0, "pieceinfo": 0, "javascript": 0, "metadados_xmp": 0, "objetos_orfaos": 0}
+    if not opcoes:
+        return removidos
+
+    def remover(dicionario, chave, tipo):
+        if tipo in opcoes and chave in dicionario:
+            del dicionario[chave]
+            removidos[tipo] += 1
+
+    def acao_javascript(acao):
+        acao = acao.get_object() if acao is not None else None
+        return isinstance(acao, DictionaryObject) and acao.get("/S") == "/JavaScript"
+
+    xobjects_vistos = set()
+    for pagina in writer.pages:
+        remover(pagina, "/Thumb", "miniaturas")
+        remover(pagina, "/PieceInfo", "pieceinfo")
+        remover(pagina, "/Metadata", "metadados_xmp")
+        if "javascript" in opcoes:
+            remover(pagina, "/AA", "javascript")
+
+        anotacoes = pagina.get("/Annots")
+        anotacoes = anotacoes.get_object() if anotacoes is not None else None
+        for anotacao in anotacoes if isinstance(anotacoes, ArrayObject) else []:
+            anotacao = anotacao.get_object()
+            if not isinstance(anotacao, DictionaryObject):
+                continue
+            if "javascript" in opcoes:
+                remover(anotacao, "/AA", "javascript")
+                if acao_javascript(anotacao.get("/A")):
+                    remover(anotacao, "/A", "javascript")
+
+        # Imagens e formulários também podem carregar XMP e dados privados
+        recursos = pagina.get("/Resources")
+        recursos = recursos.get_object() if recursos is not None else None
+        xobjects = recursos.get("/XObject") if isinstance(recursos, DictionaryObject) else None
+        xobjects = xobjects.get_object() if xobjects is not None else None
+        for referencia in xobjects.values() if isinstance(xobjects, DictionaryObject) else []:
+            if not isinstance(referencia, IndirectObject) or referencia.idnum in xobjects_vistos:
+                continue
+            xobjects_vistos.add(referencia.idnum)
+            xobj = referencia.get_object()
+            if isinstance(xobj, DictionaryObject):
+                remover(xobj, "/PieceInfo", "pieceinfo")
+                remover(xobj, "/Metadata", "metadados_xmp")
+
+    removidos["objetos_orfaos"] = _remover_objetos_inalcancaveis(writer)
+
+    itens = [f"{quantidade} {nome}" for nome, quantidade in (
+        ("miniaturas", removidos["miniaturas"]), ("dados privados", removidos["pieceinfo"]),
+        ("scripts", removidos["javascript"]), ("metadados XMP", removidos["metadados_xmp"]),
+        ("objetos órfãos", removidos["objetos_orfaos"]),
+    ) if quantidade]
+    log(f"    - Limpeza ({perfil}): {', '.join(itens) if itens else 'nada a remover'}")
+    return removidos
+
+
+# Operador do conteúdo -> categoria de /Resources cujo nome ele usa, e a posição do nome
+# entre os operandos (o nome da fonte vem antes do tamanho em "/F1 12 Tf")
+_OPERADORES_RECURSOS = {
+    b"Tf": ("/Font", 0),
+    b"Do": ("/XObject", -1),
+    b"cs": ("/ColorSpace", -1),
+    b"CS": ("/ColorSpace", -1),
+    b"scn": ("/Pattern", -1),
+    b"SCN": ("/Pattern", -1),
+    b"gs": ("/ExtGState", -1),
+    b"sh": ("/Shading", -1),
+}
+
+
+def _recursos_usados_conteudo(dados, usados):
+    """
+    Acumula em usados os nomes de recursos referenciados por um fluxo de conteúdo.
+
+    Usa a mesma varredura de tokens de _posicionamentos_conteudo. O espaço de cores de
+    imagens embutidas (/CS ou /ColorSpace entre BI e ID) também é considerado.
+    
+    Args:
+        dados (bytes): Conteúdo decodificado
+        usados (dict): Categoria de /Resources -> conjunto de nomes usados
+    """
+    def nome_recurso(valor):
+        # Nomes podem ter caracteres escapados (/F#20a); a chave no dicionário vem decodificada
+        valor = NameObject.unnumber(valor) if b"#" in valor else valor
+        try:
+            return valor.decode("utf-8")
+        except UnicodeDecodeError:
+            return valor.decode("latin-1")
+
+    operandos = []
+    imagem_embutida = False
+    posicao = 0
+    while True:
+        token = _TOKEN_CONTEUDO.search(dados, posicao)
+        if token is None:
+            break
+        posicao = token.end()
+        valor = token.group()
+        primeiro = valor[:1]
+
+        if primeiro == b"(":
+            posicao = _fim_string_literal(dados, token.start())
+        elif primeiro == b"/":
+            operandos.append(valor)
+        elif primeiro in b"+-.0123456789":
+            operandos.append(None)
+        elif primeiro.isalpha() or primeiro in b"'\"*":
+            if valor == b"BI":
+                imagem_embutida = True
+                operandos = []
+                continue
+            elif valor == b"ID":
+                for chave, nome in zip(operandos, operandos[1:]):
+                    if chave in (b"/CS", b"/ColorSpace") and nome is not None:
+                        usados.setdefault("/ColorSpace", set()).add(nome_recurso(nome))
+                # Pula os dados binários da imagem embutida
+                fim = _FIM_IMAGEM_EMBUTIDA.search(dados, posicao)
+                posicao = fim.end() if fim else len(dados)
+                imagem_embutida = False
+            elif imagem_embutida:
+                # Valores como true/false no dicionário da imagem embutida
+                operandos.append(None)
+                continue
+            elif valor in _OPERADORES_RECURSOS:
+                categoria, posicao_nome = _OPERADORES_RECURSOS[valor]
+                if operandos and operandos[posicao_nome] is not None:
+                    usados.setdefault(categoria, set()).add(nome_recurso(operandos[posicao_nome]))
+            if not imagem_embutida:
+                operandos = []
+
+
+def podar_recursos_pagina(pagina):
+    """
+    Remove do /Resources de uma página os recursos que o conteúdo dela não usa.
+
+    Ao extrair uma página, o dicionário de recursos compartilhado pelo documento vem
+    inteiro, com fontes e imagens de outras páginas. Aqui ficam apenas as fontes,
+    XObjects, espaços de cores, padrões, sombreamentos e estados gráficos citados no
+    conteúdo. Formulários sem /Resources próprio herdam os da página, por isso o
+    conteúdo deles também é lido. Deve ser aplicada à página de um PdfWriter que não
+    compartilhe o dicionário de recursos com outras páginas; os objetos que deixam de
+    ser referenciados ficam para _remover_objetos_inalcancaveis.
+    
+    Args:
+        pagina (PageObject): Página do PdfWriter
+    
+    Returns:
+        int: Quantidade de recursos removidos
+    """
+    recursos = pagina.get("/Resources")
+    recursos = recursos.get_object() if recursos is not None else None
+    conteudo = pagina.get_contents()
+    if not isinstance(recursos, DictionaryObject) or conteudo is None:
+        return 0
+
+    usados = {}
+    _recursos_usados_conteudo(conteudo.get_data(), usados)
+
+    # Formulários e fontes Type3 sem recursos próprios usam os da página
+    xobjects = recursos.get("/XObject")
+    xobjects = xobjects.get_object() if xobjects is not None else None
+    pendentes = list(usados.get("/XObject", ()))
+    vistos = set()
+    while pendentes and isinstance(xobjects, DictionaryObject):
+        nome = pendentes.pop()
+        xobj = xobjects.get(nome)
+        xobj = xobj.get_object() if xobj is not None else None
+        if nome in vistos or not isinstance(xobj, StreamObject):
+            continue
+        vistos.add(nome)
+        if xobj.get("/Subtype") == "/Form" and "/Resources" not in xobj:
+            antes = set(usados.get("/XObject", ()))
+            _recursos_usados_conteudo(xobj.get_data(), usados)
+            pendentes.extend(usados.get("/XObject", set()) - antes)
+    fontes = recursos.get("/Font")
+    fontes = fontes.get_object() if fontes is not None else None
+    if isinstance(fontes, DictionaryObject):
+        for nome in usados.get("/Font", ()):
+            fonte = fontes.get(nome)
+            fonte = fonte.get_object() if fonte is not None else None
+            if isinstance(fonte, DictionaryObject) and fonte.get("/Subtype") == "/Type3" and "/Resources" not in fonte:
+                return 0
+
+    novos_recursos = DictionaryObject(recursos)
+    removidos = 0
+    for categoria in ("/Font", "/XObject", "/ColorSpace", "/Pattern", "/Shading", "/ExtGState"):
+        dicionario = recursos.get(categoria)
+        dicionario = dicionario.get_object() if dicionario is not None else None
+        if not isinstance(dicionario, DictionaryObject):
+            continue
+        nomes = usados.get(categoria, set())
+        mantidos = DictionaryObject({chave: valor for chave, valor in dicionario.items() if chave in nomes})
+        removidos += len(dicionario) - len(mantidos)
+        novos_recursos[NameObject(categoria)] = mantidos
+
+    if removidos:
+        pagina[NameObject("/Resources")] = novos_recursos
+    return removidos
+
+
+def _compactar_paginas(reader, inicio, fim, qualidade_imagem, nivel_compressao, num_processos,
+                       memoria_max_mb, reducao_minima_imagem, dpi_alvo, perfil_limpeza, callback,
+                       executor=None, imagens_gravadas=None):
+    """
+    Compacta as páginas [inicio, fim) de um PdfReader em um writer novo.
+
+    É o trabalho de reduzir_tamanho_pdf sobre um intervalo de páginas: comprime o conteúdo,
+    recomprime as imagens e limpa objetos sem uso. executor e imagens_gravadas são
+    repassados a recomprimir_imagens.
+    
+    Returns:
+        tuple: (EscritorPdf com as páginas compactadas, estatísticas das imagens ou None)
+    """
+    total_pages = len(reader.pages)
+    writer = EscritorPdf()
+
+    for i in range(inicio, fim):
+        callback(f"    - Compactando página {i+1}/{total_pages}...")
+
+        # Adiciona a página ao writer PRIMEIRO e processa a cópia que pertence ao writer
+        writer_page = writer.add_page(reader.pages[i])
+
+        # Comprime streams de conteúdo
+        try:
+            writer_page.compress_content_streams(level=nivel_compressao)
+        except Exception as e:
+            handle_error("reduzir_tamanho_pdf", f"Erro ao comprimir página {i+1}: {e}", None)
+
+    # Recomprime as imagens de todas as páginas de uma vez, em paralelo
+    estatisticas = None
+    try:
+        estatisticas = recomprimir_imagens(writer, qualidade_imagem, num_processos, memoria_max_mb, callback=callback,
+                                           reducao_minima=reducao_minima_imagem, dpi_alvo=dpi_alvo,
+                                           executor=executor, imagens_gravadas=imagens_gravadas)
+        callback(f"    - Imagens recomprimidas: {estatisticas['recomprimidas']} de {estatisticas['total']} "
+                 f"({estatisticas['reamostradas']} reamostradas), mantidas: {estatisticas['ignoradas']}")
+    except Exception as e:
+        handle_error("reduzir_tamanho_pdf", f"Erro ao processar imagens: {e}", None)
+
+    # Remove miniaturas, scripts, metadados e objetos que ficaram sem uso
+    try:
+        limpar_objetos_pdf(writer, perfil_limpeza, callback=callback)
+    except Exception as e:
+        handle_error("reduzir_tamanho_pdf", f"Erro ao limpar objetos do PDF: {e}", None)
+
+    # Aplica compressão adicional no writer
+    try:
+        writer.compress_identical_objects()
+    except Exception as e:
+        handle_error("reduzir_tamanho_pdf", f"Erro ao comprimir objetos idênticos: {e}", None)
+
+    return writer, estatisticas
+
+
+def reduzir_tamanho_pdf(input_pdf, output_pdf, qualidade_imagem=30, nivel_compressao=7, callback=None, tempo_total=None,
+                        num_processos=None, memoria_max_mb=512, reducao_minima_imagem=REDUCAO_MINIMA_IMAGEM,
+                        dpi_alvo=DPI_ALVO_IMAGEM, perfil_limpeza="padrao", paginas_por_janela=None):
+    """
+    Reduz o tamanho de um arquivo PDF comprimindo conteúdo e imagens.
+
+    Documentos grandes são processados em blocos de páginas: cada bloco é compactado
+    com um leitor próprio, gravado direto na saída pelo GravadorPdfIncremental e
+    liberado antes do próximo. Assim o pico de memória depende do tamanho do bloco, e
+    não da quantidade de páginas do original. Os blocos usam o mesmo pool de processos,
+    e imagens repetidas em blocos diferentes são recomprimidas e gravadas uma única vez.
+    
+    Args:
+        input_pdf (str): Caminho do arquivo PDF de entrada
+        output_pdf (str | BytesIO): Caminho do arquivo PDF de saída, ou fluxo binário onde o
+            resultado é gravado (para entregá-lo a outra etapa sem passar pelo disco)
+        qualidade_imagem (int): Qualidade das imagens (1-100, padrão: 40)
+        nivel_compressao (int): Nível de compressão (1-9, padrão: 9)
+        num_processos (int): Processos usados na recompressão das imagens. Se None, usa um por núcleo
+        memoria_max_mb (int): Limite aproximado, em MB, de dados de imagem em processamento
+        reducao_minima_imagem (float): Redução mínima (0.10 = 10%) para substituir uma imagem
+        dpi_alvo (int): Resolução máxima das imagens na página. Se None, não reamostra
+        perfil_limpeza (str): Dados removidos antes da gravação (ver PERFIS_LIMPEZA)
+        paginas_por_janela (int): Páginas por bloco. Se None, usa blocos de PAGINAS_POR_JANELA
+            apenas em documentos com mais de LIMITE_PAGINAS_JANELAS páginas; 0 desativa os blocos
+    
+    Returns:
+        bool: True se bem-sucedido, False caso contrário
+    """
+    import gc
+    import time
+
+    tempo_total = 0
+
+    def log(msg):
+        if callback:
+            callback(msg)
+        else:
+            print(msg)
+
+    tempo_inicio = time.time()
+    opcoes = (qualidade_imagem, nivel_compressao, num_processos, memoria_max_mb, reducao_minima_imagem,
+              dpi_alvo, perfil_limpeza, log)
+    
+    try:
+        # Abre e lê o PDF original no próprio local, sem cópia. O mapeamento em memória só é
+        # usado quando já se sabe que o documento será processado de uma vez
+        with abrir_pdf_leitura(input_pdf, mapear=paginas_por_janela == 0) as reader:
+            total_pages = len(reader.pages)
+            if paginas_por_janela is None:
+                paginas_por_janela = PAGINAS_POR_JANELA if total_pages > LIMITE_PAGINAS_JANELAS else 0
+            if not paginas_por_janela or paginas_por_janela >= total_pages:
+                writer, _ = _compactar_paginas(reader, 0, total_pages, *opcoes)
+                # Salva o arquivo (caminho ou fluxo binário)
+                writer.write(output_pdf)
+                del writer
+
+        if paginas_por_janela and paginas_por_janela < total_pages:
+            janelas = [(inicio, min(inicio + paginas_por_janela, total_pages))
+                       for inicio in range(0, total_pages, paginas_por_janela)]
+            log(f"    - Processando {total_pages} páginas em {len(janelas)} blocos de até {paginas_por_janela}")
+
+            # Um único pool para todos os blocos, e um cache de imagens que sobrevive a eles
+            processos = num_processos or os.cpu_count() or 1
+            imagens_gravadas = {}
+            with (ProcessPoolExecutor(max_workers=processos) if processos > 1 else nullcontext()) as executor, \
+                    GravadorPdfIncremental(output_pdf) as gravador:
+                for inicio, fim in janelas:
+                    # Um leitor novo por bloco: o cache de objetos do anterior é descartado.
+                    # Sem mapeamento, só os objetos do bloco são lidos para a memória
+                    with abrir_pdf_leitura(input_pdf, mapear=False) as reader:
+                        writer, estatisticas = _compactar_paginas(reader, inicio, fim, *opcoes, executor=executor,
+                                                                  imagens_gravadas=imagens_gravadas)
+                    estatisticas = estatisticas or {"reaproveitadas": {}, "chaves": {}}
+                    numeros = gravador.adicionar_paginas(writer, fixos=estatisticas["reaproveitadas"])
+                    for idnum, chave in estatisticas["chaves"].items():
+                        if numeros.get(idnum):
+                            imagens_gravadas[chave] = numeros[idnum]
+                    del writer
+                    gc.collect()
+            log(f"    - Blocos gravados: {len(janelas)}, objetos repetidos entre blocos gravados uma única vez: "
+                f"{gravador.objetos_reaproveitados}")
+
+        tempo_total = time.time() - tempo_inicio  # Calcula o tempo total
+        log(f"- Compactação finalizada.\nTempo de execução: {tempo_total:.2f} segundos")
+        # PDF reduzido salvo com sucesso
+        return True, tempo_total
+        
+    except FileNotFoundError:
+        msg_erro = f"Arquivo não encontrado: {input_pdf}\nVerifique se o arquivo ainda existe no local especificado."
+        log(f"• Erro: {msg_erro}")
+        handle_error("Compactar PDF", msg_erro, None)
+        return False, 0
+    except PdfStreamError:
+        msg_erro = "O arquivo selecionado não é um PDF válido ou está corrompido.\nPor favor, verifique o arquivo e tente novamente."
+        handle_error("Compactar PDF", msg_erro, None)
+        return False, 0
+    except PermissionError:
+        msg_erro = "O arquivo PDF está sendo utilizado por outro programa.\nFeche o arquivo e tente novamente."
+        handle_error("Compactar PDF", msg_erro, None)
+        return False, 0
+    except Exception as e:
+        log(f"• Erro ao compactar o PDF: {e}")
+        handle_error("Compactar PDF", f": {e}", None)
+        return False, 0
+
+
+# Configurações testadas no modo "caber em um único arquivo", da melhor para a pior qualidade
+ESCADA_COMPRESSAO = (
+    (60, 150), (45, 150), (30, 150), (25, 120), (20, 120), (15, 100), (10, 100), (10, 72),
+)
+# Quantidade de imagens decodificadas e testadas para estimar o tamanho final
+AMOSTRAS_IMAGENS = 12
+# Tamanho a partir do qual o PDF compactado é dividido em partes
+LIMITE_ARQUIVO_UNICO_MB = 4.9
+# Folga aplicada ao alvo para compensar o erro da estimativa
+MARGEM_ESTIMATIVA = 0.92
+# Páginas testadas na análise prévia e redução abaixo da qual a compactação não compensa
+AMOSTRAS_PAGINAS = 24
+REDUCAO_MINIMA_COMPACTACAO = 0.05
+
+
+def _testar_imagem_amostra(tarefa, configuracoes):
+    """
+    Codifica uma imagem de amostra em várias configurações, decodificando-a uma única vez.
+    
+    Args:
+        tarefa (dict): Tarefa gerada por _preparar_tarefa_imagem
+        configuracoes (list): Lista de (qualidade, tamanho alvo em pixels ou None)
+    
+    Returns:
+        list: Tamanho em bytes do JPEG gerado em cada configuração
+    """
+    if tarefa["formato"] == "jpeg":
+        dados = tarefa["dados"]
+        for filtro in tarefa["filtros"]:
+            dados = FILTROS_TRANSPORTE[filtro].decode(dados)
+        imagem = Image.open(BytesIO(dados))
+        # Decodifica direto na escala reduzida que atende à maior configuração
+        imagem.draft(imagem.mode, (max(t[0] for _, t in configuracoes), max(t[1] for _, t in configuracoes)))
+        imagem.load()
+    else:
+        imagem = Image.frombytes(tarefa["modo"], tarefa["tamanho"], tarefa["dados"])
+    if imagem.mode not in ("RGB", "L"):
+        imagem = imagem.convert("L" if imagem.mode == "LA" else "RGB")
+
+    tamanhos = []
+    for qualidade, tamanho_alvo in configuracoes:
+        reduzida = imagem.resize(tamanho_alvo, Image.LANCZOS) if tamanho_alvo and tamanho_alvo != imagem.size else imagem
+        saida = BytesIO()
+        reduzida.save(saida, "JPEG", quality=qualidade)
+        tamanhos.append(saida.tell())
+    imagem.close()
+    return tamanhos
+
+
+def _amostrar_imagens(reader, escada, amostras, callback=None, paginas=None):
+    """
+    Testa a recompressão de uma amostra das imagens de um PDF em cada configuração da escada.
+
+    Imagens repetidas contam uma vez, como na compactação. As que a compactação manteria
+    por serem pequenas demais não são candidatas. Cada amostra é decodificada uma única
+    vez e codificada em todas as configurações.
+
+    Com paginas, só as imagens dessas páginas são consideradas. Uma imagem usada em uma
+    única página da amostra representa as das páginas não vistas e recebe peso
+    total de páginas / páginas da amostra; uma usada em várias (um logotipo) conta uma vez.
+    
+    Args:
+        reader (PdfReader): PDF aberto
+        escada (tuple): Configurações (qualidade, dpi)
+        amostras (int): Quantidade máxima de imagens testadas
+        callback (callable): Função de log
+        paginas (list): Números das páginas amostradas. Se None, todas as páginas
+    
+    Returns:
+        dict: {"bytes_imagens": bytes de todas as imagens no arquivo, "bytes_mantidos": bytes das
+        imagens que não mudam, "candidatas": lista de dicts com "original", "pixels_origem",
+        "peso", "dimensoes" (por degrau) e "testes" (bytes por degrau, ou None se não testada),
+        "pixels_testados", "tempo_testes" (segundos gastos decodificando e codificando)}
+    """
+    import time
+
+    def log(msg):
+        if callback:
+            callback(msg)
+        else:
+            print(msg)
+
+    imagens = _coletar_imagens(reader, paginas)
+    tamanhos_pol = _medir_imagens_posicionadas(reader, paginas)
+    escala = len(reader.pages) / len(paginas) if paginas else 1
+
+    def peso(imagem):
+        return escala if len(imagem["paginas"]) == 1 else 1
+
+    resultado = {"bytes_imagens": sum(len(i["referencia"].get_object()._data) * peso(i) for i in imagens),
+                 "bytes_mantidos": 0, "candidatas": [], "pixels_testados": 0, "tempo_testes": 0.0}
+
+    distintas = {}
+    for imagem in imagens:
+        xobj = imagem["referencia"].get_object()
+        distintas.setdefault(_chave_cache_imagem(xobj, ()), (xobj, tamanhos_pol.get(imagem["referencia"].idnum), peso(imagem)))
+
+    candidatas = resultado["candidatas"]
+    for xobj, tamanho_pol, peso_imagem in distintas.values():
+        largura, altura = xobj.get("/Width", 0), xobj.get("/Height", 0)
+        if largura * altura < PIXELS_MINIMOS_IMAGEM or len(xobj._data) < BYTES_MINIMOS_IMAGEM:
+            resultado["bytes_mantidos"] += len(xobj._data) * peso_imagem
+            continue
+        # Dimensões de saída em cada degrau da escada
+        dimensoes = []
+        for _, dpi in escada:
+            alvo = _tamanho_alvo_imagem(xobj, tamanho_pol, dpi)
+            dimensoes.append(alvo[:2] if alvo else (largura, altura))
+        candidatas.append({"original": len(xobj._data), "pixels_origem": largura * altura, "peso": peso_imagem,
+                           "dimensoes": dimensoes, "xobj": xobj, "testes": None})
+
+    # Amostras espalhadas pelo documento
+    passo = max(1, len(candidatas) / amostras)
+    for indice in sorted({int(i * passo) for i in range(min(amostras, len(candidatas)))}):
+        candidata = candidatas[indice]
+        inicio = time.time()
+        try:
+            tarefa, _ = _preparar_tarefa_imagem(candidata["xobj"])
+            if tarefa is None:
+                candidata["testes"] = [candidata["original"]] * len(escada)
+                candidata["mantida"] = True
+            else:
+                configuracoes = [(qualidade, dimensoes) for (qualidade, _), dimensoes in zip(escada, candidata["dimensoes"])]
+                candidata["testes"] = _testar_imagem_amostra(tarefa, configuracoes)
+                resultado["pixels_testados"] += candidata["pixels_origem"]
+                resultado["tempo_testes"] += time.time() - inicio
+        except Exception as e:
+            log(f"    - Erro ao testar imagem de amostra: {e}")
+    for candidata in candidatas:
+        del candidata["xobj"]
+
+    log(f"    - {sum(c['testes'] is not None for c in candidatas)} de {len(candidatas)} imagens testadas")
+    return resultado
+
+
+def _estimar_bytes_imagens(candidatas, degrau):
+    """
+    Estima quantos bytes as imagens candidatas ocuparão depois da compactação em um degrau da escada.
+
+    As imagens testadas usam o tamanho medido; as demais recebem os bytes por pixel das
+    amostras, aplicados às suas dimensões de saída.
+    """
+    testadas = [c for c in candidatas if c["testes"] is not None and not c.get("mantida")]
+    pixels = sum(c["dimensoes"][degrau][0] * c["dimensoes"][degrau][1] for c in testadas)
+    bytes_por_pixel = sum(c["testes"][degrau] for c in testadas) / pixels if pixels else None
+
+    total = 0
+    for candidata in candidatas:
+        if candidata["testes"] is not None:
+            estimado = candidata["testes"][degrau]
+        elif bytes_por_pixel is not None:
+            largura, altura = candidata["dimensoes"][degrau]
+            estimado = largura * altura * bytes_por_pixel
+        else:
+            estimado = candidata["original"]
+        # Como na compactação, a imagem só é trocada se ficar menor
+        total += min(estimado, candidata["original"]) * candidata.get("peso", 1)
+    return total
+
+
+def estimar_compressao_para_tamanho(input_pdf, tamanho_mb_alvo, escada=ESCADA_COMPRESSAO,
+                                    amostras=AMOSTRAS_IMAGENS, callback=None):
+    """
+    Procura a melhor qualidade e resolução de imagem com que o PDF compactado cabe em tamanho_mb_alvo.
+
+    Algumas imagens são decodificadas e codificadas nas configurações da escada; o
+    resultado, em bytes por pixel, é extrapolado para as demais imagens a partir das
+    dimensões com que cada uma ficaria. O restante do arquivo (texto, fontes, imagens
+    que não seriam recomprimidas) entra como tamanho fixo. A escada é percorrida por
+    busca binária, já que o tamanho estimado diminui a cada degrau.
+    
+    Args:
+        input_pdf (str): Caminho do PDF original
+        tamanho_mb_alvo (float): Tamanho desejado em MB
+        escada (tuple): Configurações (qualidade, dpi), da maior para a menor
+        amostras (int): Quantidade máxima de imagens testadas
+        callback (callable): Função de log
+    
+    Returns:
+        dict: {"qualidade", "dpi", "tamanho_estimado" (MB), "cabe"}. Se nenhum degrau couber,
+        "cabe" é False e qualidade/dpi são os do último degrau
+    """
+    def log(msg):
+        if callback:
+            callback(msg)
+        else:
+            print(msg)
+
+    alvo_bytes = tamanho_mb_alvo * 1048576
+
+    with abrir_pdf_leitura(input_pdf) as reader:
+        amostra = _amostrar_imagens(reader, escada, amostras, callback=log)
+    tamanho_fixo = os.path.getsize(input_pdf) - amostra["bytes_imagens"] + amostra["bytes_mantidos"]
+    estimativas = {}
+
+    def estimar(degrau):
+        if degrau not in estimativas:
+            estimativas[degrau] = tamanho_fixo + _estimar_bytes_imagens(amostra["candidatas"], degrau)
+            qualidade, dpi = escada[degrau]
+            log(f"    - Qualidade {qualidade}, {dpi} DPI: tamanho estimado {estimativas[degrau] / 1048576:.2f} MB")
+        return estimativas[degrau]
+
+    # Busca binária pelo primeiro degrau (maior qualidade) que cabe no alvo
+    inicio, fim = 0, len(escada) - 1
+    if estimar(fim) > alvo_bytes:
+        qualidade, dpi = escada[fim]
+        return {"qualidade": qualidade, "dpi": dpi, "tamanho_estimado": estimar(fim) / 1048576, "cabe": False}
+    while inicio < fim:
+        meio = (inicio + fim) // 2
+        if estimar(meio) <= alvo_bytes:
+            fim = meio
+        else:
+            inicio = meio + 1
+
+    qualidade, dpi = escada[inicio]
+    return {"qualidade": qualidade, "dpi": dpi, "tamanho_estimado": estimar(inicio) / 1048576, "cabe": True}
+
+
+def _tamanhos_objetos_xref(reader, tamanho_total):
+    """
+    Tamanho no arquivo de cada objeto gravado fora de fluxos de objetos: do seu
+    deslocamento na tabela xref até o próximo objeto (ou a própria tabela).
+    
+    Returns:
+        tuple: (idnum -> deslocamento, idnum -> tamanho em bytes)
+    """
+    deslocamentos = {}
+    for geracao, objetos in reader.xref.items():
+        for idnum, deslocamento in objetos.items():
+            if isinstance(deslocamento, int) and 0 < deslocamento < tamanho_total:
+                deslocamentos[idnum] = deslocamento
+    limites = sorted(set(deslocamentos.values()) | {getattr(reader, "_startxref", tamanho_total), tamanho_total})
+    proximo = {inicio: fim for inicio, fim in zip(limites, limites[1:])}
+    return deslocamentos, {idnum: proximo.get(inicio, tamanho_total) - inicio for idnum, inicio in deslocamentos.items()}
+
+
+def analisar_compactacao(input_pdf, qualidade_imagem=30, dpi_alvo=DPI_ALVO_IMAGEM, nivel_compressao=7,
+                         amostras_paginas=AMOSTRAS_PAGINAS, amostras_imagens=AMOSTRAS_IMAGENS,
+                         num_processos=None, callback=None):
+    """
+    Estima, por amostragem, quanto a compactação reduziria o PDF e quanto tempo levaria.
+
+    Só as páginas da amostra, espalhadas pelo documento, são lidas. Nelas, mede três
+    ganhos e extrapola cada um para o documento inteiro:
+    - fluxos de conteúdo, comprimidos com o nível da compactação;
+    - imagens, recomprimidas com os mesmos parâmetros de reduzir_tamanho_pdf (algumas
+      são testadas e as demais estimadas pelos pixels);
+    - objetos comuns (anotações, dicionários de página e de fonte) que passariam para
+      fluxos de objetos: o tamanho atual vem da xref e o comprimido, da proporção medida
+      gravando a amostra com o EscritorPdf (_medir_compressao_objetos). Objetos que já
+      estão em fluxos de objetos não contam. Uma tabela xref clássica, substituída pelo
+      fluxo /XRef, entra junto com eles.
+    Serve para evitar uma compactação demorada que não reduziria quase nada
+    (PDFs só de texto ou já compactados) e para avisar o usuário do tempo esperado.
+    
+    Args:
+        input_pdf (str): Caminho do PDF original
+        qualidade_imagem (int): Qualidade JPEG que seria usada
+        dpi_alvo (int): Resolução que seria usada
+        nivel_compressao (int): Nível de compressão dos fluxos de conteúdo
+        amostras_paginas (int): Quantidade de páginas testadas
+        amostras_imagens (int): Quantidade de imagens testadas
+        num_processos (int): Processos da recompressão. Se None, usa um por núcleo
+        callback (callable): Função de log
+    
+    Returns:
+        dict: {"tamanho_original" (MB), "tamanho_estimado" (MB), "reducao" (fração, com os
+        três ganhos somados), "economia" ({"conteudo", "imagens", "objetos"} em MB),
+        "tempo_estimado" (segundos), "vale_a_pena" (bool)}
+    """
+    import time
+    import zlib
+
+    def log(msg):
+        if callback:
+            callback(msg)
+        else:
+            print(msg)
+
+    tamanho_original = os.path.getsize(input_pdf)
+    tempo_inicio = time.time()
+
+    with abrir_pdf_leitura(input_pdf) as reader:
+        total_paginas = len(reader.pages)
+
+        # Conteúdo das páginas: bytes atuais contra o que a compressão produziria
+        passo = max(1, total_paginas / amostras_paginas)
+        paginas_amostra = sorted({int(i * passo) for i in range(min(amostras_paginas, total_paginas))})
+        economia_conteudo = 0
+        inicio_paginas = time.time()
+        for numero in paginas_amostra:
+            conteudo = reader.pages[numero].get("/Contents")
+            conteudo = conteudo.get_object() if conteudo is not None else None
+            fluxos = conteudo if isinstance(conteudo, ArrayObject) else [conteudo]
+            fluxos = [f.get_object() for f in fluxos if f is not None]
+            atual = sum(len(f._data) for f in fluxos if isinstance(f, StreamObject))
+            comprimido = len(zlib.compress(b"\n".join(f.get_data() for f in fluxos if isinstance(f, StreamObject)),
+                                           nivel_compressao))
+            economia_conteudo += max(0, atual - comprimido)
+        tempo_por_pagina = (time.time() - inicio_paginas) / len(paginas_amostra) if paginas_amostra else 0
+        economia_conteudo = economia_conteudo / len(paginas_amostra) * total_paginas if paginas_amostra else 0
+
+        amostra = _amostrar_imagens(reader, ((qualidade_imagem, dpi_alvo),), amostras_imagens, callback=log,
+                                    paginas=paginas_amostra)
+
+        # Objetos comuns: tamanho atual no arquivo (pela xref) contra o comprimido em fluxos
+        # de objetos. Um objeto visto em uma única página da amostra representa os das
+        # demais; um compartilhado conta uma vez
+        economia_objetos = 0
+        _, tamanhos_atuais = _tamanhos_objetos_xref(reader, tamanho_original)
+        medida = _medir_compressao_objetos(reader, paginas_amostra)
+        fator = medida["fator"] if medida["fator"] is not None else IndicePaginasPdf.FATOR_FLUXO_OBJETOS
+        usos = {}
+        for objetos in medida["objetos"]:
+            for chave in objetos:
+                usos[chave] = usos.get(chave, 0) + 1
+        escala = total_paginas / len(medida["paginas"]) if medida["paginas"] else 0
+        vistos = set()
+        for objetos in medida["objetos"]:
+            for chave, (_, comum) in objetos.items():
+                # Objetos já guardados em fluxos de objetos não têm entrada própria na xref
+                atual = tamanhos_atuais.get(int(chave.split(":")[0]))
+                if not comum or atual is None or chave in vistos:
+                    continue
+                vistos.add(chave)
+                economia = atual - (comum * fator + IndicePaginasPdf.SOBRECARGA_OBJETO_FLUXO)
+                economia_objetos += economia * (escala if usos[chave] == 1 else 1)
+
+        # Uma tabela xref clássica (20 bytes por objeto) vira um fluxo /XRef comprimido, cujas
+        # entradas já estão na sobrecarga de cada objeto
+        economia_xref = 0
+        inicio_xref = getattr(reader, "_startxref", None)
+        if inicio_xref:
+            reader.stream.seek(inicio_xref)
+            if reader.stream.read(4) == b"xref":
+                economia_xref = tamanho_original - inicio_xref
+
+    bytes_imagens = amostra["bytes_mantidos"] + _estimar_bytes_imagens(amostra["candidatas"], 0)
+    economia_imagens = amostra["bytes_imagens"] - bytes_imagens
+    economia_objetos += economia_xref
+    tamanho_estimado = tamanho_original - economia_conteudo - economia_imagens - economia_objetos
+    reducao = 1 - tamanho_estimado / tamanho_original if tamanho_original else 0
+
+    # O tempo das imagens é proporcional aos pixels decodificados e dividido entre os processos
+    pixels_total = sum(c["pixels_origem"] * c["peso"] for c in amostra["candidatas"])
+    tempo_por_pixel = amostra["tempo_testes"] / amostra["pixels_testados"] if amostra["pixels_testados"] else 0
+    processos = max(1, min(num_processos or os.cpu_count() or 1, len(amostra["candidatas"]) or 1))
+    tempo_estimado = tempo_por_pagina * total_paginas + tempo_por_pixel * pixels_total / processos
+
+    analise = {
+        "tamanho_original": tamanho_original / 1048576,
+        "tamanho_estimado": max(0, tamanho_estimado) / 1048576,
+        "reducao": reducao,
+        "economia": {"conteudo": economia_conteudo / 1048576, "imagens": economia_imagens / 1048576,
+                     "objetos": economia_objetos / 1048576},  # objetos comuns e tabela xref
+        "tempo_estimado": tempo_estimado,
+        "vale_a_pena": reducao >= REDUCAO_MINIMA_COMPACTACAO,
+    }
+    log(f"    - Análise prévia ({time.time() - tempo_inicio:.1f} s): {analise['tamanho_original']:.2f} MB -> "
+        f"~{analise['tamanho_estimado']:.2f} MB ({reducao * 100:.0f}% menor), tempo estimado ~{tempo_estimado:.0f} segundos")
+    log(f"    - Ganho estimado: conteúdo {analise['economia']['conteudo']:.2f} MB, imagens {analise['economia']['imagens']:.2f} MB, "
+        f"objetos comuns e xref {analise['economia']['objetos']:.2f} MB")
+    return analise
+
+
+# Categorias do relatório de bytes, na ordem em que aparecem quando empatadas
+CATEGORIAS_BYTES = {
+    "imagens": "Imagens",
+    "fontes": "Fontes",
+    "conteudo": "Conteúdo das páginas",
+    "metadados": "Metadados / XMP",
+    "miniaturas": "Miniaturas",
+    "anotacoes": "Anotações",
+    "estrutura": "Estrutura (páginas, xref, catálogo)",
+    "nao_referenciados": "Objetos não referenciados",
+}
+
+# Chaves cujo valor muda a categoria dos objetos alcançados a partir delas
+_CATEGORIA_POR_CHAVE = {
+    "/Contents": "conteudo",
+    "/Thumb": "miniaturas",
+    "/Annots": "anotacoes",
+    "/Metadata": "metadados",
+    "/PieceInfo": "metadados",
+    "/Info": "metadados",
+}
+
+
+# Tokens de um objeto lido direto dos bytes do arquivo. A referência ("12 0 R") vem antes do
+# número, para não ser lida como dois números e um operador
+_TOKEN_OBJETO = re.compile(
+    rb"(\d+)\s+\d+\s+R(?![A-Za-z0-9])"    # referência
+    rb"|<<|>>|\[|\]"                     # dicionário / array
+    rb"|\([^()\\]*\)"                    # string literal simples, lida de uma vez
+    rb"|\("                               # início de string com parênteses ou escapes
+    rb"|<[0-9A-Fa-f\s]*>"                 # string hexadecimal
+    rb"|/[^\s/\[\]()<>{}%]*"              # nome
+    rb"|[-+]?(?:\d+\.?\d*|\.\d+)"         # número
+    rb"|[A-Za-z]+"                        # true, false, null, stream...
+    rb"|%[^\r\n]*"                        # comentário
+)
+_CABECALHO_OBJETO = re.compile(rb"\s*\d+\s+\d+\s+obj\b")
+
+
+def _ler_objeto_bruto(dados, posicao=0):
+    """
+    Lê de um trecho de bytes as informações de um objeto usadas por analisar_bytes_pdf,
+    sem montar objetos do pypdf e sem ler os dados do fluxo.
+    
+    Args:
+        dados (bytes): Bytes do objeto
+        posicao (int): Posição em dados onde o valor começa (depois de "N G obj")
+    
+    Returns:
+        dict: {"valores": chave de topo -> nome ou número (lista, para arrays como /Filter),
+        "referencias": lista de (idnum, chaves até a referência), "fluxo": bool},
+        ou None se o objeto não terminar dentro de dados
+    """
+    valores = {}
+    referencias = []
+    pilha = []        # tipo ("d" ou "a") de cada nível aberto
+    chaves = []       # chave sendo lida em cada nível (None nos arrays e entre entradas)
+    fim_string = 0
+
+    for token in _TOKEN_OBJETO.finditer(dados, posicao):
+        if token.start() < fim_string:
+            continue  # dentro de uma string com parênteses aninhados
+        valor = token.group()
+        primeiro = valor[:1]
+
+        if token.group(1) is not None:
+            referencias.append((int(token.group(1)), tuple(chave for chave in chaves if chave is not None)))
+            if not pilha:
+                break
+            if pilha[-1] == "d":
+                chaves[-1] = None
+        elif valor == b"<<" or valor == b"[":
+            pilha.append("d" if valor == b"<<" else "a")
+            chaves.append(None)
+        elif valor == b">>" or valor == b"]":
+            if not pilha:
+                return None
+            pilha.pop()
+            chaves.pop()
+            if not pilha:
+                seguinte = _TOKEN_OBJETO.search(dados, token.end())
+                return {"valores": valores, "referencias": referencias,
+                        "fluxo": seguinte is not None and seguinte.group() == b"stream"}
+            if pilha[-1] == "d":
+                chaves[-1] = None
+        elif primeiro == b"%":
+            continue
+        else:
+            if valor == b"(":
+                fim_string = _fim_string_literal(dados, token.start())
+                if fim_string >= len(dados):
+                    return None
+            if not pilha:
+                break  # objeto que não é dicionário nem array (um número, por exemplo)
+            if pilha[-1] == "d":
+                if chaves[-1] is None:
+                    chaves[-1] = valor.decode("latin-1") if primeiro == b"/" else None
+                    continue
+                # Só os nomes e números do nível de topo interessam (/Type, /Width...)
+                if len(pilha) == 1 and primeiro not in b"(<":
+                    valores[chaves[0]] = valor.decode("latin-1")
+                chaves[-1] = None
+            elif len(pilha) == 2 and pilha[0] == "d" and primeiro not in b"(<":
+                valores.setdefault(chaves[0], []).append(valor.decode("latin-1"))
+    else:
+        return None
+    return {"valores": {}, "referencias": referencias, "fluxo": False}
+
+
+# Referência ("3 0 R") e a chave que a precede, quando houver ("/Parent 3 0 R")
+_REFERENCIA = re.compile(rb"\d\s+\d+\s+R(?![A-Za-z0-9])")
+_REFERENCIA_COM_CHAVE = re.compile(rb"(/[^\s/\[\]()<>{}%]*)?\s*\d+\s+\d+\s+R(?![A-Za-z0-9])")
+_TIPO_OBJETO = re.compile(rb"/(Type|Subtype)\s*(/[^\s/\[\]()<>{}%]*)")
+
+
+def _ler_cabecalho_objeto(regiao):
+    """
+    Classifica pelo cabeçalho um objeto que não leva a nenhum outro (uma anotação de link,
+    um fluxo de conteúdo, um dicionário de fonte padrão...), sem separar seus tokens.
+    
+    Args:
+        regiao (bytes): Valor do objeto, do início do dicionário até "stream" ou "endobj"
+    
+    Returns:
+        dict: Mesmo formato de _ler_objeto_bruto (só com /Type e /Subtype em "valores"),
+        ou None se o objeto precisar da leitura completa: referencia outros objetos, é
+        imagem ou fonte (cujos detalhes entram no relatório) ou o dicionário não fecha
+        dentro da região
+    """
+    regiao = regiao.strip()
+    if not regiao.startswith(b"<<") or not regiao.endswith(b">>") or regiao.count(b"<<") != regiao.count(b">>"):
+        return None
+    # /P e /Parent apontam para cima e não são seguidas; qualquer outra referência precisa da leitura completa
+    if _REFERENCIA.search(regiao):
+        for referencia in _REFERENCIA_COM_CHAVE.finditer(regiao):
+            if referencia.group(1) not in (b"/P", b"/Parent"):
+                return None
+
+    valores = {}
+    for tipo in _TIPO_OBJETO.finditer(regiao):
+        # Só vale o /Type do nível de topo, não o de um dicionário aninhado (/A << /Type /Action >>)
+        if regiao.count(b"<<", 0, tipo.start()) - regiao.count(b">>", 0, tipo.start()) == 1:
+            valores["/" + tipo.group(1).decode("latin-1")] = tipo.group(2).decode("latin-1")
+    if valores.get("/Subtype") == "/Image" or valores.get("/Type") == "/Font":
+        return None
+    return {"valores": valores, "referencias": [], "fluxo": False}
+
+
+def _info_objeto_pypdf(objeto):
+    """Monta, a partir de um objeto já lido pelo pypdf, o mesmo dict de _ler_objeto_bruto."""
+    valores = {}
+    referencias = []
+    if isinstance(objeto, DictionaryObject):
+        for chave, valor in objeto.items():
+            if isinstance(valor, ArrayObject):
+                valores[chave] = [str(item) for item in valor if not isinstance(item, IndirectObject)]
+            elif not isinstance(valor, (IndirectObject, DictionaryObject)):
+                valores[chave] = str(valor)
+        pilha = [(valor, (chave,)) for chave, valor in objeto.items()]
+    elif isinstance(objeto, ArrayObject):
+        pilha = [(valor, ()) for valor in objeto]
+    else:
+        pilha = []
+    pilha.reverse()
+    while pilha:
+        valor, caminho = pilha.pop()
+        if isinstance(valor, IndirectObject):
+            referencias.append((valor.idnum, caminho))
+        elif isinstance(valor, DictionaryObject):
+            pilha.extend(reversed([(item, caminho + (chave,)) for chave, item in valor.items()]))
+        elif isinstance(valor, ArrayObject):
+            pilha.extend(reversed([(item, caminho) for item in valor]))
+    return {"valores": valores, "referencias": referencias, "fluxo": isinstance(objeto, StreamObject)}
+
+
+def _inteiro_bruto(valor):
+    """Converte um valor lido por _ler_objeto_bruto em inteiro (0 se não for um número)."""
+    try:
+        return int(float(valor))
+    except (TypeError, ValueError):
+        return 0
+
+
+def analisar_bytes_pdf(caminho, caminho_json=None, callback=None):
+    """
+    Mostra em que partes do PDF os bytes estão: imagens, fontes, conteúdo, metadados etc.
+
+    O tamanho de cada objeto vem da distância entre os deslocamentos da tabela xref, sem
+    decodificar nenhum fluxo. Os objetos são classificados percorrendo o documento a partir
+    das páginas (na ordem) e do catálogo; o que não é alcançado conta como não referenciado.
+    Objetos guardados dentro de fluxos de objetos (/ObjStm) não têm deslocamento próprio:
+    o tamanho do fluxo é dividido igualmente entre eles.
+
+    Para ser rápido em arquivos grandes, cada objeto é lido direto dos bytes a partir do
+    deslocamento da xref, sem passar pelo parser do pypdf e sem ler os fluxos. Objetos que
+    não levam a outros (anotações de link, fluxos de conteúdo) são classificados pelo
+    cabeçalho (_ler_cabecalho_objeto); os demais têm o dicionário lido por
+    _ler_objeto_bruto. Só os fluxos de objetos são descomprimidos, e só o que essas
+    leituras não entendem é aberto pelo pypdf.
+    
+    Args:
+        caminho (str): Caminho do PDF
+        caminho_json (str): Se informado, grava o resultado neste arquivo JSON
+        callback (callable): Função de log; recebe a tabela formatada
+    
+    Returns:
+        dict: {"tamanho_total", "categorias": {categoria: bytes}, "imagens": [...], "fontes": [...]}
+        com as imagens e fontes ordenadas do maior para o menor
+    """
+    def log(msg):
+        if callback:
+            callback(msg)
+        else:
+            print(msg)
+
+    tamanho_total = os.path.getsize(caminho)
+
+    with abrir_pdf_leitura(caminho) as reader:
+        if isinstance(reader.stream, mmap.mmap):
+            dados_arquivo = reader.stream
+        else:
+            reader.stream.seek(0)
+            dados_arquivo = reader.stream.read()
+
+        deslocamentos, tamanhos = _tamanhos_objetos_xref(reader, tamanho_total)
+
+        membros_fluxo = {}
+        for idnum, (fluxo, _) in reader.xref_objStm.items():
+            membros_fluxo.setdefault(fluxo, []).append(idnum)
+        for fluxo, membros in membros_fluxo.items():
+            parte = tamanhos.pop(fluxo, 0) / len(membros)
+            for idnum in membros:
+                tamanhos[idnum] = parte
+        fluxos_objetos = set(membros_fluxo)
+
+        conteudo_fluxos = {}  # idnum do /ObjStm -> (dados descomprimidos, idnum -> (início, fim))
+
+        def membro_fluxo(idnum):
+            fluxo, _ = reader.xref_objStm[idnum]
+            if fluxo not in conteudo_fluxos:
+                objeto = reader.get_object(fluxo)
+                dados = objeto.get_data()
+                numeros = dados[:objeto["/First"]].split()
+                posicoes = sorted((objeto["/First"] + int(numeros[i + 1]), int(numeros[i]))
+                                  for i in range(0, len(numeros) - 1, 2))
+                # Cada membro vai até o início do seguinte
+                conteudo_fluxos[fluxo] = (dados, {membro: (inicio, fim) for (inicio, membro), (fim, _) in
+                                                  zip(posicoes, posicoes[1:] + [(len(dados), None)])})
+            dados, posicoes = conteudo_fluxos[fluxo]
+            return (dados,) + posicoes[idnum]
+
+        def ler(idnum):
+            info = None
+            try:
+                if idnum in deslocamentos:
+                    inicio, fim = deslocamentos[idnum], deslocamentos[idnum] + tamanhos[idnum]
+                    # O dicionário vai até "stream" (o fluxo em si nunca é lido) ou "endobj"
+                    cortes = [corte for corte in (dados_arquivo.find(b"stream", inicio, fim),
+                                                  dados_arquivo.find(b"endobj", inicio, fim)) if corte >= 0]
+                    corte = min(cortes) if cortes else fim
+                    trecho = dados_arquivo[inicio:corte + 6]
+                    cabecalho = _CABECALHO_OBJETO.match(trecho)
+                    if cabecalho is not None:
+                        info = _ler_cabecalho_objeto(trecho[cabecalho.end():corte - inicio])
+                        if info is not None:
+                            info["fluxo"] = trecho.endswith(b"stream")
+                        else:
+                            info = _ler_objeto_bruto(trecho, cabecalho.end())
+                elif idnum in reader.xref_objStm:
+                    dados, posicao, fim = membro_fluxo(idnum)
+                    info = _ler_cabecalho_objeto(dados[posicao:fim]) or _ler_objeto_bruto(dados, posicao)
+            except Exception:
+                info = None
+            if info is None:
+                try:
+                    info = _info_objeto_pypdf(reader.get_object(idnum))
+                except Exception:
+                    return None
+            return info
+
+        categorias = dict.fromkeys(CATEGORIAS_BYTES, 0)
+        detalhes = {}  # idnum da imagem/fonte -> registro do relatório
+        visitados = set()
+
+        def percorrer(inicial, categoria, pagina):
+            pilha = [(inicial, categoria, None)]
+            while pilha:
+                idnum, categoria, dono = pilha.pop()
+                if idnum in visitados:
+                    continue
+                visitados.add(idnum)
+                info = ler(idnum)
+                if info is None:
+                    continue
+
+                valores = info["valores"]
+                tipo, subtipo = valores.get("/Type"), valores.get("/Subtype")
+                # Outras páginas (destinos de links, por exemplo) são contadas no percurso delas
+                if tipo == "/Page" and idnum != inicial:
+                    visitados.discard(idnum)
+                    continue
+
+                # O tipo do objeto prevalece sobre a categoria herdada. Máscaras e fontes
+                # descendentes somam no registro da imagem ou fonte que as usa
+                if subtipo == "/Image" and info["fluxo"]:
+                    categoria = "imagens"
+                    if dono not in detalhes or detalhes[dono]["tipo"] != "imagem":
+                        dono = idnum
+                        filtros = valores.get("/Filter") or ""
+                        detalhes[dono] = {"tipo": "imagem", "pagina": pagina + 1 if pagina is not None else None,
+                                          "largura": _inteiro_bruto(valores.get("/Width")),
+                                          "altura": _inteiro_bruto(valores.get("/Height")),
+                                          "filtro": filtros[-1] if isinstance(filtros, list) and filtros else
+                                          (filtros if isinstance(filtros, str) else ""),
+                                          "bytes": 0}
+                elif tipo == "/Font" and (dono not in detalhes or detalhes[dono]["tipo"] != "fonte"):
+                    categoria = "fontes"
+                    dono = idnum
+                    nome = str(valores.get("/BaseFont") or "").lstrip("/")
+                    detalhes[dono] = {"tipo": "fonte", "nome": nome, "embutida": False,
+                                      "subconjunto": len(nome) > 7 and nome[6] == "+" and nome[:6].isupper(),
+                                      "bytes": 0}
+                elif tipo == "/Annot":
+                    categoria = "anotacoes"
+                elif tipo == "/Metadata" or subtipo == "/XML":
+                    categoria = "metadados"
+                elif tipo in ("/Page", "/Pages", "/Catalog", "/ObjStm", "/XRef"):
+                    categoria = "estrutura"
+                elif subtipo == "/Form" and categoria not in ("anotacoes", "miniaturas"):
+                    categoria = "conteudo"
+
+                categorias[categoria] += tamanhos.get(idnum, 0)
+                if dono in detalhes:
+                    detalhes[dono]["bytes"] += tamanhos.get(idnum, 0)
+
+                for referencia, caminho_chaves in reversed(info["referencias"]):
+                    if "/Parent" in caminho_chaves or "/P" in caminho_chaves:
+                        continue
+                    if dono in detalhes and any(chave in ("/FontFile", "/FontFile2", "/FontFile3") for chave in caminho_chaves):
+                        detalhes[dono]["embutida"] = True
+                    categoria_filho = categoria
+                    for chave in caminho_chaves:
+                        categoria_filho = _CATEGORIA_POR_CHAVE.get(chave, categoria_filho)
+                    pilha.append((referencia, categoria_filho, dono))
+
+        # Páginas na ordem da árvore, lida pelo mesmo caminho rápido
+        paginas = []
+        raiz = reader.trailer.raw_get("/Root")
+        info_raiz = ler(raiz.idnum) if isinstance(raiz, IndirectObject) else None
+        nos = [idnum for idnum, caminho_chaves in (info_raiz or {}).get("referencias", []) if caminho_chaves == ("/Pages",)]
+        info_arvore = ler(nos[0]) if nos else None
+        total_paginas = _inteiro_bruto((info_arvore or {}).get("valores", {}).get("/Count"))
+        nos_vistos = set()
+        while nos:
+            idnum = nos.pop()
+            if idnum in nos_vistos:
+                continue
+            nos_vistos.add(idnum)
+            info = ler(idnum)
+            if info is None:
+                continue
+            if info["valores"].get("/Type") == "/Page":
+                paginas.append(idnum)
+            else:
+                nos.extend(reversed([filho for filho, caminho_chaves in info["referencias"] if caminho_chaves == ("/Kids",)]))
+        if not paginas or len(paginas) != total_paginas:
+            paginas = [pagina.indirect_reference.idnum for pagina in reader.pages if pagina.indirect_reference is not None]
+
+        for numero_pagina, idnum in enumerate(paginas):
+            percorrer(idnum, "estrutura", numero_pagina)
+        if isinstance(raiz, IndirectObject):
+            percorrer(raiz.idnum, "estrutura", None)
+        informacoes = reader.trailer.raw_get("/Info") if "/Info" in reader.trailer else None
+        if isinstance(informacoes, IndirectObject):
+            percorrer(informacoes.idnum, "metadados", None)
+
+        # O fluxo /XRef e os contêineres /ObjStm (gravados pelo EscritorPdf) não são
+        # referenciados por ninguém, mas fazem parte da estrutura do arquivo
+        for idnum in [idnum for idnum in tamanhos if idnum not in visitados]:
+            info = ler(idnum) if idnum not in fluxos_objetos else {"valores": {"/Type": "/ObjStm"}, "fluxo": True}
+            if info is not None and info["fluxo"] and info["valores"].get("/Type") in ("/XRef", "/ObjStm"):
+                categorias["estrutura"] += tamanhos[idnum]
+                visitados.add(idnum)
+
+        categorias["nao_referenciados"] = sum(t for idnum, t in tamanhos.items() if idnum not in visitados)
+
+    # O que sobra (cabeçalho, tabelas xref, trailer) conta como estrutura
+    categorias["estrutura"] += max(0, tamanho_total - sum(categorias.values()))
+    categorias = {chave: round(valor) for chave, valor in categorias.items()}
+
+    analise = {"arquivo": os.path.basename(caminho), "tamanho_total": tamanho_total, "categorias": categorias,
+               "imagens": [], "fontes": []}
+    for registro in sorted(detalhes.values(), key=lambda d: -d["bytes"]):
+        registro["bytes"] = round(registro["bytes"])
+        analise["imagens" if registro.pop("tipo") == "imagem" else "fontes"].append(registro)
+
+    if caminho_json:
+        with open(caminho_json, "w", encoding="utf-8") as arquivo:
+            json.dump(analise, arquivo, ensure_ascii=False, indent=2)
+
+    log(formatar_analise_bytes(analise))
+    return analise
+
+
+def formatar_analise_bytes(analise, limite_itens=10):
     """
-    Converte todas as imagens de uma pasta em um único arquivo PDF
+    Monta a tabela de texto do resultado de analisar_bytes_pdf, da maior categoria para a menor.
     
     Args:
-        pasta_imagens (str): Caminho da pasta contendo as imagens
-        output_pdf (str): Caminho do arquivo PDF de saída
+        analise (dict): Resultado de analisar_bytes_pdf
+        limite_itens (int): Quantidade de imagens e fontes listadas
+    
+    Returns:
+        str: Relatório formatado
     """
-    try:
-        # Extensões de imagem suportadas
-        extensoes_imagem = ['*.jpg', '*.jpeg', '*.png', '*.bmp', '*.tiff', '*.gif']
+    total = analise["tamanho_total"] or 1
+    linhas = [f"Distribuição de bytes: {analise['arquivo']} ({analise['tamanho_total'] / 1048576:.2f} MB)",
+              f"{'Categoria':<38}{'MB':>10}{'%':>8}"]
+    for categoria, tamanho in sorted(analise["categorias"].items(), key=lambda item: -item[1]):
+        if tamanho:
+            linhas.append(f"{CATEGORIAS_BYTES[categoria]:<38}{tamanho / 1048576:>10.2f}{tamanho * 100 / total:>7.1f}%")
+
+    if analise["imagens"]:
+        linhas.append(f"\nMaiores imagens ({len(analise['imagens'])} no total):")
+        for imagem in analise["imagens"][:limite_itens]:
+            linhas.append(f"  - Página {imagem['pagina']}: {imagem['largura']}x{imagem['altura']} px, "
+                          f"{imagem['filtro'] or 'sem filtro'}, {imagem['bytes'] / 1024:.0f} KB")
+    if analise["fontes"]:
+        linhas.append(f"\nMaiores fontes ({len(analise['fontes'])} no total):")
+        for fonte in analise["fontes"][:limite_itens]:
+            tipo = "subconjunto" if fonte["subconjunto"] else ("embutida" if fonte["embutida"] else "não embutida")
+            linhas.append(f"  - {fonte['nome']} ({tipo}): {fonte['bytes'] / 1024:.0f} KB")
+    return "\n".join(linhas)
+
+
+def calcular_hash_arquivo(caminho, tamanho_bloco=1048576):
+    """
+    Calcula o hash SHA-256 de um arquivo lendo-o em blocos
+    
+    Args:
+        caminho (str): Caminho do arquivo
+        tamanho_bloco (int): Quantidade de bytes lida por vez
+    
+    Returns:
+        str: Hash hexadecimal do conteúdo do arquivo
+    """
+    sha256 = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b""):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+def _objetos_pagina(pagina, tamanhos, fluxos_objetos=False):
+    """
+    Percorre o grafo de objetos indiretos alcançáveis a partir de uma página.
+
+    O link /Parent e outras páginas não são seguidos, para que a árvore de
+    páginas do documento original não seja contabilizada.
+
+    Args:
+        pagina (PageObject): Página do PdfReader
+        tamanhos (dict): Cache compartilhado de tamanhos serializados por objeto
+        fluxos_objetos (bool): Se a saída agrupa os objetos comuns em fluxos comprimidos (EscritorPdf)
+
+    Returns:
+        dict: "idnum:geração" -> (bytes gravados como estão, bytes serializados que vão para
+        um fluxo de objetos e ainda serão comprimidos). Sem fluxos de objetos, o segundo
+        valor é sempre 0
+    """
+    def tamanho_objeto(chave, objeto):
+        tamanho = tamanhos.get(chave)
+        if tamanho is None:
+            buffer = BytesIO()
+            objeto.write_to_stream(buffer)
+            if fluxos_objetos and not isinstance(objeto, StreamObject):
+                tamanho = (IndicePaginasPdf.SOBRECARGA_OBJETO_FLUXO, buffer.tell())
+            else:
+                tamanho = (buffer.tell() + IndicePaginasPdf.SOBRECARGA_OBJETO, 0)
+            tamanhos[chave] = tamanho
+        return tamanho
+
+    objetos = {}
+    referencia = pagina.indirect_reference
+    if referencia is not None:
+        chave = f"{referencia.idnum}:{referencia.generation}"
+        objetos[chave] = tamanho_objeto(chave, pagina)
+    pilha = [pagina]
+
+    while pilha:
+        atual = pilha.pop()
+        if isinstance(atual, DictionaryObject):
+            filhos = [valor for nome, valor in atual.items() if nome != "/Parent"]
+        elif isinstance(atual, ArrayObject):
+            filhos = list(atual)
+        else:
+            continue
+
+        for filho in filhos:
+            if isinstance(filho, IndirectObject):
+                chave = f"{filho.idnum}:{filho.generation}"
+                if chave in objetos:
+                    continue
+                objeto = filho.get_object()
+                if isinstance(objeto, DictionaryObject) and objeto.get("/Type") == "/Page":
+                    continue
+                objetos[chave] = tamanho_objeto(chave, objeto)
+                pilha.append(objeto)
+            else:
+                pilha.append(filho)
+
+    return objetos
+
+
+def _medir_compressao_objetos(leitor, numeros_paginas, limite_bytes=None):
+    """
+    Grava algumas páginas com o EscritorPdf e mede quanto os objetos comuns encolhem
+    dentro dos fluxos de objetos (a proporção usada por IndicePaginasPdf.fator_fluxo).
+
+    A parte exata do tamanho (fluxos e sobrecargas) é descontada do arquivo gravado; o
+    que sobra, dividido pelo tamanho serializado dos objetos comuns, é o fator.
+    
+    Args:
+        leitor (PdfReader): Leitor do PDF
+        numeros_paginas (iterable): Páginas da amostra, de preferência espalhadas pelo documento
+        limite_bytes (int): Para de acrescentar páginas quando a amostra estimada passa deste tamanho
+    
+    Returns:
+        dict: {"paginas": páginas gravadas, "objetos": para cada página, o resultado de
+        _objetos_pagina com fluxos de objetos, "fator": proporção medida, ou None se os
+        objetos comuns pesam menos que IndicePaginasPdf.FRACAO_MINIMA_CALIBRACAO da amostra}
+    """
+    tamanhos = {}
+    paginas, objetos_por_pagina = [], []
+    fixo, comum = IndicePaginasPdf.SOBRECARGA_BASE, 0
+    vistos = set()
+    for numero in numeros_paginas:
+        if paginas and limite_bytes and fixo + comum * IndicePaginasPdf.FATOR_FLUXO_OBJETOS > limite_bytes:
+            break
+        objetos = _objetos_pagina(leitor.pages[numero], tamanhos, fluxos_objetos=True)
+        paginas.append(numero)
+        objetos_por_pagina.append(objetos)
+        fixo += IndicePaginasPdf.SOBRECARGA_PAGINA
+        for chave, (fixo_objeto, comum_objeto) in objetos.items():
+            if chave not in vistos:
+                vistos.add(chave)
+                fixo += fixo_objeto
+                comum += comum_objeto
+
+    escritor = EscritorPdf(fluxos_objetos=True)
+    for numero in paginas:
+        escritor.add_page(leitor.pages[numero])
+    buffer = BytesIO()
+    escritor.write(buffer)
+    gravado = buffer.tell()
+
+    fator = None
+    if comum and gravado - fixo >= gravado * IndicePaginasPdf.FRACAO_MINIMA_CALIBRACAO:
+        fator = min(1.0, (gravado - fixo) / comum)
+    return {"paginas": paginas, "objetos": objetos_por_pagina, "fator": fator}
+
+
+class IndicePaginasPdf:
+    """
+    Índice do "peso" de cada página de um PDF, construído a partir de um PdfReader.
+
+    O grafo de objetos de cada página é percorrido uma única vez. Para cada página
+    o índice guarda quantos bytes ela possui com exclusividade e quais objetos ela
+    compartilha com outras páginas (fontes, XObjects, perfis ICC...), com o tamanho
+    de cada objeto compartilhado. Com isso, qualquer divisor consegue escolher os
+    pontos de corte em uma única passada.
+
+    Os fluxos (imagens, conteúdo) são gravados como estão e seu tamanho é exato. Os
+    objetos comuns vão para fluxos de objetos comprimidos, e quanto eles encolhem
+    depende do documento: anotações de link quase idênticas comprimem muito mais que
+    dicionários de fontes. Por isso o índice guarda o tamanho serializado desses objetos
+    à parte e o multiplica por fator_fluxo, medido em calibrar() com a gravação de uma
+    amostra de páginas. Os tamanhos continuam sendo estimativas.
+
+    O índice pode ser salvo em disco ao lado do PDF, identificado pelo hash do
+    arquivo, para que uma nova divisão do mesmo documento seja imediata.
+    """
+    VERSAO_CACHE = 3
+    # "N 0 obj\n" + "\nendobj\n" + linha de 20 bytes na tabela xref
+    SOBRECARGA_OBJETO = 40
+    # Objetos comuns dentro de um /ObjStm: proporção após a compressão, usada até a
+    # calibração, e entradas no cabeçalho do fluxo e na xref comprimida
+    FATOR_FLUXO_OBJETOS = 0.35
+    SOBRECARGA_OBJETO_FLUXO = 6
+    # Amostra gravada na calibração: páginas espalhadas pelo documento, até o limite de bytes
+    PAGINAS_CALIBRACAO = 64
+    BYTES_CALIBRACAO = 8 * 1048576
+    # Abaixo desta fração da amostra, os objetos comuns pesam pouco demais para medir o fator
+    FRACAO_MINIMA_CALIBRACAO = 0.05
+    # Cabeçalho, catálogo, árvore de páginas, tabela xref e trailer
+    SOBRECARGA_BASE = 400
+    # Referência da página no /Kids da árvore de páginas
+    SOBRECARGA_PAGINA = 12
+    # Pasta onde os índices ficam salvos entre uma divisão e outra; a idade e o tamanho
+    # dela são limitados por limpar_cache_indices, na inicialização do programa
+    PASTA_CACHE = PASTA_CACHE_INDICES
+
+    def __init__(self, paginas, compartilhados, hash_arquivo=None, fluxos_objetos=False, fator_fluxo=None):
+        # Lista de {"exclusivo": bytes, "exclusivo_comum": bytes em fluxos de objetos, "compartilhados": [chaves]}
+        self.paginas = paginas
+        self.compartilhados = compartilhados  # Chave do objeto -> [bytes, bytes em fluxos de objetos]
+        self.hash_arquivo = hash_arquivo
+        self.fluxos_objetos = fluxos_objetos
+        self.calibrado = fator_fluxo is not None
+        self.definir_fator_fluxo(self.FATOR_FLUXO_OBJETOS if fator_fluxo is None else fator_fluxo)
+
+    def __len__(self):
+        return len(self.paginas)
+
+    def definir_fator_fluxo(self, fator_fluxo):
+        """
+        Define a proporção de compressão dos objetos comuns e recalcula os custos usados
+        pelos planejadores: custos_exclusivos[i] (bytes exclusivos da página i) e
+        custos_compartilhados[chave] (bytes de cada objeto compartilhado).
+        """
+        self.fator_fluxo = fator_fluxo
+        self.custos_exclusivos = [pagina["exclusivo"] + round(pagina["exclusivo_comum"] * fator_fluxo)
+                                  for pagina in self.paginas]
+        self.custos_compartilhados = {chave: fixo + round(comum * fator_fluxo)
+                                      for chave, (fixo, comum) in self.compartilhados.items()}
+
+    def calibrar(self, leitor, callback=None):
+        """
+        Mede fator_fluxo gravando com o EscritorPdf uma amostra de páginas espalhadas pelo
+        documento e comparando o tamanho gravado com a parte exata da estimativa
         
-        # Lista para armazenar as imagens
-        imagens = []
+        Args:
+            leitor (PdfReader): Leitor do mesmo PDF indexado
+            callback (callable): Função de log
         
-        # Busca por imagens na pasta
-        for extensao in extensoes_imagem:
-            imagens.extend(glob.glob(os.path.join(pasta_imagens, extensao)))
-            imagens.extend(glob.glob(os.path.join(pasta_imagens, extensao.upper())))
+        Returns:
+            bool: True se o fator foi medido; False se os objetos comuns pesam pouco demais
+            na amostra (o fator padrão é mantido, e quase não muda a estimativa)
+        """
+        def log(msg):
+            if callback:
+                callback(msg)
+            else:
+                print(msg)
+
+        if not self.fluxos_objetos or not self.paginas:
+            return False
+
+        passo = max(1, len(self.paginas) // self.PAGINAS_CALIBRACAO)
+        medida = _medir_compressao_objetos(leitor, range(0, len(self.paginas), passo), self.BYTES_CALIBRACAO)
+        if medida["fator"] is None:
+            return False
+
+        fator_anterior = self.fator_fluxo
+        self.definir_fator_fluxo(medida["fator"])
+        self.calibrado = True
+        log(f"    - Compressão dos objetos comuns medida em {len(medida['paginas'])} páginas: {self.fator_fluxo:.2f} "
+            f"(estimativa inicial: {fator_anterior:.2f})")
+        return True
+
+    @classmethod
+    def construir(cls, leitor, hash_arquivo=None, fluxos_objetos=None):
+        """
+        Constrói o índice percorrendo as páginas do leitor uma única vez
         
-        if not imagens:
-            messagebox.showinfo("Aviso", "Não há arquivos válidos para inclusão no PDF.")
-            return
+        Args:
+            leitor (PdfReader): Leitor do PDF
+            hash_arquivo (str): Hash do arquivo de origem, usado como chave do cache
+            fluxos_objetos (bool): Se as partes serão gravadas com fluxos de objetos.
+                Se None, usa USAR_FLUXOS_OBJETOS
         
-        # Verifica se o arquivo PDF já existe
-        if os.path.exists(output_pdf):
-            messagebox.showinfo("Aviso", "Arquivo já existente.")
-            return
+        Returns:
+            IndicePaginasPdf: Índice construído
+        """
+        if fluxos_objetos is None:
+            fluxos_objetos = USAR_FLUXOS_OBJETOS
+        tamanhos = {}
+        objetos_por_pagina = [_objetos_pagina(pagina, tamanhos, fluxos_objetos) for pagina in leitor.pages]
+
+        # Conta em quantas páginas cada objeto aparece
+        referencias = {}
+        for objetos in objetos_por_pagina:
+            for chave in objetos:
+                referencias[chave] = referencias.get(chave, 0) + 1
+
+        paginas = []
+        compartilhados = {}
+        for objetos in objetos_por_pagina:
+            exclusivo, exclusivo_comum = cls.SOBRECARGA_PAGINA, 0
+            lista_compartilhados = []
+            for chave, (fixo, comum) in objetos.items():
+                if referencias[chave] > 1:
+                    lista_compartilhados.append(chave)
+                    compartilhados[chave] = [fixo, comum]
+                else:
+                    exclusivo += fixo
+                    exclusivo_comum += comum
+            paginas.append({"exclusivo": exclusivo, "exclusivo_comum": exclusivo_comum,
+                            "compartilhados": lista_compartilhados})
+
+        return cls(paginas, compartilhados, hash_arquivo, fluxos_objetos)
+
+    @classmethod
+    def caminho_cache(cls, caminho_pdf, pasta_cache=None, hash_arquivo=None):
+        """
+        Retorna o caminho do arquivo de cache do índice de um PDF.
+
+        O cache fica na pasta temporária do programa, nunca na pasta de saída do usuário.
+        O início do hash entra no nome para que arquivos homônimos não disputem o mesmo cache.
+        """
+        nome_arquivo = os.path.splitext(os.path.basename(caminho_pdf))[0]
+        pasta = pasta_cache or cls.PASTA_CACHE
+        sufixo = f".{hash_arquivo[:16]}" if hash_arquivo else ""
+        return os.path.join(pasta, f"{nome_arquivo}{sufixo}.indice.json")
+
+    def salvar(self, caminho_cache):
+        """Salva o índice em disco no formato JSON."""
+        dados = {
+            "versao": self.VERSAO_CACHE,
+            "hash": self.hash_arquivo,
+            "fluxos_objetos": self.fluxos_objetos,
+            "fator_fluxo": self.fator_fluxo if self.calibrado else None,
+            "paginas": self.paginas,
+            "compartilhados": self.compartilhados,
+        }
+        with open(caminho_cache, "w", encoding="utf-8") as arquivo:
+            json.dump(dados, arquivo)
+
+    @classmethod
+    def carregar(cls, caminho_cache, hash_arquivo):
+        """
+        Carrega um índice salvo em disco
         
-        # Remove duplicatas
-        imagens = list(set(imagens))
+        Returns:
+            IndicePaginasPdf: Índice carregado, ou None se o cache não existir,
+            estiver corrompido ou pertencer a outra versão do arquivo
+        """
+        try:
+            with open(caminho_cache, "r", encoding="utf-8") as arquivo:
+                dados = json.load(arquivo)
+        except (OSError, ValueError):
+            return None
 
-        # Ordena as imagens por nome
-        imagens.sort()
+        if dados.get("versao") != cls.VERSAO_CACHE or dados.get("hash") != hash_arquivo:
+            return None
+        # O tamanho dos objetos depende do formato de gravação das partes
+        if dados.get("fluxos_objetos") != USAR_FLUXOS_OBJETOS:
+            return None
+        # Marca o uso, para que limpar_cache_indices remova primeiro os índices esquecidos
+        try:
+            os.utime(caminho_cache)
+        except OSError:
+            pass
+        return cls(dados["paginas"], dados["compartilhados"], hash_arquivo, dados["fluxos_objetos"],
+                   dados.get("fator_fluxo"))
+
+    @classmethod
+    def carregar_ou_construir(cls, caminho_pdf, leitor=None, pasta_cache=None, callback=None, hash_arquivo=None):
+        """
+        Obtém o índice de um PDF, reaproveitando o cache em disco quando o hash confere.
+        Um índice novo é calibrado (calibrar) antes de ser salvo
         
-        # Cria um novo documento PDF usando reportlab para melhor controle de layout
-        c = canvas.Canvas(output_pdf, pagesize=A4)
-        page_width, page_height = A4
+        Args:
+            caminho_pdf (str): Caminho do PDF indexado
+            leitor (PdfReader): Leitor já aberto do PDF. Se None, o arquivo é aberto
+            pasta_cache (str): Pasta onde o cache é salvo. Se None, usa PASTA_CACHE
+            callback (callable): Função de log
+            hash_arquivo (str): Chave do cache. Se None, usa o hash de caminho_pdf; para um PDF
+                compactado em memória, combina o hash do original com os parâmetros da compactação
         
-        for img_path in imagens:
-            print("Convertendo:", img_path)
-            
-            # Abre a imagem
-            img = Image.open(img_path)
-            
-            # Converte para RGB se necessário (para garantir compatibilidade com PDF)
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Calcula as dimensões da imagem para caber na página com proporção correta
-            img_width, img_height = img.size
-            
-            # Calcula o redimensionamento mantendo a proporção
-            if img_width > img_height:
-                # Imagem em formato paisagem
-                scaled_width = page_width - 40  # Margem de 20 pontos de cada lado
-                scaled_height = (scaled_width / img_width) * img_height
-                
-                # Se a altura ainda for maior que a página, redimensiona pela altura
-                if scaled_height > page_height - 40:
-                    scaled_height = page_height - 40
-                    scaled_width = (scaled_height / img_height) * img_width
+        Returns:
+            IndicePaginasPdf: Índice do PDF
+        """
+        def log(msg):
+            if callback:
+                callback(msg)
             else:
-                # Imagem em formato retrato
-                scaled_height = page_height - 40  # Margem de 20 pontos de cada lado
-                scaled_width = (scaled_height / img_height) * img_width
-                
-                # Se a largura ainda for maior que a página, redimensiona pela largura
-                if scaled_width > page_width - 40:
-                    scaled_width = page_width - 40
-                    scaled_height = (scaled_width / img_width) * img_height
-            
-            # Centraliza a imagem na página
-            x_pos = (page_width - scaled_width) / 2
-            y_pos = (page_height - scaled_height) / 2
-            
-            # Adiciona a imagem ao PDF centralizada na página
-            c.drawImage(img_path, x_pos, y_pos, width=scaled_width, height=scaled_height)
-            c.showPage()  # Adiciona uma nova página para a próxima imagem
-        
-        # Salva o documento PDF
-        c.save()
-        messagebox.showinfo("Sucesso", f"PDF criado com sucesso: {output_pdf}")
-        
-    except Exception as e:
-        handle_error("convert_to_pdf", f"Erro ao converter imagens para PDF: {str(e)}", None)
+                print(msg)
 
+        if hash_arquivo is None:
+            hash_arquivo = calcular_hash_arquivo(caminho_pdf)
+        caminho_cache = cls.caminho_cache(caminho_pdf, pasta_cache, hash_arquivo)
 
-def dividir_pdf_1(diretorio):
+        indice = cls.carregar(caminho_cache, hash_arquivo)
+        if indice is not None:
+            log("    - Índice de páginas carregado do cache")
+            return indice
+
+        if leitor is None:
+            leitor = PdfReader(caminho_pdf)
+        indice = cls.construir(leitor, hash_arquivo)
+        try:
+            indice.calibrar(leitor, callback=log)
+        except Exception as e:
+            log(f"    - Não foi possível calibrar o índice, usando a estimativa padrão: {e}")
+
+        try:
+            os.makedirs(os.path.dirname(caminho_cache), exist_ok=True)
+            indice.salvar(caminho_cache)
+        except OSError as e:
+            log(f"    - Não foi possível salvar o cache do índice: {e}")
+        return indice
+
+
+class ContadorTamanhoParte:
     """
-    Divide um PDF em páginas individuais
+    Estima o tamanho em bytes de uma parte de PDF à medida que páginas são adicionadas.
+
+    Usa o IndicePaginasPdf para somar apenas os bytes exclusivos de cada página e os
+    objetos compartilhados que ainda não fazem parte da parte atual, de modo que
+    fontes e imagens repetidas são cobradas uma única vez por parte.
+
+    Args:
+        indice (IndicePaginasPdf): Índice de páginas do PDF
+    """
+
+    def __init__(self, indice):
+        self.indice = indice
+        self._objetos_parte = set()
+        self.tamanho = IndicePaginasPdf.SOBRECARGA_BASE
+
+    def reiniciar(self):
+        """Inicia a contagem de uma nova parte."""
+        self._objetos_parte = set()
+        self.tamanho = IndicePaginasPdf.SOBRECARGA_BASE
+
+    def custo_pagina(self, numero_pagina):
+        """Retorna quantos bytes a página acrescentaria à parte atual."""
+        novos = sum(
+            self.indice.custos_compartilhados[chave]
+            for chave in self.indice.paginas[numero_pagina]["compartilhados"]
+            if chave not in self._objetos_parte
+        )
+        return self.indice.custos_exclusivos[numero_pagina] + novos
+
+    def adicionar_pagina(self, numero_pagina):
+        """Contabiliza a página na parte atual e retorna o novo tamanho estimado."""
+        self.tamanho += self.custo_pagina(numero_pagina)
+        self._objetos_parte.update(self.indice.paginas[numero_pagina]["compartilhados"])
+        return self.tamanho
+
+
+def planejar_partes(indice, tamanho_mb_maximo):
+    """
+    Planeja os pontos de corte de uma divisão por tamanho a partir do índice de páginas.
+
+    Os recursos compartilhados entre páginas da mesma parte são cobrados uma única
+    vez. Como remover páginas de uma parte nunca aumenta seu tamanho, preencher cada
+    parte até o limite resulta no menor número de partes para os tamanhos estimados.
+    O tamanho gravado pode diferir da estimativa (ver IndicePaginasPdf), e quem grava
+    as partes deve conferir o resultado.
     
     Args:
-        diretorio (str): Caminho do arquivo PDF a ser dividido
+        indice (IndicePaginasPdf): Índice de páginas do PDF
+        tamanho_mb_maximo (float): Tamanho máximo em MB de cada parte
+    
+    Returns:
+        list: Lista de dicts {"inicio", "fim", "tamanho_previsto"}, com "fim" exclusivo
+        e "tamanho_previsto" em bytes. Uma página que sozinha ultrapassa o limite
+        forma uma parte própria.
     """
-    try:
-        nome_arquivo = os.path.splitext(os.path.basename(diretorio))[0]
-        pasta_saida = os.path.dirname(diretorio)  # Obtém o diretório do arquivo original
-        pdf = PdfReader(diretorio)
-        
-        if len(pdf.pages) == 0:
-            messagebox.showinfo("Aviso", "O PDF não contém páginas para dividir.")
-            return
-        elif len(pdf.pages) == 1:
-            messagebox.showinfo("Aviso", "O PDF contém apenas uma página. Nenhuma divisão necessária.")
-            return
-        else:
-            # Para cada página do PDF, cria um novo arquivo PDF com a página única
-            for pagina in range(len(pdf.pages)):
-                escreve_pdf = PdfWriter()
-                escreve_pdf.add_page(pdf.pages[pagina])
+    limite_bytes = tamanho_mb_maximo * 1048576
+    contador = ContadorTamanhoParte(indice)
+    partes = []
+    inicio = 0
 
-                nome_arquivo_saida = '{}_{}.pdf'.format(nome_arquivo, pagina)
-                nome_completo_saida = os.path.join(pasta_saida, nome_arquivo_saida)
-                
-                with open(nome_completo_saida, 'wb') as saida:
-                    escreve_pdf.write(saida)
-                
-                print('Criado: {}'.format(nome_arquivo_saida))
-            
-            messagebox.showinfo("Sucesso", "Divisão de PDF concluída.")
-            
-    except PdfStreamError:
-        msg_erro = "O arquivo selecionado não é um PDF válido ou está corrompido.\nPor favor, verifique o arquivo e tente novamente."
-        handle_error("Dividir PDF", msg_erro, None)
-        return
-    except PermissionError:
-        msg_erro = "O arquivo PDF está sendo utilizado por outro programa.\nFeche o arquivo e tente novamente."
-        handle_error("Dividir PDF", msg_erro, None)
-        return
-    except FileNotFoundError:
-        msg_erro = "O arquivo selecionado não foi encontrado.\nVerifique se o arquivo ainda existe no local especificado."
-        handle_error("Dividir PDF", msg_erro, None)
-        return
-    except Exception as e:
-        handle_error("Dividir PDF", f": {str(e)}", None)
-        return
+    for i in range(len(indice)):
+        if i > inicio and contador.tamanho + contador.custo_pagina(i) > limite_bytes:
+            partes.append({"inicio": inicio, "fim": i, "tamanho_previsto": contador.tamanho})
+            contador.reiniciar()
+            inicio = i
+        contador.adicionar_pagina(i)
 
+    if len(indice) > inicio:
+        partes.append({"inicio": inicio, "fim": len(indice), "tamanho_previsto": contador.tamanho})
 
-def reduzir_tamanho_pdf(input_pdf, output_pdf, qualidade_imagem=30, nivel_compressao=7, callback=None, tempo_total=None):
+    return partes
+
+
+def planejar_partes_equilibradas(indice, tamanho_mb_maximo):
     """
-    Reduz o tamanho de um arquivo PDF comprimindo conteúdo e imagens.
+    Planeja uma divisão com o menor número de partes e tamanhos o mais parecidos possível.
+
+    Cada página recebe um peso aditivo: seus bytes exclusivos mais uma fração de
+    cada objeto compartilhado, proporcional ao número de páginas que o usam. Com o
+    número mínimo de partes k (obtido por planejar_partes), uma programação dinâmica
+    minimiza o tamanho da maior parte. Como o ponto de corte ótimo só avança à
+    medida que a parte cresce, cada camada é resolvida com dois ponteiros, em O(n·k).
     
     Args:
-        input_pdf (str): Caminho do arquivo PDF de entrada
-        output_pdf (str): Caminho do arquivo PDF de saída
-        qualidade_imagem (int): Qualidade das imagens (1-100, padrão: 40)
-        nivel_compressao (int): Nível de compressão (1-9, padrão: 9)
+        indice (IndicePaginasPdf): Índice de páginas do PDF
+        tamanho_mb_maximo (float): Tamanho máximo em MB de cada parte
     
     Returns:
-        bool: True se bem-sucedido, False caso contrário
+        list: Lista de dicts {"inicio", "fim", "tamanho_previsto"}, no mesmo formato de
+        planejar_partes. Se alguma parte equilibrada ultrapassar o limite na contagem
+        exata, o plano sequencial é retornado.
+    """
+    plano_sequencial = planejar_partes(indice, tamanho_mb_maximo)
+    total_paginas = len(indice)
+    k = len(plano_sequencial)
+    if k <= 1:
+        return plano_sequencial
+
+    # Peso aditivo de cada página, com os objetos compartilhados rateados entre as páginas que os usam
+    usos = {}
+    for pagina in indice.paginas:
+        for chave in pagina["compartilhados"]:
+            usos[chave] = usos.get(chave, 0) + 1
+
+    acumulado = [0.0] * (total_paginas + 1)
+    for i, pagina in enumerate(indice.paginas):
+        peso = indice.custos_exclusivos[i] + sum(indice.custos_compartilhados[chave] / usos[chave]
+                                                 for chave in pagina["compartilhados"])
+        acumulado[i + 1] = acumulado[i] + peso
+
+    # melhor[j]: menor tamanho possível da maior parte ao dividir as j primeiras páginas em p partes
+    melhor = acumulado[:]
+    cortes = [[0] * (total_paginas + 1)]
+
+    for p in range(2, k + 1):
+        novo = [float("inf")] * (total_paginas + 1)
+        corte_camada = [0] * (total_paginas + 1)
+        i = p - 1
+        for j in range(p, total_paginas + 1):
+            while i + 1 < j and max(melhor[i + 1], acumulado[j] - acumulado[i + 1]) <= max(melhor[i], acumulado[j] - acumulado[i]):
+                i += 1
+            novo[j] = max(melhor[i], acumulado[j] - acumulado[i])
+            corte_camada[j] = i
+        melhor = novo
+        cortes.append(corte_camada)
+
+    # Reconstrói os intervalos a partir dos cortes escolhidos
+    limites = [total_paginas]
+    for p in range(k - 1, 0, -1):
+        limites.append(cortes[p][limites[-1]])
+    limites.reverse()
+
+    # Confere cada parte com a contagem exata dos objetos compartilhados
+    limite_bytes = tamanho_mb_maximo * 1048576
+    contador = ContadorTamanhoParte(indice)
+    partes = []
+    inicio = 0
+    for fim in limites:
+        contador.reiniciar()
+        for i in range(inicio, fim):
+            contador.adicionar_pagina(i)
+        if contador.tamanho > limite_bytes and fim - inicio > 1:
+            return plano_sequencial
+        partes.append({"inicio": inicio, "fim": fim, "tamanho_previsto": contador.tamanho})
+        inicio = fim
+
+    return partes
+
+
+# Leitor do PDF em memória, criado uma vez em cada processo de gravação de partes
+_LEITOR_MEMORIA = None
+
+
+def _iniciar_leitor_memoria(dados):
+    """Inicializador dos processos de gravação quando a origem é um PDF em memória."""
+    global _LEITOR_MEMORIA
+    _LEITOR_MEMORIA = PdfReader(BytesIO(dados))
+
+
+def _escrever_parte(leitor, inicio, fim, caminho_destino, caminho_temporario):
+    """
+    Grava as páginas [inicio, fim) do leitor em um nome temporário e publica a parte com
+    uma renomeação atômica, para que nunca exista um PTxx incompleto na pasta de saída.
+    
+    Returns:
+        int: Tamanho do arquivo gravado em bytes
+    """
+    escritor = EscritorPdf()
+    for i in range(inicio, fim):
+        escritor.add_page(leitor.pages[i])
+
+    with open(caminho_temporario, "wb") as arquivo:
+        escritor.write(arquivo)
+
+    tamanho = os.path.getsize(caminho_temporario)
+    os.replace(caminho_temporario, caminho_destino)
+    return tamanho
+
+
+def _gravar_parte_pdf(caminho_origem, inicio, fim, caminho_destino, caminho_temporario):
+    """
+    Grava as páginas [inicio, fim) do PDF de origem em um novo arquivo.
+
+    Executada em um processo separado: cada chamada abre a origem com seu próprio
+    PdfReader, por isso recebe apenas caminhos e números de página. Se caminho_origem
+    for None, usa o PDF em memória recebido pelo processo em _iniciar_leitor_memoria.
+    
+    Returns:
+        tuple: (tamanho do arquivo gravado em bytes, tempo de gravação em segundos)
     """
     import time
 
-    tempo_total = 0
+    tempo_inicio = time.time()
+    if caminho_origem is None:
+        tamanho = _escrever_parte(_LEITOR_MEMORIA, inicio, fim, caminho_destino, caminho_temporario)
+    else:
+        with abrir_pdf_leitura(caminho_origem) as leitor:
+            tamanho = _escrever_parte(leitor, inicio, fim, caminho_destino, caminho_temporario)
+    return tamanho, time.time() - tempo_inicio
+
+
+def gravar_partes_paralelo(caminho_origem, partes, pasta_saida, nome_arquivo_base, num_processos=None, callback=None, pasta_temporaria=None,
+                           leitor=None):
+    """
+    Grava as partes planejadas de um PDF em paralelo, uma parte por processo
 
+    A origem pode ser um arquivo ou o próprio PDF em memória (bytes ou memoryview). Em
+    memória, cada processo recebe o conteúdo uma única vez ao ser criado; com um único
+    processo, as partes saem direto do leitor já aberto, sem nova leitura nem cópia.
+    
+    Args:
+        caminho_origem (str | bytes | memoryview): Caminho do PDF de onde as páginas são lidas,
+            ou o PDF em memória
+        leitor (PdfReader): Leitor já aberto da origem, usado quando não há processos extras
+        partes (list): Plano de partes no formato de planejar_partes
+        pasta_saida (str): Pasta onde os arquivos PTxx são publicados
+        nome_arquivo_base (str): Nome do arquivo original, sem extensão
+        pasta_temporaria (str): Pasta, no mesmo disco de pasta_saida, onde cada parte
+            é gravada antes de ser renomeada. Se None, usa a própria pasta de saída
+        num_processos (int): Quantidade de processos. Se None, usa um por núcleo
+        callback (callable): Função de log, chamada a cada parte concluída
+    
+    Returns:
+        list: Para cada parte, na ordem do plano, um dict {"caminho", "tamanho", "tempo"}
+    """
     def log(msg):
         if callback:
             callback(msg)
         else:
             print(msg)
 
-    tempo_inicio = time.time()
-    
-    try:
-        # Cria o writer e clona do reader
-        writer = PdfWriter()
-        
-        # Abre e lê o PDF original
-        with open(input_pdf, "rb") as input_file:
-            reader = PdfReader(input_file)
-            total_pages = len(reader.pages)
-            
-            # Processa cada página
-            for i, page in enumerate(reader.pages):
-                log(f"    - Compactando página {i+1}/{total_pages}...")
+    if num_processos is None:
+        num_processos = os.cpu_count() or 1
+    num_processos = max(1, min(num_processos, len(partes)))
 
-                # Adiciona a página ao writer PRIMEIRO
-                writer.add_page(page)
-                
-                # Agora processa a página que pertence ao writer
-                writer_page = writer.pages[i]
+    em_memoria = not isinstance(caminho_origem, (str, os.PathLike))
 
-                # Comprime streams de conteúdo
-                try:
-                    writer_page.compress_content_streams(level=nivel_compressao)
-                except Exception as e:
-                    handle_error("reduzir_tamanho_pdf", f"Erro ao comprimir página {i+1}: {e}", None)
-                
-                # Processa imagens na página
-                try:
-                    if hasattr(writer_page, 'images') and writer_page.images:
-                        for img in writer_page.images:
-                            try:
-                                img.replace(img.image, quality=qualidade_imagem)
-                                # Sucesso ao processar imagem, não precisa logar
-                            except Exception as e:
-                                handle_error("reduzir_tamanho_pdf", f"Erro ao processar imagem na página {i+1}: {e}", None)
-                except Exception as e:
-                    handle_error("reduzir_tamanho_pdf", f"Erro ao acessar imagens da página {i+1}: {e}", None)
-                        
-        # Aplica compressão adicional no writer
-        try:
-            writer.compress_identical_objects()
-        except Exception as e:
-            handle_error("reduzir_tamanho_pdf", f"Erro ao comprimir objetos idênticos: {e}", None)
+    tarefas = []
+    for num_contagem, parte in enumerate(partes, start=1):
+        nome_parte = f"PT{num_contagem:02} {nome_arquivo_base}.pdf"
+        caminho_destino = os.path.join(pasta_saida, nome_parte)
+        caminho_temporario = os.path.join(pasta_temporaria or pasta_saida, f".{nome_parte}.parcial")
+        tarefas.append((None if em_memoria else caminho_origem, parte["inicio"], parte["fim"], caminho_destino, caminho_temporario))
 
-        # Salva o arquivo
-        with open(output_pdf, "wb") as output_file:
-            writer.write(output_file)
+    resultados = [None] * len(tarefas)
 
-        tempo_total = time.time() - tempo_inicio  # Calcula o tempo total
-        log(f"- Compactação finalizada.\nTempo de execução: {tempo_total:.2f} segundos")
-        # PDF reduzido salvo com sucesso
-        return True, tempo_total
-        
-    except FileNotFoundError:
-        msg_erro = f"Arquivo não encontrado: {input_pdf}\nVerifique se o arquivo ainda existe no local especificado."
-        log(f"• Erro: {msg_erro}")
-        handle_error("Compactar PDF", msg_erro, None)
-        return False, 0
-    except PdfStreamError:
-        msg_erro = "O arquivo selecionado não é um PDF válido ou está corrompido.\nPor favor, verifique o arquivo e tente novamente."
-        handle_error("Compactar PDF", msg_erro, None)
-        return False, 0
-    except PermissionError:
-        msg_erro = "O arquivo PDF está sendo utilizado por outro programa.\nFeche o arquivo e tente novamente."
-        handle_error("Compactar PDF", msg_erro, None)
-        return False, 0
-    except Exception as e:
-        log(f"• Erro ao compactar o PDF: {e}")
-        handle_error("Compactar PDF", f": {e}", None)
-        return False, 0
+    def registrar(indice, tamanho, tempo):
+        parte = partes[indice]
+        caminho_destino = tarefas[indice][3]
+        resultados[indice] = {"caminho": caminho_destino, "tamanho": tamanho, "tempo": tempo}
+        log(
+            f"    - {os.path.basename(caminho_destino)} criado com {parte['fim'] - parte['inicio']} páginas, "
+            f"tamanho: {tamanho / 1048576:.2f} MB (previsto: {parte['tamanho_previsto'] / 1048576:.2f} MB), "
+            f"tempo: {tempo:.2f} segundos"
+        )
+
+    # Com um único processo não compensa criar o pool
+    if num_processos == 1:
+        import time
 
+        if leitor is None and em_memoria:
+            leitor = PdfReader(BytesIO(caminho_origem))
+        for indice, tarefa in enumerate(tarefas):
+            if leitor is None:
+                registrar(indice, *_gravar_parte_pdf(*tarefa))
+                continue
+            tempo_inicio = time.time()
+            tamanho = _escrever_parte(leitor, *tarefa[1:])
+            registrar(indice, tamanho, time.time() - tempo_inicio)
+        return resultados
 
-def dividir_pdf_por_tamanho(caminho, caminho_saida, tamanho_mb_maximo=4.4, nome_usuario=None, callback=None):
+    # Os processos recebem o conteúdo serializado, e uma memoryview não pode ser serializada
+    opcoes_pool = {"initializer": _iniciar_leitor_memoria, "initargs": (bytes(caminho_origem),)} if em_memoria else {}
+    with ProcessPoolExecutor(max_workers=num_processos, **opcoes_pool) as executor:
+        futuros = {executor.submit(_gravar_parte_pdf, *tarefa): indice for indice, tarefa in enumerate(tarefas)}
+        for futuro in as_completed(futuros):
+            registrar(futuros[futuro], *futuro.result())
+
+    return resultados
+
+
+def dividir_pdf_por_tamanho(caminho, caminho_saida, tamanho_mb_maximo=4.4, nome_usuario=None, callback=None, modo_divisao="sequencial", num_processos=None,
+                            ajustar_tamanho=False, compactar=True):
     """
     Divide um PDF em partes menores baseado no tamanho máximo especificado
     
     Args:
         arquivo_pdf (str): Caminho do arquivo PDF a ser dividido
         tamanho_max_mb (int): Tamanho máximo em MB para cada parte
+        modo_divisao (str): "sequencial" preenche cada parte até o limite;
+            "equilibrado" usa o mesmo número de partes com tamanhos parecidos
+        num_processos (int): Quantidade de processos usados para gravar as partes.
+            Se None, usa um por núcleo
+        ajustar_tamanho (bool): Procura a qualidade de imagem com que o PDF cabe em um único
+            arquivo; só divide se nem a menor qualidade for suficiente
+        compactar (bool): Se False, divide o original sem compactar (por exemplo, quando
+            analisar_compactacao indica que a compactação quase não reduziria o arquivo)
     """
     import time
 
-    lista_tempo_total = []
+    # O tempo total é o do relógio, desde o início: inclui hash, índice e tudo o que não é medido à parte
+    tempo_inicio_total = time.time()
     tempo_total = 0
     
     def log(msg):
@@ -267,124 +3455,131 @@ def dividir_pdf_por_tamanho(caminho, caminho_saida, tamanho_mb_maximo=4.4, nome_
         else:
             print(msg)
     
+    # Pasta temporária exclusiva deste trabalho, no mesmo disco da pasta de saída (fora dela)
+    espaco_trabalho = EspacoTrabalho(caminho_saida)
+
     try:
         mensagem_final = []
         log_tempo = []  # Lista para armazenar dados de tempo
 
-        # Determinar o caminho da pasta temporária na pasta Documentos
-        temp_folder = os.path.join(os.path.expanduser('~'), 'Documents', 'temp_folder')
-        
-        # Verifica se a pasta definida na temp_folder existe. Se existir, apaga a mesma antes de seguir com a função
-        if os.path.exists(temp_folder):
-            # Excluir a pasta temporária
-            shutil.rmtree(temp_folder)
+        temp_folder = espaco_trabalho.criar()
 
-        os.makedirs(temp_folder, exist_ok=True)
-
-        # Copiar o arquivo selecionado para a pasta temporária
+        # O original é lido no próprio local; o resultado da compactação só passa pela pasta
+        # temporária quando vira o arquivo final
         caminho_temp = os.path.join(temp_folder, os.path.basename(caminho))
-        shutil.copy(caminho, caminho_temp)
 
-        tamanho_sem_compactar = round(os.path.getsize(caminho_temp) / 1048576, 2) # Converte para MB
+        tamanho_sem_compactar = round(os.path.getsize(caminho) / 1048576, 2) # Converte para MB
+
+        parametros_compactacao = {}
+        if ajustar_tamanho and compactar:
+            log(f"- Estimando a qualidade para caber em {LIMITE_ARQUIVO_UNICO_MB:.1f} MB...")
+            try:
+                ajuste = estimar_compressao_para_tamanho(caminho, LIMITE_ARQUIVO_UNICO_MB * MARGEM_ESTIMATIVA, callback=log)
+            except Exception as e:
+                log(f"    - Não foi possível estimar a qualidade, usando a padrão: {e}")
+            else:
+                if ajuste["cabe"]:
+                    parametros_compactacao = {"qualidade_imagem": ajuste["qualidade"], "dpi_alvo": ajuste["dpi"]}
+                    log(f"    - Usando qualidade {ajuste['qualidade']} e {ajuste['dpi']} DPI "
+                        f"(estimativa: {ajuste['tamanho_estimado']:.2f} MB)")
+                else:
+                    log(f"    - Mesmo com qualidade {ajuste['qualidade']} e {ajuste['dpi']} DPI o PDF ficaria com "
+                        f"{ajuste['tamanho_estimado']:.2f} MB; usando a qualidade padrão e dividindo")
 
-        # Compactar o arquivo PDF antes de dividir
-        log("- Compactando PDF antes de dividir...")
-        sucesso_compactacao, tempo_total_compactacao = reduzir_tamanho_pdf(caminho_temp, caminho_temp, callback=log)
+        # Compactar o arquivo PDF antes de dividir. O resultado fica em memória e é entregue
+        # direto à divisão, sem gravar e reler um arquivo temporário
+        if compactar:
+            log("- Compactando PDF antes de dividir...")
+            buffer_compactado = BytesIO()
+            sucesso_compactacao, tempo_total_compactacao = reduzir_tamanho_pdf(caminho, buffer_compactado, callback=log,
+                                                                               **parametros_compactacao)
+        else:
+            log("- Compactação ignorada, dividindo o arquivo original...")
+            sucesso_compactacao, tempo_total_compactacao = True, 0
 
-        lista_tempo_total.append(tempo_total_compactacao)
 
         if not sucesso_compactacao:
             # Excluir a pasta temporária criada
-            if os.path.exists(temp_folder):
-                shutil.rmtree(temp_folder)
-                log("• Erro ao compactar o PDF. A pasta temporária foi excluída.")
-                print("Erro", "Não foi possível compactar o PDF. Verifique o arquivo e tente novamente.")
+            espaco_trabalho.remover()
+            log("• Erro ao compactar o PDF. A pasta temporária foi excluída.")
+            print("Erro", "Não foi possível compactar o PDF. Verifique o arquivo e tente novamente.")
             return
 
-        tamanho_compactado = round(os.path.getsize(caminho_temp) / 1048576, 2)  # Converte para MB
+        # Visão sobre o próprio buffer, sem copiar o documento compactado
+        dados_compactados = buffer_compactado.getbuffer() if compactar else None
+        tamanho_bytes = dados_compactados.nbytes if compactar else os.path.getsize(caminho)
+        tamanho_compactado = round(tamanho_bytes / 1048576, 2)  # Converte para MB
 
         log("- Iniciando divisão do PDF...")
 
-        if tamanho_compactado > 4.9:
-            # Atualizar o caminho para o arquivo temporário copiado
-            leitor_pdf = PdfReader(caminho_temp)
-            total_pages = len(leitor_pdf.pages)
-
-            num_contagem = 1
-            current_writer = PdfWriter()
-            temp_caminho = os.path.join(temp_folder, "temp.pdf")
-
-            def save_current_part():
-                nonlocal num_contagem, current_writer, temp_caminho
-
-                if len(current_writer.pages) > 0:
-                    nome_arquivo_base = os.path.splitext(os.path.basename(caminho))[0]
-                    output_file_name = f"PT{num_contagem:02} {nome_arquivo_base}.pdf"
-                    output_caminho = os.path.join(temp_folder, output_file_name)
-                    
-                    # Escrever diretamente no arquivo final ao invés de usar arquivo temporário
-                    with open(output_caminho, "wb") as output_file:
-                        current_writer.write(output_file)
-                    
-                    current_size_mb = os.path.getsize(output_caminho) / 1048576
-                    log(f"    - {output_file_name} criado com {len(current_writer.pages)} páginas, tamanho: {current_size_mb:.2f} MB")
-                    mensagem_final.append(f"{output_file_name} criado com {len(current_writer.pages)} páginas, tamanho: {current_size_mb:.2f} MB\n")
-                    
-                    num_contagem += 1
-                    current_writer = PdfWriter()
-            
-            tempo_inicio_pdf = time.time()  # Início do processamento da página
-
-            for i in range(total_pages):
-                log(f"    - Dividindo página {i+1}/{total_pages}...")
-                current_writer.add_page(leitor_pdf.pages[i])
-
-                # Salva a parte atual temporariamente e verifica o tamanho do arquivo
-                if len(current_writer.pages) >= 1:
-                    current_writer.write(temp_caminho)
-                    current_size_mb = os.path.getsize(temp_caminho) / 1048576
-                    if current_size_mb >= tamanho_mb_maximo:
-                        log(f"    - Tamanho excedido: {current_size_mb:.2f} MB, salvando parte {num_contagem}")
-                        save_current_part()
-
-                        tempo_pdf = time.time() - tempo_inicio_pdf  # Tempo gasto para processar o arquivo PDF
-                        lista_tempo_total.append(tempo_pdf)
-                
-                        log_msg = f"    - PDF {num_contagem-1}: {tempo_pdf:.2f} segundos"
-                        log(log_msg)
-                        log_tempo.append(log_msg)
+        if tamanho_compactado > LIMITE_ARQUIVO_UNICO_MB:
+            tempo_inicio_abertura = time.time()
+            if compactar:
+                contexto_leitor = nullcontext(PdfReader(buffer_compactado))
+            else:
+                contexto_leitor = abrir_pdf_leitura(caminho)
 
-                        tempo_inicio_pdf = time.time()  # reinicia contagem para próxima parte
+            with contexto_leitor as leitor_pdf:
+                total_pages = len(leitor_pdf.pages)
+                if compactar:
+                    # Tempo para abrir o leitor sobre o resultado em memória; a gravação e a
+                    # releitura do arquivo temporário deixaram de existir
+                    tempo_abertura = time.time() - tempo_inicio_abertura
+                    log_tempo.append(f"    - Abertura do leitor em memória para a divisão: {tempo_abertura:.2f} segundos")
+                    log(f"    - Leitor do PDF compactado aberto em memória em {tempo_abertura:.2f} segundos")
 
-            # Salva a última parte, se houver páginas restantes
-            if len(current_writer.pages) > 0:
-                tempo_inicio_pdf = time.time()  # Início do processamento da página
-                log(f"    - Salvando última parte {num_contagem} com {len(current_writer.pages)} páginas")
-                save_current_part()
-                tempo_pdf = time.time() - tempo_inicio_pdf  # Tempo gasto para processar o arquivo PDF
-                lista_tempo_total.append(tempo_pdf)
+                # A chave do cache é o arquivo de origem mais os parâmetros da compactação, que
+                # determinam o resultado; assim não é preciso calcular o hash do PDF compactado
+                tempo_inicio_indice = time.time()
+                configuracao = json.dumps({"compactar": compactar, **parametros_compactacao}, sort_keys=True)
+                chave_cache = hashlib.sha256(f"{calcular_hash_arquivo(caminho)}|{configuracao}".encode()).hexdigest()
+                tempo_hash = time.time() - tempo_inicio_indice
+                indice_paginas = IndicePaginasPdf.carregar_ou_construir(caminho, leitor_pdf, callback=log,
+                                                                        hash_arquivo=chave_cache)
+                tempo_indice = time.time() - tempo_inicio_indice - tempo_hash
+                log_tempo.append(f"    - Hash do arquivo original: {tempo_hash:.2f} segundos")
+                log_tempo.append(f"    - Índice de páginas: {tempo_indice:.2f} segundos")
+                log(f"    - Hash calculado em {tempo_hash:.2f} segundos, índice de páginas pronto em {tempo_indice:.2f} segundos")
 
-                tempo_total = 0
-                for tempo in lista_tempo_total:
-                    tempo_total += tempo
+                if modo_divisao == "equilibrado":
+                    plano_partes = planejar_partes_equilibradas(indice_paginas, tamanho_mb_maximo)
+                else:
+                    plano_partes = planejar_partes(indice_paginas, tamanho_mb_maximo)
+                log(f"    - {len(plano_partes)} partes planejadas")
 
-                print(f"Tempo total = {tempo_total}")
+                nome_arquivo_base = os.path.splitext(os.path.basename(caminho))[0]
 
-                log_msg = f"    - PDF {num_contagem-1}: {tempo_pdf:.2f} segundos"
-                log(log_msg)
-                log_tempo.append(log_msg)
+                # Cada parte é independente: grava todas em paralelo diretamente na pasta de saída
+                log(f"    - Gravando {len(plano_partes)} partes...")
+                resultados = gravar_partes_paralelo(dados_compactados if compactar else caminho, plano_partes, caminho_saida,
+                                                    nome_arquivo_base, num_processos=num_processos, callback=log,
+                                                    pasta_temporaria=temp_folder, leitor=leitor_pdf)
 
-            log(f"- Tempo total gasto para dividir o PDF: {tempo_total:.2f} segundos")
+            # As partes já estão gravadas: libera o documento compactado antes do resumo
+            if compactar:
+                dados_compactados.release()
+                buffer_compactado.close()
+                dados_compactados = buffer_compactado = None
+
+            for num_contagem, (parte, resultado) in enumerate(zip(plano_partes, resultados), start=1):
+                output_file_name = os.path.basename(resultado["caminho"])
+                quantidade_paginas = parte["fim"] - parte["inicio"]
+                current_size_mb = resultado["tamanho"] / 1048576
+                mensagem_final.append(f"{output_file_name} criado com {quantidade_paginas} páginas, tamanho: {current_size_mb:.2f} MB\n")
+
+                if current_size_mb > tamanho_mb_maximo:
+                    log(f"    - Atenção: {output_file_name} ultrapassou o limite de {tamanho_mb_maximo:.2f} MB")
 
-            # Mover os arquivos gerados de volta para a pasta original
-            for file_name in os.listdir(temp_folder):
-                if file_name.startswith("PT"):
-                    log(f"- Movendo arquivo {file_name} para {caminho_saida}")
-                    shutil.move(os.path.join(temp_folder, file_name), caminho_saida)
+                log_tempo.append(f"    - PDF {num_contagem}: {resultado['tempo']:.2f} segundos")
+
+            tempo_total = time.time() - tempo_inicio_total
+            print(f"Tempo total = {tempo_total}")
+
+            log(f"- Tempo total gasto para dividir o PDF: {tempo_total:.2f} segundos")
 
             # Excluir a pasta temporária
             log("- Excluindo pasta temporária: " + temp_folder)
-            shutil.rmtree(temp_folder)
+            espaco_trabalho.remover()
 
             TEMPO_MINIMO_LOG = 120
             # Após processar todas as partes
@@ -416,15 +3611,17 @@ def dividir_pdf_por_tamanho(caminho, caminho_saida, tamanho_mb_maximo=4.4, nome_
             messagebox.showinfo("Sucesso", f"Compactação e divisão de PDF concluída.\n\n{'\n'.join(mensagem_final)}\n\n{'\n'.join(informacao_compactacao)}")
 
         else:
-            if os.path.exists(caminho):
-                os.remove(caminho)
-
-            # Mover os arquivos gerados de volta para a pasta original
-            for file_name in os.listdir(temp_folder):
-                shutil.move(os.path.join(temp_folder, file_name), caminho_saida)
+            # Substitui o original pelo arquivo compactado com uma renomeação atômica (mesmo disco)
+            if compactar:
+                with open(caminho_temp, "wb") as arquivo_temp:
+                    arquivo_temp.write(dados_compactados)
+                dados_compactados.release()
+                buffer_compactado.close()
+                dados_compactados = buffer_compactado = None
+                os.replace(caminho_temp, os.path.join(caminho_saida, os.path.basename(caminho)))
 
             # Excluir a pasta temporária
-            shutil.rmtree(temp_folder)
+            espaco_trabalho.remover()
 
             # Calculando a redução de tamanho em KB e em porcentagem
             reducao_tamanho_mb = (tamanho_sem_compactar - tamanho_compactado)
@@ -454,6 +3651,9 @@ def dividir_pdf_por_tamanho(caminho, caminho_saida, tamanho_mb_maximo=4.4, nome_
     except Exception as e:
         handle_error("Dividir PDF por Tamanho", f": {str(e)}", None)
         return
+    finally:
+        # Garante a remoção da pasta temporária mesmo em caso de erro
+        espaco_trabalho.remover()
 
 
 def selecionar_arquivo_pdf(caminho_inicial: str = ""):
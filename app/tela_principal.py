@@ -7,13 +7,13 @@ import threading
 import re
 
 try:
-    from .utils import config_btn, switch_altera_modo_dark_light, print_dimensao, validar_caminho_ou_selecionar, criar_pastas, handle_error, IconManager, Tooltip
-    from .pdf_utils import convert_to_pdf, dividir_pdf_1, dividir_pdf_por_tamanho, selecionar_arquivo_pdf
+    from .utils import config_btn, switch_altera_modo_dark_light, print_dimensao, validar_caminho_ou_selecionar, criar_pastas, handle_error, IconManager, Tooltip, limpar_espacos_trabalho_orfaos
+    from .pdf_utils import convert_to_pdf, dividir_pdf_1, dividir_pdf_por_tamanho, selecionar_arquivo_pdf, analisar_compactacao, DPI_ALVO_IMAGEM, LIMITE_ARQUIVO_UNICO_MB
     from .mensagens import MensagemInterativa
     from .version_checker import get_version
 except ImportError:
-    from utils import config_btn, switch_altera_modo_dark_light, print_dimensao, validar_caminho_ou_selecionar, criar_pastas, handle_error, IconManager, Tooltip
-    from pdf_utils import convert_to_pdf, dividir_pdf_1, dividir_pdf_por_tamanho, selecionar_arquivo_pdf
+    from utils import config_btn, switch_altera_modo_dark_light, print_dimensao, validar_caminho_ou_selecionar, criar_pastas, handle_error, IconManager, Tooltip, limpar_espacos_trabalho_orfaos
+    from pdf_utils import convert_to_pdf, dividir_pdf_1, dividir_pdf_por_tamanho, selecionar_arquivo_pdf, analisar_compactacao, DPI_ALVO_IMAGEM, LIMITE_ARQUIVO_UNICO_MB
     from mensagens import MensagemInterativa
     from version_checker import get_version
 
@@ -38,7 +38,11 @@ class PDFMasterApp:
         self.entry_caminho_pasta_dividir_por_tamanho = None
         self.entry_caminho_dividir_pdf_1 = None
         self.btn_abrir_pasta_dividir_pdf_por_tamanho = None
+        self.checkbox_partes_equilibradas = None
+        self.checkbox_ajustar_tamanho = None
         self.btn_dividir_pdf = None
+        self.btn_converter = None
+        self.checkbox_reduzir_fotos = None
         self.tab_janela = None
         self.frame_contatos_sair = None
         self.frame_switch = None
@@ -50,12 +54,20 @@ class PDFMasterApp:
         self.debug_textbox = None
         self.debug_expanded = False
         self.timer_hide_debug = None  # Armazena o ID do timer ativo
+        self.ultima_linha_progresso = False  # Se a última linha do debug é de progresso
         self.icone = IconManager()
 
         self.mensagem_sistema = MensagemInterativa(nome_usuario)
         self.titulo_label = None
 
         self.thread_rodando = False
+        self.conversao_rodando = False
+
+        # Remove pastas temporárias deixadas por execuções interrompidas
+        try:
+            limpar_espacos_trabalho_orfaos()
+        except Exception as e:
+            print(f"Erro ao limpar espaços de trabalho antigos: {e}")
 
         # Configurar modo de aparência
         customtkinter.set_appearance_mode("system")
@@ -161,17 +173,23 @@ class PDFMasterApp:
         """Adiciona mensagem ao campo de debug"""
         self.debug_textbox.configure(state="normal")
         
-        # Se for mensagem de progresso de página, sobrescreve a última linha
-        if (
+        progresso = (
             "Compactando página" in msg
+            or "Compactando imagem" in msg
             or "Dividindo página" in msg
-        ):
+            or "Convertendo imagem" in msg
+        )
+
+        # Mensagem de progresso sobrescreve a última linha, mas só se ela também for de
+        # progresso; qualquer outra mensagem é preservada
+        if progresso and self.ultima_linha_progresso:
             # Remove a última linha antes de inserir a nova
             self.debug_textbox.delete("end-2l", "end-1l")
             self.debug_textbox.insert("end-1l", msg + "\n")
         else:
             self.debug_textbox.insert("end", msg + "\n")
             self.debug_textbox.see("end")
+        self.ultima_linha_progresso = progresso
         
         self.debug_textbox.configure(state="disabled")
 
@@ -257,12 +275,19 @@ class PDFMasterApp:
                                                      border_width=1)
         self.entry_nome_do_arquivo_pdf.pack(pady=(5, 10))
 
+        # Opção para reduzir a resolução das fotos já na conversão
+        self.checkbox_reduzir_fotos = customtkinter.CTkCheckBox(master=frame_aba_imagem_pdf,
+                                                                text=f"Reduzir resolução das fotos ({DPI_ALVO_IMAGEM} DPI)",
+                                                                checkbox_width=18,
+                                                                checkbox_height=18)
+        self.checkbox_reduzir_fotos.pack(pady=(0,0))
+
         # Botão para converter imagens em PDF
-        btn_converter = customtkinter.CTkButton(master=frame_aba_imagem_pdf,
-                                                text="Converter Imagens para PDF",
-                                                command=self.converter_imagens)
-        btn_converter.pack(pady=15)
-        config_btn(btn_converter)
+        self.btn_converter = customtkinter.CTkButton(master=frame_aba_imagem_pdf,
+                                                     text="Converter Imagens para PDF",
+                                                     command=self.converter_imagens)
+        self.btn_converter.pack(pady=15)
+        config_btn(self.btn_converter)
 
         # Botão para criar pastas padrão
         btn_criar_pastas = customtkinter.CTkButton(master=frame_aba_imagem_pdf,
@@ -322,6 +347,20 @@ class PDFMasterApp:
                                                      border_width=1)
         self.entry_caminho_pasta_dividir_por_tamanho.pack(pady=(0,5))
 
+        # Opção para gerar partes com tamanhos equilibrados em vez de preencher cada parte até o limite
+        self.checkbox_partes_equilibradas = customtkinter.CTkCheckBox(master=frame_aba_dividir_pdf_por_tamanho,
+                                                                      text="Partes com tamanhos equilibrados",
+                                                                      checkbox_width=18,
+                                                                      checkbox_height=18)
+        self.checkbox_partes_equilibradas.pack(pady=(5,0))
+
+        # Opção para reduzir a qualidade das imagens até o PDF caber em um único arquivo
+        self.checkbox_ajustar_tamanho = customtkinter.CTkCheckBox(master=frame_aba_dividir_pdf_por_tamanho,
+                                                                  text="Tentar caber em um único arquivo",
+                                                                  checkbox_width=18,
+                                                                  checkbox_height=18)
+        self.checkbox_ajustar_tamanho.pack(pady=(5,0))
+
         # Botão para abrir o caminho especificado
         self.btn_abrir_pasta_dividir_pdf_por_tamanho = customtkinter.CTkButton(master=frame_aba_dividir_pdf_por_tamanho, 
                                                   text="Dividir PDF por Tamanho: até 5 MB", 
@@ -482,6 +521,11 @@ class PDFMasterApp:
     # Métodos de comando dos botões - integrados com utils e pdf_utils
     def converter_imagens(self):
         """Converte imagens para PDF"""
+        # Impede que a conversão rode junto com outra tarefa
+        if self.conversao_rodando or self.thread_rodando:
+            messagebox.showinfo("Atenção", "Já existe uma tarefa em andamento. Aguarde a finalização.")
+            return
+
         caminho = self.entry_caminho_pasta.get()
 
         self._easter_egg(caminho)
@@ -507,10 +551,41 @@ class PDFMasterApp:
             # Limpa o nome do arquivo removendo caracteres inválidos
             output_pdf = output_pdf.replace('\n', '').replace('\r', '')
 
-            convert_to_pdf(caminho_validado, output_pdf)
+            dpi_alvo = DPI_ALVO_IMAGEM if self.checkbox_reduzir_fotos.get() else None
+
+            self.conversao_rodando = True
+            self.bloqueia_botão()  # Desativa os botões de todas as tarefas
+            self.show_debug_console()  # Mostra o campo de debug
+
+            def thread_target():
+                try:
+                    self._converter_imagens_thread(caminho_validado, output_pdf, dpi_alvo)
+                finally:
+                    self.conversao_rodando = False  # Libera a flag ao fim da thread
+                    self.btn_converter.after(0, self.restaurar_botao)
+
+            # Converte as imagens em thread separada, para não travar a janela
+            threading.Thread(target=thread_target, daemon=True).start()
 
         self.janela.focus()
 
+    def _converter_imagens_thread(self, caminho_pasta, output_pdf, dpi_alvo=None):
+        try:
+            # Cancela o timer anterior se existir
+            if self.timer_hide_debug:
+                self.janela.after_cancel(self.timer_hide_debug)
+                self.timer_hide_debug = None
+
+            self.clear_debug()
+            self.append_debug("Iniciando conversão das imagens...")
+            convert_to_pdf(caminho_pasta, output_pdf, callback=self.append_debug, dpi_alvo=dpi_alvo)
+        except Exception as e:
+            self.append_debug(f"Erro: {e}")
+        finally:
+            # Aguarda um tempo para o usuário ver a mensagem final, se quiser
+            # e armazena o ID do novo timer
+            self.timer_hide_debug = self.janela.after(15000, self.hide_debug_console)
+
     def criar_pastas_interface(self):
         """Cria pastas padrão"""
         caminho = self.entry_caminho_pasta.get()
@@ -526,9 +601,9 @@ class PDFMasterApp:
 
     def dividir_pdf_1_interface(self):
         """Divide PDF em páginas individuais"""
-        # Impede múltiplas execuções simultâneas
-        if self.thread_rodando:
-            messagebox.showinfo("Atenção", "Já existe uma divisão em andamento. Aguarde a finalização.")
+        # Impede múltiplas execuções simultâneas, inclusive durante uma conversão
+        if self.thread_rodando or self.conversao_rodando:
+            messagebox.showinfo("Atenção", "Já existe uma tarefa em andamento. Aguarde a finalização.")
             return
         self.thread_rodando = True  # Marca que a thread está rodando
         self.btn_dividir_pdf.after(0, self.bloqueia_botão)  # Desativa botão
@@ -595,9 +670,11 @@ class PDFMasterApp:
             # Em caso de erro na validação, permite continuar mas mostra aviso
             print(f"Erro na validação de arquivos existentes: {e}")
 
+        self.show_debug_console()  # Mostra o campo de debug
+
         def thread_target():
             try:
-                dividir_pdf_1(arquivo)
+                self._dividir_pdf_1_thread(arquivo)
             finally:
                 self.thread_rodando = False  # Libera a flag ao fim da thread
                 self.btn_dividir_pdf.after(0, self.restaurar_botao)
@@ -614,9 +691,9 @@ class PDFMasterApp:
 
     def dividir_pdf_por_tamanho_interface(self):
         """Divide PDF por tamanho"""
-        # Impede múltiplas execuções simultâneas
-        if self.thread_rodando:
-            messagebox.showinfo("Atenção", "Já existe uma divisão em andamento. Aguarde a finalização.")
+        # Impede múltiplas execuções simultâneas, inclusive durante uma conversão
+        if self.thread_rodando or self.conversao_rodando:
+            messagebox.showinfo("Atenção", "Já existe uma tarefa em andamento. Aguarde a finalização.")
             return
         self.thread_rodando = True  # Marca que a thread está rodando
         self.btn_abrir_pasta_dividir_pdf_por_tamanho.after(0, self.bloqueia_botão)  # Desativa botão
@@ -651,7 +728,7 @@ class PDFMasterApp:
 
         # Verifica o tamanho do arquivo
         tamanho_arquivo = os.path.getsize(arquivo)
-        tamanho_limite = 4.9 * 1024*1024
+        tamanho_limite = LIMITE_ARQUIVO_UNICO_MB * 1024 * 1024
 
         if tamanho_arquivo < tamanho_limite:
             tamanho_mb = tamanho_arquivo / (1024*1024)  # Converte para MB
@@ -703,10 +780,13 @@ class PDFMasterApp:
                     print(f"Erro ao remover {arquivos_com_PTxx}: {e}")
 
         self.show_debug_console()  # Mostra o campo de debug
+
+        modo_divisao = "equilibrado" if self.checkbox_partes_equilibradas.get() else "sequencial"
+        ajustar_tamanho = bool(self.checkbox_ajustar_tamanho.get())
         
         def thread_target():
             try:
-                self._dividir_pdf_por_tamanho_thread(arquivo, pasta_saida)
+                self._dividir_pdf_por_tamanho_thread(arquivo, pasta_saida, modo_divisao, ajustar_tamanho)
             finally:
                 self.thread_rodando = False  # Libera a flag ao fim da thread
                 self.btn_abrir_pasta_dividir_pdf_por_tamanho.after(0, self.restaurar_botao)
@@ -723,6 +803,7 @@ class PDFMasterApp:
 
     def bloqueia_botão(self):
         """Bloqueia os botões"""
+        self.btn_converter.configure(state="disabled")
         self.btn_abrir_pasta_dividir_pdf_por_tamanho.configure(
             state="disabled",
             fg_color=("#3a7ebf", "#1f538d"),
@@ -738,6 +819,7 @@ class PDFMasterApp:
 
     def restaurar_botao(self):
         """Restaura o estado normal dos botões, após o threading finalizar"""
+        self.btn_converter.configure(state="normal")
         self.btn_abrir_pasta_dividir_pdf_por_tamanho.configure(
             state="normal",
             fg_color=("#3a7ebf", "#1f538d"),
@@ -751,7 +833,24 @@ class PDFMasterApp:
             hover=True,
         )
 
-    def _dividir_pdf_por_tamanho_thread(self, arquivo, pasta_saida):
+    def _dividir_pdf_1_thread(self, arquivo):
+        try:
+            # Cancela o timer anterior se existir
+            if self.timer_hide_debug:
+                self.janela.after_cancel(self.timer_hide_debug)
+                self.timer_hide_debug = None
+
+            self.clear_debug()
+            self.append_debug("Iniciando divisão do PDF em páginas...")
+            dividir_pdf_1(arquivo, callback=self.append_debug)
+        except Exception as e:
+            self.append_debug(f"Erro: {e}")
+        finally:
+            # Aguarda um tempo para o usuário ver a mensagem final, se quiser
+            # e armazena o ID do novo timer
+            self.timer_hide_debug = self.janela.after(15000, self.hide_debug_console)
+
+    def _dividir_pdf_por_tamanho_thread(self, arquivo, pasta_saida, modo_divisao="sequencial", ajustar_tamanho=False):
         try:
             # Cancela o timer anterior se existir
             if self.timer_hide_debug:
@@ -760,7 +859,35 @@ class PDFMasterApp:
 
             self.clear_debug()
             self.append_debug("Iniciando divisão do PDF...")
-            dividir_pdf_por_tamanho(arquivo, pasta_saida, nome_usuario=self.nome_usuario, callback=self.append_debug)
+
+            # Estima o ganho e o tempo da compactação antes de começar
+            TEMPO_AVISO_COMPACTACAO = 60
+            compactar = True
+            self.append_debug("- Analisando o PDF...")
+            try:
+                analise = analisar_compactacao(arquivo, callback=self.append_debug)
+            except Exception as e:
+                self.append_debug(f"    - Não foi possível analisar o PDF: {e}")
+            else:
+                if not analise["vale_a_pena"] and not ajustar_tamanho:
+                    compactar = False
+                    self.append_debug(f"    - A compactação reduziria apenas {analise['reducao'] * 100:.0f}% e será ignorada")
+                elif analise["tempo_estimado"] >= TEMPO_AVISO_COMPACTACAO:
+                    prosseguir = messagebox.askyesno(
+                        "Compactação demorada",
+                        (
+                            f"A compactação deve levar cerca de {analise['tempo_estimado'] / 60:.0f} minuto(s) "
+                            f"e reduzir o arquivo de {analise['tamanho_original']:.2f} MB "
+                            f"para aproximadamente {analise['tamanho_estimado']:.2f} MB.\n\n"
+                            f"Deseja prosseguir?"
+                        )
+                    )
+                    if not prosseguir:
+                        self.append_debug("Divisão cancelada.")
+                        return
+
+            dividir_pdf_por_tamanho(arquivo, pasta_saida, nome_usuario=self.nome_usuario, callback=self.append_debug, modo_divisao=modo_divisao,
+                                    ajustar_tamanho=ajustar_tamanho, compactar=compactar)
             self.append_debug("Divisão concluída!")
         except Exception as e:
             self.append_debug(f"Erro: {e}")
@@ -777,6 +904,7 @@ class PDFMasterApp:
         """Limpa o campo de debug"""
         self.debug_textbox.configure(state="normal")
         self.debug_textbox.delete("1.0", "end")
+        self.ultima_linha_progresso = False
         self.debug_textbox.configure(state="disabled")
 
     def toggle_ajuda(self):
@@ -1,4 +1,10 @@
 import os
+import atexit
+import json
+import re
+import shutil
+import tempfile
+import time
 from os.path import exists
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext, Toplevel, Button, Label
@@ -106,6 +112,248 @@ class IconManager:
         print("Não foi possível carregar o ícone de nenhum dos caminhos disponíveis")
 
 
+# Índices de páginas salvos entre uma divisão e outra (IndicePaginasPdf) e os limites
+# aplicados por limpar_cache_indices: idade e tamanho total da pasta
+PASTA_CACHE_INDICES = os.path.join(tempfile.gettempdir(), "PDFMaster_indices")
+IDADE_MAXIMA_CACHE_INDICES = 30 * 24 * 3600
+TAMANHO_MAXIMO_CACHE_INDICES = 200 * 1048576
+
+
+def _mesmo_disco(caminho_a, caminho_b):
+    """Verifica se dois caminhos existentes estão no mesmo disco (volume)."""
+    try:
+        return os.stat(caminho_a).st_dev == os.stat(caminho_b).st_dev
+    except OSError:
+        return False
+
+
+class EspacoTrabalho:
+    """
+    Pasta temporária exclusiva de um trabalho (compactação, divisão...).
+
+    Cada trabalho recebe uma pasta com nome único, criada no mesmo disco da pasta de
+    destino, para que os resultados sejam publicados com uma renomeação atômica. A
+    pasta fica em PASTA_REGISTRO (Documentos/PDFMaster_temp) ou, se o destino estiver
+    em outro disco, na pasta temporária do sistema; só quando nenhuma das duas está no
+    disco do destino ela é criada dentro da própria pasta de destino. Assim vários
+    trabalhos podem rodar ao mesmo tempo, na mesma instância ou em instâncias
+    diferentes do programa, sem apagar os arquivos uns dos outros.
+
+    A pasta é removida ao final do trabalho (inclusive em caso de erro) e ao fechar
+    o programa. Se o processo for encerrado à força, a pasta fica registrada e é
+    removida por limpar_espacos_trabalho_orfaos na próxima inicialização.
+
+    Uso:
+        with EspacoTrabalho(pasta_saida) as espaco:
+            caminho_temp = espaco.caminho("arquivo.pdf")
+    """
+    PREFIXO = ".pdfmaster_tmp_"
+    PASTA_REGISTRO = os.path.join(os.path.expanduser('~'), 'Documents', 'PDFMaster_temp')
+
+    def __init__(self, pasta_destino):
+        self.pasta_destino = pasta_destino
+        self.pasta = None
+        self._registro = None
+
+    def _escolher_pasta_base(self):
+        """Retorna a primeira pasta candidata que está no mesmo disco da pasta de destino."""
+        try:
+            os.makedirs(self.PASTA_REGISTRO, exist_ok=True)
+        except OSError:
+            pass
+        for candidata in (self.PASTA_REGISTRO, tempfile.gettempdir()):
+            if _mesmo_disco(candidata, self.pasta_destino):
+                return candidata
+        return self.pasta_destino
+
+    def criar(self):
+        """Cria a pasta do trabalho e registra o processo dono. Retorna o caminho da pasta."""
+        if self.pasta:
+            return self.pasta
+
+        self.pasta = tempfile.mkdtemp(prefix=self.PREFIXO, dir=self._escolher_pasta_base())
+
+        # Registra a pasta fora dela mesma, para que possa ser encontrada se o processo morrer
+        try:
+            os.makedirs(self.PASTA_REGISTRO, exist_ok=True)
+            self._registro = os.path.join(self.PASTA_REGISTRO, os.path.basename(self.pasta) + ".json")
+            with open(self._registro, 'w', encoding='utf-8') as f:
+                json.dump({"pasta": self.pasta, "pid": os.getpid(), "criado_em": time.time()}, f)
+        except OSError as e:
+            print(f"Não foi possível registrar o espaço de trabalho {self.pasta}: {e}")
+            self._registro = None
+
+        atexit.register(self.remover)
+        return self.pasta
+
+    def caminho(self, nome_arquivo):
+        """Retorna o caminho de um arquivo dentro da pasta do trabalho."""
+        return os.path.join(self.criar(), nome_arquivo)
+
+    def remover(self):
+        """Remove a pasta do trabalho e seu registro. Pode ser chamado mais de uma vez."""
+        if self.pasta:
+            shutil.rmtree(self.pasta, ignore_errors=True)
+            self.pasta = None
+        if self._registro:
+            try:
+                os.remove(self._registro)
+            except OSError:
+                pass
+            self._registro = None
+        atexit.unregister(self.remover)
+
+    def __enter__(self):
+        self.criar()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.remover()
+        return False
+
+
+def _processo_ativo(pid):
+    """Verifica se existe um processo em execução com o PID informado."""
+    if pid == os.getpid():
+        return True
+
+    if os.name == "nt":
+        import ctypes
+        from ctypes import wintypes
+
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        ERROR_ACCESS_DENIED = 5
+
+        # use_last_error preserva o código de erro da chamada, que
+        # GetLastError() via windll pode perder entre chamadas do ctypes
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+        kernel32.OpenProcess.restype = wintypes.HANDLE
+        kernel32.GetExitCodeProcess.argtypes = [wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD)]
+        kernel32.GetExitCodeProcess.restype = wintypes.BOOL
+        kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+        kernel32.CloseHandle.restype = wintypes.BOOL
+
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            # Sem permissão para consultar significa que o processo existe
+            return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+        try:
+            codigo_saida = wintypes.DWORD()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(codigo_saida)):
+                return True
+            return codigo_saida.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def limpar_cache_indices(pasta=None, idade_maxima=IDADE_MAXIMA_CACHE_INDICES,
+                         tamanho_maximo=TAMANHO_MAXIMO_CACHE_INDICES):
+    """
+    Apaga os índices de páginas em cache que passaram da idade máxima e, se a pasta
+    ainda ultrapassar o tamanho máximo, os usados há mais tempo.
+
+    A data de modificação de cada índice é atualizada sempre que ele é reaproveitado,
+    então ela indica o último uso.
+    
+    Args:
+        pasta (str): Pasta do cache. Se None, usa PASTA_CACHE_INDICES
+        idade_maxima (float): Idade máxima, em segundos, desde o último uso
+        tamanho_maximo (int): Tamanho total máximo da pasta, em bytes
+    
+    Returns:
+        int: Quantidade de índices removidos
+    """
+    pasta = pasta or PASTA_CACHE_INDICES
+    if not os.path.isdir(pasta):
+        return 0
+
+    indices = []
+    for nome in os.listdir(pasta):
+        if not nome.endswith(".indice.json"):
+            continue
+        caminho = os.path.join(pasta, nome)
+        try:
+            info = os.stat(caminho)
+        except OSError:
+            continue
+        indices.append((info.st_mtime, info.st_size, caminho))
+
+    # Do usado há mais tempo para o mais recente
+    indices.sort()
+    limite_idade = time.time() - idade_maxima
+    tamanho_total = sum(tamanho for _, tamanho, _ in indices)
+    removidos = 0
+    for modificado, tamanho, caminho in indices:
+        if modificado >= limite_idade and tamanho_total <= tamanho_maximo:
+            break
+        try:
+            os.remove(caminho)
+        except OSError:
+            continue
+        tamanho_total -= tamanho
+        removidos += 1
+    return removidos
+
+
+def limpar_espacos_trabalho_orfaos():
+    """
+    Remove os espaços de trabalho deixados por processos que não estão mais em execução
+    e aplica os limites do cache de índices (limpar_cache_indices).
+
+    Deve ser chamada na inicialização do programa.
+
+    Returns:
+        int: Quantidade de espaços de trabalho removidos
+    """
+    try:
+        limpar_cache_indices()
+    except OSError as e:
+        print(f"Erro ao limpar o cache de índices: {e}")
+
+    pasta_registro = EspacoTrabalho.PASTA_REGISTRO
+    if not os.path.isdir(pasta_registro):
+        return 0
+
+    removidos = 0
+    for nome in os.listdir(pasta_registro):
+        if not nome.endswith(".json"):
+            continue
+        caminho_registro = os.path.join(pasta_registro, nome)
+
+        try:
+            with open(caminho_registro, 'r', encoding='utf-8') as f:
+                registro = json.load(f)
+        except (OSError, ValueError):
+            registro = {}
+
+        pid = registro.get("pid")
+        if isinstance(pid, int) and _processo_ativo(pid):
+            continue
+
+        pasta = registro.get("pasta")
+        # Só apaga pastas criadas pelo EspacoTrabalho
+        if pasta and os.path.basename(pasta).startswith(EspacoTrabalho.PREFIXO):
+            shutil.rmtree(pasta, ignore_errors=True)
+            removidos += 1
+
+        try:
+            os.remove(caminho_registro)
+        except OSError:
+            pass
+
+    return removidos
+
+
 def handle_error(funcao, erro, root):
     """Trata erros de forma centralizada com opção de expandir traceback"""
     tb = traceback.format_exc()
@@ -173,6 +421,53 @@ def validar_caminho_ou_selecionar(caminho):
         return selecionar_diretorio()
 
 
+# Extensões aceitas na conversão de imagens para PDF, comparadas sem diferenciar maiúsculas
+EXTENSOES_IMAGEM = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')
+
+
+def chave_ordem_natural(texto):
+    """
+    Chave de ordenação natural: os números são comparados pelo valor, então
+    "IMG_2" vem antes de "IMG_10". Letras são comparadas sem diferenciar maiúsculas.
+    """
+    return [int(parte) if parte.isdecimal() else parte.casefold() for parte in re.split(r'(\d+)', texto)]
+
+
+def listar_imagens(pasta, recursivo=False, extensoes=EXTENSOES_IMAGEM):
+    """
+    Lista as imagens de uma pasta em uma única leitura do diretório
+
+    Usa os.scandir, cujas entradas já trazem o tipo de cada arquivo, então não há
+    uma consulta extra ao disco por arquivo (o que pesa em pastas de rede). Arquivos
+    ocultos (iniciados por ".") são ignorados, como os "._IMG.jpg" criados pelo macOS.
+    
+    Args:
+        pasta (str): Pasta onde as imagens são procuradas
+        recursivo (bool): Procura também nas subpastas
+        extensoes (tuple): Extensões aceitas, em minúsculas
+    
+    Returns:
+        list: Caminhos das imagens em ordem natural (subpastas depois dos arquivos da própria pasta)
+    """
+    encontradas = []
+    pendentes = [(pasta, ())]
+    while pendentes:
+        atual, relativo = pendentes.pop()
+        with os.scandir(atual) as entradas:
+            for entrada in entradas:
+                if entrada.name.startswith('.'):
+                    continue
+                if entrada.is_file():
+                    if os.path.splitext(entrada.name)[1].lower() in extensoes:
+                        encontradas.append((relativo + (entrada.name,), entrada.path))
+                elif recursivo and entrada.is_dir(follow_symlinks=False):
+                    pendentes.append((entrada.path, relativo + (entrada.name,)))
+
+    # Ordena por caminho relativo, uma parte por vez; a própria pasta vem antes das subpastas
+    encontradas.sort(key=lambda item: [(len(item[0]) > i + 1, chave_ordem_natural(parte)) for i, parte in enumerate(item[0])])
+    return [caminho for _, caminho in encontradas]
+
+
 def criar_pastas(diretorio):
     """Cria pastas padrão no diretório especificado"""
     if not os.path.exists(diretorio):
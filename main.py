@@ -19,6 +19,8 @@ __maintainer__ = "Dawison Nascimento"
 __email__ = "daw_afk@tutamail.com"
 __url__ = "https://github.com/dawilao/PDFMaster"
 
+import multiprocessing
+
 from app.version_checker import check_for_updates
 from app.tela_login import janela_login
 
@@ -33,4 +35,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Necessário para os processos de divisão de PDF no executável gerado pelo PyInstaller
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do app usam importação absoluta quando executados fora do pacote
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
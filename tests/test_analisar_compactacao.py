@@ -0,0 +1,33 @@
+import os
+from io import BytesIO
+
+from reportlab.pdfgen import canvas
+
+from pdf_utils import analisar_compactacao, reduzir_tamanho_pdf
+
+
+def _pdf_com_anotacoes(caminho, paginas=200, links=30):
+    """Sem imagens: o ganho da compactação vem dos fluxos de objetos e da xref comprimida."""
+    pdf = canvas.Canvas(str(caminho))
+    for numero in range(paginas):
+        for link in range(links):
+            y = 800 - link * 20
+            pdf.drawString(40, y, f"Item {numero}-{link}")
+            pdf.linkURL(f"https://exemplo.com/documentos/{numero}/{link}", (40, y - 2, 400, y + 10), relative=0)
+        pdf.showPage()
+    pdf.save()
+
+
+def test_estimativa_inclui_fluxos_de_objetos(tmp_path):
+    origem = tmp_path / "anotacoes.pdf"
+    _pdf_com_anotacoes(origem)
+
+    analise = analisar_compactacao(str(origem), callback=lambda msg: None)
+    saida = BytesIO()
+    sucesso, _ = reduzir_tamanho_pdf(str(origem), saida, callback=lambda msg: None, num_processos=1)
+    assert sucesso
+
+    reducao_real = 1 - saida.tell() / os.path.getsize(origem)
+    assert analise["economia"]["imagens"] == 0
+    assert analise["vale_a_pena"]
+    assert abs(analise["reducao"] - reducao_real) < 0.05
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+from PIL import Image
+from pypdf import PdfReader
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+import pdf_utils
+from pdf_utils import EscritorPdf, _ler_objeto_bruto, analisar_bytes_pdf
+
+
+def _pdf_variado(caminho, paginas=4):
+    """Páginas com foto própria, logotipo repetido, texto com parênteses e links."""
+    logo = ImageReader(Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)))
+    pdf = canvas.Canvas(str(caminho), pagesize=(300, 300))
+    for numero in range(paginas):
+        foto = ImageReader(Image.frombytes("RGB", (120, 90), os.urandom(120 * 90 * 3)))
+        pdf.drawString(20, 280, f"pagina {numero} (nota (1) 3 0 R)")
+        pdf.drawImage(foto, 20, 100, width=120, height=90)
+        pdf.drawImage(logo, 200, 200, width=40, height=40)
+        for link in range(3):
+            pdf.linkURL(f"https://exemplo.com/{numero}/{link}", (20, 20 + link * 20, 200, 35 + link * 20), relative=0)
+        pdf.showPage()
+    pdf.save()
+
+
+def _analisar_pelo_pypdf(monkeypatch, caminho):
+    """Mesma análise com todos os objetos abertos pelo pypdf, como era antes da leitura direta."""
+    monkeypatch.setattr(pdf_utils, "_ler_cabecalho_objeto", lambda regiao: None)
+    monkeypatch.setattr(pdf_utils, "_ler_objeto_bruto", lambda dados, posicao=0: None)
+    return analisar_bytes_pdf(str(caminho), callback=lambda msg: None)
+
+
+@pytest.mark.parametrize("fluxos_objetos", [False, True])
+def test_leitura_direta_classifica_como_o_pypdf(tmp_path, monkeypatch, fluxos_objetos):
+    caminho = tmp_path / "variado.pdf"
+    _pdf_variado(caminho)
+    if fluxos_objetos:
+        # Mesmo documento gravado com /ObjStm e xref comprimida
+        escritor = EscritorPdf()
+        for pagina in PdfReader(caminho).pages:
+            escritor.add_page(pagina)
+        caminho = tmp_path / "variado_objstm.pdf"
+        escritor.write(str(caminho))
+
+    analise = analisar_bytes_pdf(str(caminho), callback=lambda msg: None)
+    referencia = _analisar_pelo_pypdf(monkeypatch, caminho)
+
+    assert analise == referencia
+    assert analise["categorias"]["anotacoes"] > 0
+    assert len(analise["imagens"]) == 5
+    assert analise["categorias"]["nao_referenciados"] == 0
+
+
+def test_ler_objeto_bruto():
+    dados = (b"7 0 obj\n<< /Type /XObject /Subtype /Image /Width 120 /Height 90 "
+             b"/Filter [/ASCII85Decode /DCTDecode] /Title (a (b) 9 0 R) /SMask 12 0 R "
+             b"/DecodeParms << /Parent 3 0 R >> /Length 5 >>\nstream\n")
+    info = _ler_objeto_bruto(dados, dados.index(b"<<"))
+
+    assert info["fluxo"]
+    assert info["valores"]["/Subtype"] == "/Image"
+    assert info["valores"]["/Width"] == "120"
+    assert info["valores"]["/Filter"] == ["/ASCII85Decode", "/DCTDecode"]
+    # A referência dentro da string não conta
+    assert info["referencias"] == [(12, ("/SMask",)), (3, ("/DecodeParms", "/Parent"))]
+    # Dicionário cortado antes de fechar
+    assert _ler_objeto_bruto(dados[:60], dados.index(b"<<")) is None
@@ -0,0 +1,54 @@
+import os
+from io import BytesIO
+
+from PIL import Image
+from pypdf import PdfReader
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from pdf_utils import reduzir_tamanho_pdf
+
+
+def _pdf_com_imagem_repetida(caminho, paginas):
+    """Cada página tem o número no texto e a mesma foto, gravada uma única vez na origem."""
+    foto = ImageReader(Image.frombytes("RGB", (400, 400), os.urandom(400 * 400 * 3)))
+    pdf = canvas.Canvas(str(caminho), pagesize=(300, 300))
+    for numero in range(paginas):
+        pdf.drawString(20, 280, f"pagina {numero}")
+        pdf.drawImage(foto, 20, 20, width=200, height=200)
+        pdf.showPage()
+    pdf.save()
+
+
+def _imagens_da_pagina(pagina):
+    xobjects = pagina["/Resources"]["/XObject"]
+    return [referencia.idnum for referencia in xobjects.values()]
+
+
+def test_blocos_mantem_a_ordem_e_gravam_a_imagem_repetida_uma_vez(tmp_path):
+    origem = tmp_path / "repetida.pdf"
+    _pdf_com_imagem_repetida(origem, 7)
+    mensagens = []
+
+    saida = BytesIO()
+    sucesso, _ = reduzir_tamanho_pdf(str(origem), saida, callback=mensagens.append, paginas_por_janela=2,
+                                     num_processos=1)
+
+    assert sucesso
+    leitor = PdfReader(BytesIO(saida.getvalue()), strict=True)
+    assert [pagina.extract_text().strip() for pagina in leitor.pages] == [f"pagina {n}" for n in range(7)]
+    assert len({idnum for pagina in leitor.pages for idnum in _imagens_da_pagina(pagina)}) == 1
+    # A imagem é recomprimida no primeiro bloco e reaproveitada nos outros três
+    assert sum("1 já gravadas em blocos anteriores" in mensagem for mensagem in mensagens) == 3
+
+
+def test_blocos_gravados_em_arquivo(tmp_path):
+    origem = tmp_path / "repetida.pdf"
+    destino = tmp_path / "saida.pdf"
+    _pdf_com_imagem_repetida(origem, 5)
+
+    sucesso, _ = reduzir_tamanho_pdf(str(origem), str(destino), callback=lambda msg: None, paginas_por_janela=2,
+                                     num_processos=1)
+
+    assert sucesso
+    assert len(PdfReader(destino, strict=True).pages) == 5
@@ -0,0 +1,52 @@
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+from pdf_utils import _fim_string_literal, _medir_imagens_posicionadas, _recursos_usados_conteudo
+
+
+def _writer_com_imagem(conteudo):
+    """Writer de uma página cujo /Resources tem a imagem /Im1 e cujo conteúdo é o informado."""
+    writer = PdfWriter()
+    pagina = writer.add_blank_page(200, 200)
+    imagem = DecodedStreamObject()
+    imagem.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(1),
+        NameObject("/Height"): NumberObject(1),
+        NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+    })
+    imagem.set_data(b"\x00")
+    referencia = writer._add_object(imagem)
+    pagina[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/XObject"): DictionaryObject({NameObject("/Im1"): referencia}),
+    })
+    fluxo = DecodedStreamObject()
+    fluxo.set_data(conteudo)
+    pagina[NameObject("/Contents")] = writer._add_object(fluxo)
+    return writer, referencia.idnum
+
+
+def test_fim_string_literal_com_parenteses_aninhados_e_escapados():
+    dados = b"(a(b)c) Tj (x\\) y) Tj"
+    assert dados[:_fim_string_literal(dados, 0)] == b"(a(b)c)"
+    assert dados[11:_fim_string_literal(dados, 11)] == b"(x\\) y)"
+
+
+def test_parenteses_aninhados_antes_de_cm_e_do_nao_alteram_a_matriz():
+    # Com a string lida só até "(a(b)", o "Q" dentro dela desfaria o "cm"
+    writer, idnum = _writer_com_imagem(
+        b"q 144 0 0 72 10 10 cm BT /F1 12 Tf (a(b) Q cm) Tj ET /Im1 Do Q"
+    )
+
+    largura, altura = _medir_imagens_posicionadas(writer)[idnum]
+
+    assert (largura, altura) == (2.0, 1.0)
+
+
+def test_nome_de_recurso_dentro_de_string_aninhada_nao_conta_como_uso():
+    usados = {}
+    _recursos_usados_conteudo(b"BT /F1 12 Tf (x(y) /F2 9 Tf /Im2 Do) Tj ET", usados)
+
+    assert usados == {"/Font": {"/F1"}}
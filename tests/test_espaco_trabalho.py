@@ -0,0 +1,59 @@
+import os
+import time
+
+import utils
+from utils import EspacoTrabalho, limpar_cache_indices, limpar_espacos_trabalho_orfaos
+
+
+def test_espaco_trabalho_fica_fora_da_pasta_de_saida(tmp_path, monkeypatch):
+    base = tmp_path / "PDFMaster_temp"
+    saida = tmp_path / "saida"
+    saida.mkdir()
+    monkeypatch.setattr(EspacoTrabalho, "PASTA_REGISTRO", str(base))
+
+    with EspacoTrabalho(str(saida)) as espaco:
+        assert os.path.dirname(espaco.pasta) == str(base)
+        assert os.listdir(saida) == []
+    assert os.listdir(base) == []
+
+
+def test_espaco_trabalho_em_outro_disco_usa_a_pasta_de_saida(tmp_path, monkeypatch):
+    saida = tmp_path / "saida"
+    saida.mkdir()
+    monkeypatch.setattr(EspacoTrabalho, "PASTA_REGISTRO", str(tmp_path / "PDFMaster_temp"))
+    monkeypatch.setattr(utils, "_mesmo_disco", lambda a, b: False)
+
+    with EspacoTrabalho(str(saida)) as espaco:
+        assert os.path.dirname(espaco.pasta) == str(saida)
+
+
+def _indice(pasta, nome, tamanho, idade_dias):
+    caminho = pasta / f"{nome}.indice.json"
+    caminho.write_bytes(b"x" * tamanho)
+    momento = time.time() - idade_dias * 86400
+    os.utime(caminho, (momento, momento))
+    return caminho
+
+
+def test_cache_de_indices_respeita_idade_e_tamanho(tmp_path):
+    antigo = _indice(tmp_path, "antigo", 10, 60)
+    usado_ha_mais_tempo = _indice(tmp_path, "medio", 600, 5)
+    recente = _indice(tmp_path, "recente", 600, 1)
+    outro_arquivo = tmp_path / "anotacoes.txt"
+    outro_arquivo.write_bytes(b"x" * 5000)
+
+    removidos = limpar_cache_indices(str(tmp_path), idade_maxima=30 * 86400, tamanho_maximo=1000)
+
+    assert removidos == 2
+    assert not antigo.exists() and not usado_ha_mais_tempo.exists()
+    assert recente.exists() and outro_arquivo.exists()
+
+
+def test_limpeza_na_inicializacao_aplica_o_limite_do_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(EspacoTrabalho, "PASTA_REGISTRO", str(tmp_path / "registro"))
+    monkeypatch.setattr(utils, "PASTA_CACHE_INDICES", str(tmp_path))
+    antigo = _indice(tmp_path, "antigo", 10, 365)
+
+    limpar_espacos_trabalho_orfaos()
+
+    assert not antigo.exists()
@@ -0,0 +1,55 @@
+from io import BytesIO
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DictionaryObject, NameObject, TextStringObject
+
+from pdf_utils import reduzir_tamanho_pdf
+
+
+def _acao_javascript(writer):
+    return writer._add_object(DictionaryObject({
+        NameObject("/S"): NameObject("/JavaScript"),
+        NameObject("/JS"): TextStringObject("app.alert('aberto');"),
+    }))
+
+
+def _pdf_com_javascript(caminho, paginas=3):
+    writer = PdfWriter()
+    for _ in range(paginas):
+        pagina = writer.add_blank_page(200, 200)
+        pagina[NameObject("/AA")] = DictionaryObject({NameObject("/O"): _acao_javascript(writer)})
+    writer._root_object[NameObject("/OpenAction")] = _acao_javascript(writer)
+    with open(caminho, "wb") as arquivo:
+        writer.write(arquivo)
+
+
+def _verificar_sem_javascript(dados):
+    leitor = PdfReader(BytesIO(dados))
+    assert "/OpenAction" not in leitor.trailer["/Root"]
+    assert all("/AA" not in pagina for pagina in leitor.pages)
+    assert b"app.alert" not in dados
+
+
+def test_open_action_javascript_nao_chega_a_saida(tmp_path):
+    origem = tmp_path / "script.pdf"
+    _pdf_com_javascript(origem)
+    assert "/OpenAction" in PdfReader(origem).trailer["/Root"]
+
+    saida = BytesIO()
+    sucesso, _ = reduzir_tamanho_pdf(str(origem), saida, callback=lambda msg: None, paginas_por_janela=0,
+                                     num_processos=1)
+
+    assert sucesso
+    _verificar_sem_javascript(saida.getvalue())
+
+
+def test_open_action_javascript_nao_chega_a_saida_em_blocos(tmp_path):
+    origem = tmp_path / "script.pdf"
+    _pdf_com_javascript(origem, paginas=5)
+
+    saida = BytesIO()
+    sucesso, _ = reduzir_tamanho_pdf(str(origem), saida, callback=lambda msg: None, paginas_por_janela=2,
+                                     num_processos=1)
+
+    assert sucesso
+    _verificar_sem_javascript(saida.getvalue())
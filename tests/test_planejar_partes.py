@@ -0,0 +1,44 @@
+import pytest
+from pypdf import PdfReader
+from reportlab.pdfgen import canvas
+
+from pdf_utils import IndicePaginasPdf, gravar_partes_paralelo, planejar_partes, planejar_partes_equilibradas
+
+
+def _pdf_com_anotacoes(caminho, paginas=150, links=40):
+    """Páginas só com texto e links: quase todo o peso está em objetos comuns (as anotações)."""
+    pdf = canvas.Canvas(str(caminho))
+    for numero in range(paginas):
+        pdf.setFont("Helvetica", 9)
+        for link in range(links):
+            y = 800 - link * 18
+            pdf.drawString(40, y, f"Item {numero}-{link}: documento {numero * links + link}")
+            pdf.linkURL(f"https://exemplo.com/documentos/{numero}/{link}?pagina={numero}", (40, y - 2, 400, y + 10),
+                        relative=0)
+        pdf.showPage()
+    pdf.save()
+
+
+@pytest.mark.parametrize("planejar", [planejar_partes, planejar_partes_equilibradas])
+def test_tamanho_previsto_confere_com_o_gravado(tmp_path, planejar):
+    origem = tmp_path / "anotacoes.pdf"
+    _pdf_com_anotacoes(origem)
+    leitor = PdfReader(origem)
+    indice = IndicePaginasPdf.carregar_ou_construir(str(origem), leitor, pasta_cache=str(tmp_path / "cache"),
+                                                    callback=lambda msg: None)
+    assert indice.calibrado
+
+    # Limite para cerca de três partes
+    tamanho_total = planejar(indice, 1024)[0]["tamanho_previsto"]
+    limite_mb = tamanho_total / 2.5 / 1048576
+    plano = planejar(indice, limite_mb)
+    assert len(plano) == 3
+
+    saida = tmp_path / "partes"
+    saida.mkdir()
+    resultados = gravar_partes_paralelo(str(origem), plano, str(saida), "anotacoes", num_processos=1,
+                                        callback=lambda msg: None, leitor=leitor)
+
+    for parte, resultado in zip(plano, resultados):
+        assert resultado["tamanho"] == pytest.approx(parte["tamanho_previsto"], rel=0.05)
+        assert resultado["tamanho"] <= limite_mb * 1048576 * 1.02
@@ -0,0 +1,48 @@
+import os
+from io import BytesIO
+
+from PIL import Image
+from pypdf import PdfReader
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from pdf_utils import EscritorPdf, recomprimir_imagens
+
+
+def _pdf_imagem_alta_resolucao():
+    """PDF de uma página com uma foto de 1200x1200 px desenhada em 1 polegada (1200 DPI)."""
+    imagem = Image.frombytes("RGB", (1200, 1200), os.urandom(1200 * 1200 * 3))
+    saida = BytesIO()
+    pdf = canvas.Canvas(saida, pagesize=(300, 300))
+    pdf.drawImage(ImageReader(imagem), 10, 10, width=72, height=72)
+    pdf.save()
+    saida.seek(0)
+    return saida
+
+
+def _writer(pdf):
+    writer = EscritorPdf()
+    for pagina in PdfReader(pdf).pages:
+        writer.add_page(pagina)
+    return writer
+
+
+def test_reducao_de_resolucao_listada_quando_a_imagem_e_substituida():
+    mensagens = []
+    estatisticas = recomprimir_imagens(_writer(_pdf_imagem_alta_resolucao()), num_processos=1,
+                                       callback=mensagens.append, dpi_alvo=150)
+
+    assert estatisticas["reamostradas"] == 1
+    assert any("reduzida para 150x150 px" in mensagem for mensagem in mensagens)
+
+
+def test_imagem_mantida_nao_aparece_entre_as_reducoes_de_resolucao():
+    mensagens = []
+    # Nenhuma recompressão reduz 100% do tamanho, então a imagem é mantida
+    estatisticas = recomprimir_imagens(_writer(_pdf_imagem_alta_resolucao()), num_processos=1,
+                                       callback=mensagens.append, dpi_alvo=150, reducao_minima=1.0)
+
+    assert estatisticas["reamostradas"] == 0
+    assert estatisticas["ignoradas"] == 1
+    assert not any("150x150 px" in mensagem for mensagem in mensagens)
+    assert not any("DPI" in mensagem for mensagem in mensagens)